@@ -0,0 +1,318 @@
+import base64
+import json
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from jira_duplicate_finder.embeddings import HashingEmbeddings
+
+
+COMPONENTS = ['Route calculation', 'Voice guidance', 'Destination entry', 'Map display', 'Charging planner',
+              'Traffic information', 'Lane guidance', 'POI search', 'Speed limit display', 'Online search']
+SYMPTOMS = ['fails', 'shows wrong results', 'freezes', 'is delayed', 'crashes', 'ignores the user setting',
+            'loses its state', 'shows outdated data']
+CONDITIONS = ['after an ignition cycle', 'in tunnels', 'at roundabouts', 'during long routes', 'when offline',
+              'after a map update', 'with a trailer attached', 'at night', 'near country borders']
+REGIONS = ['Japan', 'Korea', 'China', 'Europe', 'North America', 'Middle East', 'Taiwan']
+STATUSES = ['Open', 'In Progress', 'Resolved', 'Closed']
+PRIORITIES = ['Blocker', 'Critical', 'Major', 'Minor']
+LABELS = ['navigation', 'audio', 'hmi', 'online', 'regression', 'customer']
+
+
+def synthetic_tickets(count: int, duplicate_rate: float = 0.1, project: str = 'NAV', seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Generate Jira-like bug tickets. A share of them reword an earlier ticket
+    and record it in duplicate_of, the ground truth for duplicate searches.
+    """
+    rng = random.Random(seed)
+    started = datetime(2025, 1, 1)
+    tickets = []
+    for i in range(count):
+        original = rng.randrange(len(tickets)) if tickets and rng.random() < duplicate_rate else None
+        if original is None:
+            issue = (rng.choice(COMPONENTS), rng.choice(SYMPTOMS), rng.choice(CONDITIONS), rng.choice(REGIONS))
+        else:
+            issue = tickets[original]['issue']
+
+        component, symptom, condition, region = issue
+        created = started + timedelta(minutes=rng.randrange(180 * 24 * 60))
+        steps = rng.sample(['Start the vehicle', 'Enter a destination', 'Start route guidance',
+                            'Drive for 20 minutes', 'Open the map', 'Change the map scale'], 3)
+        tickets.append({
+            'key': f"{project}-{i + 1}",
+            'issue': issue,
+            'duplicate_of': tickets[original]['key'] if original is not None else None,
+            'summary': f"{component} {symptom} {condition} in {region}",
+            'description': (
+                f"{component} {symptom} {condition}. Observed in {region} on build "
+                f"VR{rng.randrange(40, 60)}_{rng.randrange(1, 9)}_{rng.randrange(100, 999)}.\n"
+                f"Steps: {'; '.join(steps)}.\nReproducibility: {rng.randrange(1, 6)}/5.\n"
+                f"Trace id {rng.getrandbits(64):016x}."
+            ),
+            'created': created.strftime('%Y-%m-%dT%H:%M:%S.000+0000'),
+            'updated': (created + timedelta(days=rng.randrange(30))).strftime('%Y-%m-%dT%H:%M:%S.000+0000'),
+            'status': rng.choice(STATUSES),
+            'priority': rng.choice(PRIORITIES),
+            'labels': rng.sample(LABELS, rng.randrange(3))
+        })
+    return tickets
+
+
+class FakeService(ABC):
+    """
+    Latency and rate limiting shared by the fake servers.
+
+    Every request waits latency_ms (plus up to jitter_ms). Requests above
+    requests_per_second, or a random error_rate share of them, are answered
+    with HTTP 429 and a Retry-After header, like the real services. With a
+    request rate, every response reports the requests left in the current
+    second in x-ratelimit-remaining-requests.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        requests_per_second: Optional[float] = None,
+        error_rate: float = 0.0,
+        retry_after_ms: float = 100.0,
+        seed: int = 0
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.requests_per_second = requests_per_second
+        self.error_rate = error_rate
+        self.retry_after_ms = retry_after_ms
+        self.requests = 0
+        self.rate_limited = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window_started = time.monotonic()
+        self._window_requests = 0
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.url = "http://127.0.0.1"
+
+    def admit(self) -> bool:
+        """Count a request and tell whether it is served or rate limited."""
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            if now - self._window_started >= 1.0:
+                self._window_started, self._window_requests = now, 0
+            self._window_requests += 1
+            limited = (self.requests_per_second is not None and self._window_requests > self.requests_per_second) \
+                or self._rng.random() < self.error_rate
+            if limited:
+                self.rate_limited += 1
+            delay = (self.latency_ms + self._rng.random() * self.jitter_ms) / 1000
+        if delay:
+            time.sleep(delay)
+        return not limited
+
+    def remaining_requests(self) -> Optional[int]:
+        """Requests left in the current second, None without a request rate."""
+        if self.requests_per_second is None:
+            return None
+        with self._lock:
+            return max(0, int(self.requests_per_second) - self._window_requests)
+
+    @abstractmethod
+    def handle(self, method: str, path: str, query: Dict[str, List[str]], body: Any) -> Tuple[int, Any]:
+        """Answer a request with an HTTP status and a JSON body."""
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve from a background thread and return the base URL."""
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are sent separately, Nagle would delay the body
+            disable_nagle_algorithm = True
+
+            def _serve(self, method):
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length)) if length else None
+                url = urlparse(self.path)
+                if service.admit():
+                    status, response = service.handle(method, url.path, parse_qs(url.query), body)
+                    headers = {}
+                else:
+                    status, response = 429, {'error': {'code': '429', 'message': 'Too many requests'}}
+                    headers = {'Retry-After': f"{service.retry_after_ms / 1000:g}",
+                               'retry-after-ms': f"{service.retry_after_ms:g}"}
+                remaining = service.remaining_requests()
+                if remaining is not None:
+                    headers['x-ratelimit-remaining-requests'] = str(remaining)
+
+                payload = json.dumps(response).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._serve('GET')
+
+            def do_POST(self):
+                self._serve('POST')
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+        return self.url
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+class FakeJira(FakeService):
+    """
+    Jira Server REST API subset used by the finder: server info, fields and
+    the paginated issue search, understanding `key in (...)`, `updated >=` and
+    ORDER BY key. Tickets can be changed, added or removed between searches.
+    """
+
+    def __init__(self, tickets: List[Dict[str, Any]], **options: Any):
+        super().__init__(**options)
+        self.tickets = tickets
+
+    def handle(self, method, path, query, body):
+        if path.endswith('/serverInfo'):
+            return 200, {'baseUrl': '', 'version': '9.12.0', 'versionNumbers': [9, 12, 0],
+                         'deploymentType': 'Server', 'serverTitle': 'Fake Jira'}
+        if path.endswith('/field'):
+            return 200, [{'id': field, 'name': field, 'custom': field.startswith('customfield_')}
+                         for field in ('summary', 'description', 'created', 'updated', 'status',
+                                       'priority', 'labels', 'customfield_10357', 'customfield_10356')]
+        if path.endswith('/search'):
+            params = body if method == 'POST' else {name: values[0] for name, values in query.items()}
+            return 200, self.search(params)
+        return 404, {'errorMessages': [f"Unknown path {path}"]}
+
+    def search(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        jql = params.get('jql', '')
+        start_at = int(params.get('startAt', 0))
+        max_results = int(params.get('maxResults', 50))
+
+        keys = re.search(r'key in \(([^)]*)\)', jql)
+        if keys:
+            by_key = {ticket['key']: ticket for ticket in self.tickets}
+            tickets = [by_key[key.strip()] for key in keys.group(1).split(',') if key.strip() in by_key]
+        else:
+            tickets = self.tickets
+        updated = re.search(r'updated >= "(\d{4})/(\d{2})/(\d{2}) (\d{2}):(\d{2})"', jql)
+        if updated:
+            since = '{}-{}-{}T{}:{}'.format(*updated.groups())
+            tickets = [ticket for ticket in tickets if ticket['updated'] >= since]
+        if re.search(r'ORDER BY key', jql, re.IGNORECASE):
+            # Like Jira, by project and then by number, not as strings
+            tickets = sorted(tickets, key=lambda ticket: (ticket['key'].rsplit('-', 1)[0],
+                                                          int(ticket['key'].rsplit('-', 1)[1])))
+
+        page = tickets[start_at:start_at + max_results]
+        return {
+            'startAt': start_at,
+            'maxResults': max_results,
+            'total': len(tickets),
+            'issues': [self._issue(ticket) for ticket in page]
+        }
+
+    def _issue(self, ticket: Dict[str, Any]) -> Dict[str, Any]:
+        number = ticket['key'].rsplit('-', 1)[1]
+        return {
+            'id': number,
+            'key': ticket['key'],
+            'fields': {
+                'summary': ticket['summary'],
+                'description': ticket['description'],
+                'created': ticket['created'],
+                'updated': ticket['updated'],
+                'status': self._field_value('status', ticket['status'], STATUSES.index(ticket['status'])),
+                'priority': self._field_value('priority', ticket['priority'], PRIORITIES.index(ticket['priority'])),
+                'labels': ticket['labels'],
+                'customfield_10357': None,
+                'customfield_10356': None
+            }
+        }
+
+    def _field_value(self, field: str, name: str, number: int) -> Dict[str, Any]:
+        # The jira client picks the resource class (Status, Priority) from the
+        # self URL; without it the value stays a PropertyHolder with no name
+        return {
+            'self': f"{self.url}/rest/api/2/{field}/{number}",
+            'id': str(number),
+            'name': name,
+            'description': name,
+            'iconUrl': f"{self.url}/images/icons/{field}/{number}.png"
+        }
+
+
+class FakeOpenAI(FakeService):
+    """
+    Azure OpenAI chat completion and embedding deployments. Summaries are the
+    ticket title, and embeddings are deterministic hashed n-gram vectors, so
+    reworded duplicates end up close to each other.
+    """
+
+    def __init__(self, dimension: int = 1536, **options: Any):
+        super().__init__(**options)
+        self.embedder = HashingEmbeddings(dimension=dimension)
+        self.prompt_tokens = 0
+
+    def handle(self, method, path, query, body):
+        if path.endswith('/chat/completions'):
+            return 200, self.chat(body)
+        if path.endswith('/embeddings'):
+            return 200, self.embed(body)
+        return 404, {'error': {'code': '404', 'message': f"Unknown path {path}"}}
+
+    def chat(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        prompt = body['messages'][-1]['content']
+        title = re.search(r'^\s*Title: (.*)$', prompt, re.MULTILINE)
+        summary = title.group(1).strip() if title else prompt[:80]
+        prompt_tokens = sum(len(message['content']) for message in body['messages']) // 4
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+        return {
+            'id': 'chatcmpl-fake',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'fake'),
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': summary}}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(summary) // 4,
+                      'total_tokens': prompt_tokens + len(summary) // 4}
+        }
+
+    def embed(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        inputs = body['input'] if isinstance(body['input'], list) else [body['input']]
+        # Token arrays (sent when the client tokenizes) are hashed as their ids
+        texts = [text if isinstance(text, str) else ' '.join(map(str, text)) for text in inputs]
+        vectors = self.embedder.embed_array(texts).astype(np.float32)
+
+        as_base64 = body.get('encoding_format') == 'base64'
+        data = [
+            {'object': 'embedding', 'index': i,
+             'embedding': base64.b64encode(vector.tobytes()).decode('ascii') if as_base64 else vector.tolist()}
+            for i, vector in enumerate(vectors)
+        ]
+        tokens = sum(len(text) for text in texts) // 4
+        return {'object': 'list', 'data': data, 'model': body.get('model', 'fake'),
+                'usage': {'prompt_tokens': tokens, 'total_tokens': tokens}}
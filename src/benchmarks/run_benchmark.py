@@ -0,0 +1,166 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Add src to Python path
+src_path = str(Path(__file__).parent.parent)
+if src_path not in sys.path:
+    sys.path.append(src_path)
+
+from benchmarks.fake_services import FakeJira, FakeOpenAI, synthetic_tickets
+from jira_duplicate_finder.duplicate_finder import JiraDuplicateFinder
+
+# Lower is better for these results, higher for the others
+LOWER_IS_BETTER = ('build_seconds', 'snapshot_mb', 'load_seconds', 'query_p50_ms', 'query_p95_ms', 'query_p99_ms')
+COMPARED = LOWER_IS_BETTER + ('build_tickets_per_second', 'recall_at_5')
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def run(num_tickets: int, args: argparse.Namespace, work_dir: str) -> Dict[str, Any]:
+    """Build, load and query a database of num_tickets synthetic tickets against the fake services."""
+    tickets = synthetic_tickets(num_tickets, args.duplicate_rate, seed=args.seed)
+    jira = FakeJira(tickets, latency_ms=args.jira_latency_ms, error_rate=args.jira_error_rate, seed=args.seed)
+    openai = FakeOpenAI(dimension=args.dimension, latency_ms=args.openai_latency_ms,
+                        requests_per_second=args.openai_rps, error_rate=args.openai_error_rate, seed=args.seed)
+    jira_url, openai_url = jira.start(), openai.start()
+
+    # The clients read the Azure OpenAI endpoint from the environment. A
+    # fresh summary cache makes every preprocessing call reach the fake.
+    os.environ['AZURE_OPENAI_ENDPOINT'] = openai_url
+    os.environ['AZURE_OPENAI_API_KEY'] = 'benchmark'
+    os.environ['SUMMARY_CACHE_PATH'] = os.path.join(work_dir, 'summaries.sqlite')
+
+    try:
+        finder = JiraDuplicateFinder(
+            jira_server=jira_url,
+            jira_email='benchmark@example.com',
+            jira_api_token='benchmark',
+            max_in_flight=args.max_in_flight,
+            use_embedding_cache=False,
+            index_type=args.index_type,
+            # Sends texts instead of tiktoken tokens, so no tokenizer download is needed
+            embedding_options={'check_embedding_ctx_length': False}
+        )
+
+        started = time.perf_counter()
+        database = finder.build_database('project = NAV', os.path.join(work_dir, 'bug_database'))
+        build_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        searcher = JiraDuplicateFinder.for_search(database, query_cache_size=0, use_embedding_cache=False)
+        load_seconds = time.perf_counter() - started
+
+        # Reworded tickets should find the ticket they duplicate
+        duplicates = [ticket for ticket in tickets if ticket['duplicate_of']][:args.queries]
+        latencies, found = [], 0
+        for ticket in duplicates:
+            started = time.perf_counter()
+            results = searcher.find_duplicates(ticket['summary'], ticket['key'], num_similar=5, similarity_threshold=0.0)
+            latencies.append((time.perf_counter() - started) * 1000)
+            found += any(result['key'] == ticket['duplicate_of'] for result in results)
+
+        return {
+            'tickets': num_tickets,
+            'build_seconds': build_seconds,
+            'build_tickets_per_second': num_tickets / build_seconds,
+            'snapshot_mb': directory_size(database) / 1e6,
+            'load_seconds': load_seconds,
+            'queries': len(latencies),
+            'query_p50_ms': float(np.percentile(latencies, 50)) if latencies else None,
+            'query_p95_ms': float(np.percentile(latencies, 95)) if latencies else None,
+            'query_p99_ms': float(np.percentile(latencies, 99)) if latencies else None,
+            'recall_at_5': found / len(latencies) if latencies else None,
+            'failed_tickets': len(finder.failed_tickets),
+            'jira_requests': jira.requests,
+            'openai_requests': openai.requests,
+            'openai_rate_limited': openai.rate_limited,
+            'stages': finder.metrics.snapshot()
+        }
+    finally:
+        jira.stop()
+        openai.stop()
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Results worse than the baseline run of the same size by more than tolerance."""
+    regressions = []
+    baseline_by_size = {run['tickets']: run for run in baseline}
+    for run in results:
+        previous = baseline_by_size.get(run['tickets'])
+        if previous is None:
+            continue
+        for name in COMPARED:
+            if run.get(name) is None or not previous.get(name):
+                continue
+            change = (run[name] - previous[name]) / previous[name]
+            worse = change > tolerance if name in LOWER_IS_BETTER else change < -tolerance
+            if worse:
+                regressions.append(f"{run['tickets']} tickets: {name} {previous[name]:.3f} -> {run[name]:.3f} "
+                                   f"({change:+.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark building, loading and querying databases end to end against local "
+                    "Jira and Azure OpenAI stand-ins, without network access or API costs."
+    )
+    parser.add_argument('--tickets', type=int, nargs='+', default=[1000, 10000],
+                        help="Corpus sizes to benchmark (default: 1000 10000)")
+    parser.add_argument('--duplicate-rate', type=float, default=0.1, help="Share of reworded duplicate tickets")
+    parser.add_argument('--queries', type=int, default=200, help="Duplicate searches per corpus (default: 200)")
+    parser.add_argument('--index-type', default='flat', help="Index type of the databases (default: flat)")
+    parser.add_argument('--max-in-flight', type=int, default=8, help="Tickets preprocessed concurrently")
+    parser.add_argument('--dimension', type=int, default=1536, help="Embedding dimension (default: 1536)")
+    parser.add_argument('--jira-latency-ms', type=float, default=50.0, help="Latency of every Jira request")
+    parser.add_argument('--jira-error-rate', type=float, default=0.0, help="Share of Jira requests answered with 429")
+    parser.add_argument('--openai-latency-ms', type=float, default=20.0,
+                        help="Latency of every chat completion and embedding request")
+    parser.add_argument('--openai-rps', type=float, help="Azure OpenAI requests per second before answering 429")
+    parser.add_argument('--openai-error-rate', type=float, default=0.0,
+                        help="Share of Azure OpenAI requests answered with 429")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the corpus and of the fake services")
+    parser.add_argument('--output', help="Write the results as JSON to this file")
+    parser.add_argument('--baseline', help="Results JSON of an earlier run to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Relative change from the baseline reported as a regression (default: 0.2)")
+    args = parser.parse_args()
+
+    results = []
+    for num_tickets in args.tickets:
+        print(f"\nBenchmarking {num_tickets} tickets")
+        with tempfile.TemporaryDirectory() as work_dir:
+            results.append(run(num_tickets, args, work_dir))
+
+    print(f"\n{'tickets':>8}{'build s':>10}{'tickets/s':>11}{'size MB':>10}{'load s':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'recall@5':>10}{'429s':>7}")
+    for run_result in results:
+        print(f"{run_result['tickets']:>8}{run_result['build_seconds']:>10.1f}"
+              f"{run_result['build_tickets_per_second']:>11.1f}{run_result['snapshot_mb']:>10.1f}"
+              f"{run_result['load_seconds']:>9.2f}{run_result['query_p50_ms'] or 0:>9.1f}"
+              f"{run_result['query_p95_ms'] or 0:>9.1f}{run_result['query_p99_ms'] or 0:>9.1f}"
+              f"{run_result['recall_at_5'] or 0:>10.2f}{run_result['openai_rate_limited']:>7}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-import pickle
+import json
 import faiss
 import numpy as np
 import pandas as pd
@@ -9,15 +9,13 @@ from datetime import datetime
 import matplotlib.pyplot as plt
 from sklearn.decomposition import PCA
 
-def get_latest_database(base_dir) -> str:
-        if not os.path.exists(base_dir):
-            raise ValueError("No database directory found")
-            
-        databases = [d for d in os.listdir(base_dir) if d.startswith('db_')]
-        if not databases:
-            raise ValueError("No databases found")
-            
-        return os.path.join(base_dir, sorted(databases, reverse=True)[0])
+# Add src to Python path
+src_path = str(Path(__file__).parent.parent)
+if src_path not in sys.path:
+    sys.path.append(src_path)
+
+from jira_duplicate_finder.metadata_store import ColumnStore
+from examples.command_line import get_latest_database
 
 def analyze_database(directory='./bug_database'):
     # Get database path from command line argument or use latest
@@ -37,10 +35,12 @@ def analyze_database(directory='./bug_database'):
 
     # 1. Read metadata
     print("=== Metadata Analysis ===")
-    with open(Path(db_path) / 'metadata.pkl', 'rb') as f:
-        metadata = pickle.load(f)
+    with open(Path(db_path) / 'snapshot.json', encoding='utf-8') as f:
+        metadata = json.load(f)
     
-    df = metadata['bugs_data']
+    # Only the columns used below are read
+    store = ColumnStore(str(Path(db_path) / 'metadata'), metadata['columns'])
+    df = store.to_dataframe(['key', 'summary', 'status', 'created'])
     print(f"\nTotal bugs: {len(df)}")
     print("\nStatus distribution:")
     print(df['status'].value_counts())
@@ -69,7 +69,10 @@ def analyze_database(directory='./bug_database'):
     plt.xlabel('PCA Component 1')
     plt.ylabel('PCA Component 2')
     
+    # Replaced rather than overwritten, database files may be hard links
+    # shared with other databases
     output_path = Path(db_path) / 'embeddings_visualization.png'
+    output_path.unlink(missing_ok=True)
     plt.savefig(output_path)
     plt.close()  # Close the figure to free memory
     print(f"\nVisualization saved to: {output_path}")
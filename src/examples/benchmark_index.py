@@ -0,0 +1,117 @@
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+# Add src to Python path
+src_path = str(Path(__file__).parent.parent)
+if src_path not in sys.path:
+    sys.path.append(src_path)
+
+from jira_duplicate_finder.vector_index import create_index, search_parameters
+from examples.command_line import get_latest_database
+
+def load_vectors(db_path: str, scale: int, seed: int) -> np.ndarray:
+    """
+    Normalized vectors of a database, optionally grown to `scale` vectors by
+    adding jittered copies, to estimate behaviour on larger databases.
+    """
+    index = faiss.read_index(str(Path(db_path) / 'index.faiss'))
+    vectors = index.reconstruct_n(0, index.ntotal)
+    faiss.normalize_L2(vectors)
+
+    if scale and scale > len(vectors):
+        rng = np.random.default_rng(seed)
+        copies = vectors[rng.integers(0, len(vectors), scale - len(vectors))]
+        copies = copies + rng.normal(scale=0.02, size=copies.shape).astype(np.float32)
+        faiss.normalize_L2(copies)
+        vectors = np.vstack([vectors, copies])
+
+    return vectors
+
+def timed_search(index, queries, k, params, repeats=3):
+    """Search all queries one at a time, like interactive lookups. Returns neighbours and QPS."""
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        neighbours = [index.search(query[None, :], k, params=params)[1][0] for query in queries]
+        best = min(best, time.perf_counter() - started)
+    return np.vstack(neighbours), len(queries) / best
+
+def recall_at_k(neighbours, ground_truth):
+    """Fraction of the exact top-k found, averaged over queries."""
+    k = ground_truth.shape[1]
+    hits = [len(set(found) & set(expected)) for found, expected in zip(neighbours, ground_truth)]
+    return sum(hits) / (k * len(ground_truth))
+
+def index_size_mb(index):
+    return faiss.serialize_index(index).nbytes / 1024 / 1024
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare recall@k, queries per second and memory of approximate indexes against exact search."
+    )
+    parser.add_argument('database_folder', nargs='?', help="Database folder, latest if not provided")
+    parser.add_argument('--k', type=int, default=10, help="Neighbours per query (default: 10)")
+    parser.add_argument('--queries', type=int, default=500, help="Number of queries (default: 500)")
+    parser.add_argument('--scale', type=int, default=0, help="Grow the database to this many vectors with jittered copies")
+    parser.add_argument('--nlist', type=int, help="IVF cells (default: about 4*sqrt(n))")
+    parser.add_argument('--pq-m', type=int, help="PQ sub-quantizers (default: dimension / 16)")
+    parser.add_argument('--hnsw-m', type=int, default=32, help="HNSW neighbours per node (default: 32)")
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 16, 64], help="IVF nprobe values to test")
+    parser.add_argument('--ef-search', type=int, nargs='+', default=[16, 32, 64, 128], help="HNSW efSearch values to test")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.database_folder:
+        db_path = os.path.join("./bug_database", args.database_folder)
+        if not os.path.exists(db_path):
+            print(f"Error: Database '{db_path}' not found")
+            return
+    else:
+        try:
+            db_path = get_latest_database()
+            print(f"\nUsing latest database: {db_path}")
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+
+    vectors = load_vectors(db_path, args.scale, args.seed)
+    rng = np.random.default_rng(args.seed)
+
+    # Queries are perturbed database vectors, so that they are not exact matches
+    queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+    queries = queries + rng.normal(scale=0.02, size=queries.shape).astype(np.float32)
+    faiss.normalize_L2(queries)
+
+    print(f"{len(vectors)} vectors of dimension {vectors.shape[1]}, {len(queries)} queries, k={args.k}\n")
+    print(f"{'index':<10}{'setting':<16}{'build s':>9}{'memory MB':>11}{'recall@k':>10}{'QPS':>10}")
+
+    def build(index_type, **params):
+        started = time.perf_counter()
+        index = create_index(index_type, vectors, **params)
+        index.add(vectors)
+        return index, time.perf_counter() - started
+
+    flat, flat_build = build('flat')
+    ground_truth, flat_qps = timed_search(flat, queries, args.k, None)
+    print(f"{'flat':<10}{'exact':<16}{flat_build:>9.2f}{index_size_mb(flat):>11.1f}{1.0:>10.3f}{flat_qps:>10.0f}")
+
+    ivfpq, ivfpq_build = build('ivfpq', nlist=args.nlist, pq_m=args.pq_m)
+    for nprobe in args.nprobe:
+        neighbours, qps = timed_search(ivfpq, queries, args.k, search_parameters(ivfpq, nprobe=nprobe))
+        print(f"{'ivfpq':<10}{f'nprobe={nprobe}':<16}{ivfpq_build:>9.2f}{index_size_mb(ivfpq):>11.1f}"
+              f"{recall_at_k(neighbours, ground_truth):>10.3f}{qps:>10.0f}")
+
+    hnsw, hnsw_build = build('hnsw', hnsw_m=args.hnsw_m)
+    for ef_search in args.ef_search:
+        neighbours, qps = timed_search(hnsw, queries, args.k, search_parameters(hnsw, ef_search=ef_search))
+        print(f"{'hnsw':<10}{f'efSearch={ef_search}':<16}{hnsw_build:>9.2f}{index_size_mb(hnsw):>11.1f}"
+              f"{recall_at_k(neighbours, ground_truth):>10.3f}{qps:>10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+# Add src to Python path
+src_path = str(Path(__file__).parent.parent)
+if src_path not in sys.path:
+    sys.path.append(src_path)
+
+from examples.command_line import get_latest_database
+
+# Runs in a fresh interpreter, so import costs are measured cold. Settings
+# come as JSON on stdin and credentials from the inherited environment, so
+# no secret shows up in the command line of the process.
+CHILD_SCRIPT = """
+import json, os, sys, time
+started = time.perf_counter()
+times = {}
+config = json.load(sys.stdin)
+sys.path.append(config['src_path'])
+
+from jira_duplicate_finder.duplicate_finder import JiraDuplicateFinder
+times['import'] = time.perf_counter() - started
+
+if config['search_only']:
+    finder = JiraDuplicateFinder(jira_server=None, jira_email=None, jira_api_token=None,
+                                 **JiraDuplicateFinder.embedding_settings(config['db_path']))
+else:
+    finder = JiraDuplicateFinder(jira_server=os.getenv('JIRA_SERVER') or 'https://jira.invalid',
+                                 jira_email=os.getenv('JIRA_EMAIL'),
+                                 jira_api_token=os.getenv('JIRA_PAT_TOKEN'),
+                                 **JiraDuplicateFinder.embedding_settings(config['db_path']))
+    # Connecting the clients up front, as before they were created lazily
+    finder.jira
+    finder.text_processor
+times['construct'] = time.perf_counter() - started
+
+finder.load_database(config['db_path'], search_only=config['search_only'])
+times['load'] = time.perf_counter() - started
+
+query = config['query'] or finder.metadata_store.column('text')[0]
+finder.find_duplicates(query, num_similar=5, similarity_threshold=0.0)
+times['first search'] = time.perf_counter() - started
+
+print(json.dumps(times))
+"""
+
+STAGES = ['import', 'construct', 'load', 'first search']
+
+def run_child(db_path, search_only, query):
+    config = {
+        'src_path': src_path,
+        'db_path': os.path.abspath(db_path),
+        'search_only': search_only,
+        'query': query
+    }
+    completed = subprocess.run([sys.executable, '-c', CHILD_SCRIPT], input=json.dumps(config),
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure the time from process start to the first search result, by stage."
+    )
+    parser.add_argument('database_folder', nargs='?', help="Database folder, latest if not provided")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh processes per mode (default: 5)")
+    parser.add_argument('--query', help="Query text, defaults to the first stored bug. "
+                                        "Uncached query texts add an embedding request to the first search")
+    parser.add_argument('--full', action='store_true',
+                        help="Also measure a full load with Jira and GPT clients, as used for updates")
+    args = parser.parse_args()
+
+    if args.database_folder:
+        db_path = os.path.join("./bug_database", args.database_folder)
+        if not os.path.exists(db_path):
+            print(f"Error: Database '{db_path}' not found")
+            return
+    else:
+        try:
+            db_path = get_latest_database()
+            print(f"\nUsing latest database: {db_path}")
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+
+    modes = [('search only', True)] + ([('full', False)] if args.full else [])
+
+    print(f"\nMedian seconds since process start over {args.runs} runs")
+    print(f"{'mode':<14}" + ''.join(f"{stage:>14}" for stage in STAGES))
+    for name, search_only in modes:
+        try:
+            runs = [run_child(db_path, search_only, args.query) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{name:<14}failed: {e}")
+            continue
+        print(f"{name:<14}" + ''.join(f"{statistics.median(run[stage] for run in runs):>14.3f}" for stage in STAGES))
+
+if __name__ == "__main__":
+    main()
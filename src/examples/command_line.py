@@ -0,0 +1,23 @@
+import sys
+
+from jira_duplicate_finder.snapshots import snapshot_directories
+
+# Helpers shared by the example scripts, which add src to the Python path
+
+def get_latest_database(base_dir: str = "./bug_database") -> str:
+    """Get the most recent complete database directory, with a snapshot.json."""
+    databases = snapshot_directories(base_dir)
+    if not databases:
+        raise ValueError(f"No complete database found in {base_dir}")
+    return databases[-1]
+
+def pop_option(name: str):
+    """Remove `name value` from the command line and return the value, or None."""
+    if name not in sys.argv[1:]:
+        return None
+    position = sys.argv.index(name)
+    if position + 1 == len(sys.argv):
+        raise ValueError(f"{name} needs a value")
+    value = sys.argv[position + 1]
+    del sys.argv[position:position + 2]
+    return value
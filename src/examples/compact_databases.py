@@ -0,0 +1,39 @@
+import argparse
+import sys
+from pathlib import Path
+
+# Add src to Python path
+src_path = str(Path(__file__).parent.parent)
+if src_path not in sys.path:
+    sys.path.append(src_path)
+
+from jira_duplicate_finder.snapshots import compact
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Remove old databases and hard link identical files of the remaining ones."
+    )
+    parser.add_argument('--base-dir', default="./bug_database", help="Directory holding the databases")
+    parser.add_argument('--keep-last', type=int, default=5,
+                        help="Number of most recent databases always kept (default: 5)")
+    parser.add_argument('--keep-daily', type=int, default=14,
+                        help="Days for which the last database of the day is kept (default: 14)")
+    parser.add_argument('--dry-run', action='store_true', help="Only list the databases that would be removed")
+    args = parser.parse_args()
+
+    try:
+        stats = compact(args.base_dir, args.keep_last, args.keep_daily, args.dry_run)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    if args.dry_run:
+        print(f"{stats['removed_snapshots']} databases would be removed")
+        return
+
+    print(f"Removed {stats['removed_snapshots']} databases")
+    print(f"Linked {stats['shared_files']} identical files ({stats['shared_bytes'] / 1e6:.1f} MB) between databases")
+    print(f"Freed {stats['freed_files']} unreferenced files ({stats['freed_bytes'] / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -9,34 +9,96 @@ if src_path not in sys.path:
     sys.path.append(src_path)
 
 from jira_duplicate_finder.duplicate_finder import JiraDuplicateFinder
+from examples.command_line import get_latest_database, pop_option
+
+# Example JQL filter, applied to the projects of the database
+BUG_FILTER = ('issuetype = Bug AND '
+              '(Customer in (Audi_HCP3, Audi_OCI) OR Products in (Audi_HCP3, Audi_OCI)) AND '
+              '("External Reference" is not EMPTY OR "Customer ID" is not EMPTY) AND '
+              'created > startOfMonth(-6)')
+
+# Shards selectable with --shard and their projects
+SHARD_PROJECTS = {
+    'navigation': 'Navigation',
+    'audi_hcp3': '"Audi HCP3"'
+}
 
 def main():
     load_dotenv()
     
-    # Initialize finder with Azure OpenAI
+    # Initialize finder with Azure OpenAI, or a local embedding backend
+    # such as 'hashing' set in EMBEDDING_BACKEND
     finder = JiraDuplicateFinder(
         jira_server=os.getenv('JIRA_SERVER'),
         jira_email=os.getenv('JIRA_EMAIL'),
-        jira_api_token=os.getenv('JIRA_PAT_TOKEN')
+        jira_api_token=os.getenv('JIRA_PAT_TOKEN'),
+        embedding_backend=os.getenv('EMBEDDING_BACKEND', 'azure')
     )
+
+    # Report where the time went, also when the run fails
+    try:
+        create_or_update(finder)
+    finally:
+        print("\nTime per stage:")
+        print(finder.metrics.report())
+        metrics_path = os.getenv('METRICS_PATH')
+        if metrics_path:
+            finder.metrics.dump(metrics_path)
+            print(f"Metrics written to {metrics_path}")
+
+def create_or_update(finder: JiraDuplicateFinder):
+    # A shard holds the bugs of one project in bug_database/<shard>/, built
+    # and refreshed on its own; without --shard, one database holds all projects
+    try:
+        shard = pop_option('--shard')
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    if shard is not None and shard not in SHARD_PROJECTS:
+        print(f"Error: Unknown shard '{shard}', expected one of {', '.join(SHARD_PROJECTS)}")
+        return
+
+    base_dir = os.path.join("./bug_database", shard) if shard else "./bug_database"
+    projects = SHARD_PROJECTS[shard] if shard else ', '.join(SHARD_PROJECTS.values())
+    jql_filter = f'project in ({projects}) AND {BUG_FILTER}'
+
+    # Incremental refresh of an existing database, or a new attempt at the
+    # tickets that failed when it was built or updated
+    if len(sys.argv) > 1 and sys.argv[1] in ('--update', '--retry-failed'):
+        if len(sys.argv) > 2:
+            db_path = os.path.join(base_dir, sys.argv[2])
+            if not os.path.exists(db_path):
+                print(f"Error: Database '{db_path}' not found")
+                return
+        else:
+            try:
+                db_path = get_latest_database(base_dir)
+            except ValueError as e:
+                print(f"Error: {e}")
+                return
+
+        print(f"Loading database: {db_path}")
+        finder.load_database(db_path)
+        print(f"Loaded {finder.num_bugs} bugs, last updated {finder.last_update}")
+
+        if sys.argv[1] == '--retry-failed':
+            if not finder.failed_tickets:
+                print("No failed tickets to retry")
+                return
+            new_path = finder.retry_failed(base_dir)
+            print(f"Database saved successfully: {new_path} ({len(finder.failed_tickets)} tickets still failing)")
+            return
+
+        print(f"Updating bugs with filter: {jql_filter}")
+        new_path = finder.update_database(jql_filter, base_dir)
+        print(f"Database updated successfully: {new_path} ({len(finder.bugs_data)} bugs)")
+        return
     
-    # Example JQL filter
-    jql_filter = ('project in (Navigation, "Audi HCP3") AND '
-                  'issuetype = Bug AND '
-                  '(Customer in (Audi_HCP3, Audi_OCI) OR Products in (Audi_HCP3, Audi_OCI)) AND '
-                  '("External Reference" is not EMPTY OR "Customer ID" is not EMPTY) AND '
-                  'created > startOfMonth(-6)')
-    
-    print(f"Fetching bugs with filter: {jql_filter}")
-    bugs_df = finder.fetch_bugs(jql_filter)
-    print(f"Found {len(bugs_df)} bugs")
-    
-    print("Building vector store...")
-    finder.build_vector_store(bugs_df)
-    
-    print("Saving database...")
-    finder.save_database("./bug_database")
-    print("Database saved successfully!")
+    # Every processed ticket and embedded batch is checkpointed, so rerunning
+    # after an interruption continues where the previous run stopped
+    print(f"Building database with filter: {jql_filter}")
+    db_path = finder.build_database(jql_filter, base_dir)
+    print(f"Database saved successfully: {db_path} ({finder.num_bugs} bugs)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
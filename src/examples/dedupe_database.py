@@ -0,0 +1,104 @@
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import faiss
+import numpy as np
+import pandas as pd
+
+# Add src to Python path
+src_path = str(Path(__file__).parent.parent)
+if src_path not in sys.path:
+    sys.path.append(src_path)
+
+from jira_duplicate_finder.clustering import duplicate_pairs, duplicate_clusters
+from jira_duplicate_finder.metadata_store import ColumnStore
+from examples.command_line import get_latest_database
+
+def load_row_metadata(db_path: str, num_vectors: int) -> pd.DataFrame:
+    """Bug metadata of every FAISS row, in row order."""
+    with open(Path(db_path) / 'snapshot.json', encoding='utf-8') as f:
+        snapshot = json.load(f)
+
+    store = ColumnStore(str(Path(db_path) / 'metadata'), snapshot['columns'])
+    metadata = store.to_dataframe(['key', 'summary', 'status', 'created', 'text'])
+    return metadata.iloc[:num_vectors].rename(columns={'text': 'processed_text'})
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find groups of near-duplicate bugs already in a database, without any API calls."
+    )
+    parser.add_argument('database_folder', nargs='?', help="Database folder, latest if not provided")
+    parser.add_argument('--threshold', type=float, default=0.92, help="Minimum cosine similarity (default: 0.92)")
+    parser.add_argument('--k', type=int, default=10, help="Neighbours compared per bug (default: 10)")
+    parser.add_argument('--block-size', type=int, default=2048, help="Bugs searched per block (default: 2048)")
+    parser.add_argument('--output', help="Output file prefix, defaults to <database>/duplicate_clusters")
+    args = parser.parse_args()
+
+    if args.database_folder:
+        db_path = os.path.join("./bug_database", args.database_folder)
+        if not os.path.exists(db_path):
+            print(f"Error: Database '{db_path}' not found")
+            return
+    else:
+        try:
+            db_path = get_latest_database()
+            print(f"\nUsing latest database: {db_path}")
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+
+    index = faiss.read_index(str(Path(db_path) / 'index.faiss'))
+    metadata = load_row_metadata(db_path, index.ntotal)
+    print(f"Loaded {index.ntotal} vectors")
+
+    firsts, seconds, similarities = duplicate_pairs(
+        index,
+        similarity_threshold=args.threshold,
+        k=args.k,
+        block_size=args.block_size
+    )
+    labels = duplicate_clusters(index.ntotal, firsts, seconds)
+
+    metadata['cluster'] = labels
+    clustered = metadata[metadata['cluster'] >= 0].sort_values(['cluster', 'key'])
+    print(f"Found {len(firsts)} duplicate pairs in {clustered['cluster'].nunique()} clusters "
+          f"covering {len(clustered)} bugs")
+
+    output_prefix = args.output or str(Path(db_path) / 'duplicate_clusters')
+
+    # Database files may be hard links shared with other databases, so
+    # earlier reports are replaced, never overwritten in place
+    for extension in ('csv', 'json'):
+        if os.path.exists(f"{output_prefix}.{extension}"):
+            os.remove(f"{output_prefix}.{extension}")
+
+    # One row per clustered bug
+    clustered.to_csv(f"{output_prefix}.csv", index=False)
+
+    # One entry per cluster, with its tickets and the pairs linking them
+    keys = metadata['key'].to_numpy()
+    pair_order = np.argsort(labels[firsts], kind='stable')
+    pair_bounds = np.searchsorted(labels[firsts][pair_order], np.arange(labels.max() + 2))
+    clusters = []
+    for cluster_id, tickets in clustered.groupby('cluster'):
+        in_cluster = pair_order[pair_bounds[cluster_id]:pair_bounds[cluster_id + 1]]
+        clusters.append({
+            'cluster': int(cluster_id),
+            'size': len(tickets),
+            'tickets': tickets.drop(columns='cluster').to_dict('records'),
+            'pairs': [
+                {'first': keys[first], 'second': keys[second], 'similarity': round(float(similarity), 4)}
+                for first, second, similarity in zip(firsts[in_cluster], seconds[in_cluster], similarities[in_cluster])
+            ]
+        })
+
+    with open(f"{output_prefix}.json", 'w', encoding='utf-8') as f:
+        json.dump(clusters, f, indent=2, default=str)
+
+    print(f"Clusters saved to: {output_prefix}.csv and {output_prefix}.json")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import os
+import sys
+import threading
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Add src to Python path
+src_path = str(Path(__file__).parent.parent)
+if src_path not in sys.path:
+    sys.path.append(src_path)
+
+from jira_duplicate_finder.duplicate_finder import JiraDuplicateFinder
+from jira_duplicate_finder.ingestion import EventIngestor, EventJournal, create_webhook_server, read_events
+from jira_duplicate_finder.server import latest_database
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Keep the latest database up to date from Jira webhook events, received over HTTP "
+                    "or replayed from a file, and save it as a new database at regular intervals."
+    )
+    parser.add_argument('--base-dir', default="./bug_database", help="Directory holding the databases")
+    parser.add_argument('--host', default="127.0.0.1", help="Address to receive webhooks on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8081, help="Port to receive webhooks on (default: 8081)")
+    parser.add_argument('--journal', help="File recording every received event, "
+                                          "defaults to events.jsonl in the base directory")
+    parser.add_argument('--replay', help="Apply the events of this file instead of receiving webhooks")
+    parser.add_argument('--follow', action='store_true', help="Keep applying events appended to the replayed file")
+    parser.add_argument('--jql', help="JQL filter of the database, tickets no longer matching it are removed")
+    parser.add_argument('--batch-size', type=int, default=100, help="Maximum tickets per batch (default: 100)")
+    parser.add_argument('--max-wait', type=float, default=5.0,
+                        help="Seconds a batch waits for more events after its first one (default: 5)")
+    parser.add_argument('--snapshot-interval', type=float, default=300.0,
+                        help="Minimum seconds between saved databases (default: 300)")
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    db_path = latest_database(args.base_dir)
+    if db_path is None:
+        print(f"Error: No database found in {args.base_dir}")
+        return
+
+    finder = JiraDuplicateFinder(
+        jira_server=os.getenv('JIRA_SERVER'),
+        jira_email=os.getenv('JIRA_EMAIL'),
+        jira_api_token=os.getenv('JIRA_PAT_TOKEN'),
+        **JiraDuplicateFinder.embedding_settings(db_path)
+    )
+    print(f"Loading database: {db_path}")
+    finder.load_database(db_path)
+    print(f"Loaded {finder.num_bugs} bugs")
+
+    ingestor = EventIngestor(
+        finder,
+        args.base_dir,
+        jql_filter=args.jql,
+        max_batch_size=args.batch_size,
+        max_wait=args.max_wait,
+        snapshot_interval=args.snapshot_interval
+    )
+    ingestor.start()
+
+    try:
+        if args.replay:
+            stop = threading.Event()
+            try:
+                for payload in read_events(args.replay, follow=args.follow, stop=stop):
+                    ingestor.submit(payload)
+            except KeyboardInterrupt:
+                stop.set()
+        else:
+            journal = EventJournal(args.journal or os.path.join(args.base_dir, 'events.jsonl'))
+            server = create_webhook_server(ingestor, args.host, args.port, journal)
+            print(f"Receiving webhooks on http://{args.host}:{args.port}, recorded in {journal.path}")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+            finally:
+                server.server_close()
+                journal.close()
+    finally:
+        print("Applying the remaining events...")
+        snapshot = ingestor.stop()
+        if snapshot:
+            print(f"Database saved successfully: {snapshot} ({finder.num_bugs} bugs)")
+        print("\nTime per stage:")
+        print(finder.metrics.report())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import argparse
+import hashlib
+import http.client
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Add src to Python path
+src_path = str(Path(__file__).parent.parent)
+if src_path not in sys.path:
+    sys.path.append(src_path)
+
+from jira_duplicate_finder.duplicate_finder import JiraDuplicateFinder
+from jira_duplicate_finder.server import DuplicateSearchService, create_server, latest_database
+
+class StubEmbeddings(Embeddings):
+    """
+    Embeddings without API calls: stored bug texts get their stored vectors
+    and other texts a random unit vector seeded by the text, after an
+    optional simulated request latency.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.vectors: Dict[str, np.ndarray] = {}
+        self.dimension = 0
+
+    def add_database(self, finder: JiraDuplicateFinder) -> None:
+        index = finder.vector_store.index
+        texts = finder.metadata_store.column('text').take(range(index.ntotal))
+        self.vectors = dict(zip(texts, index.reconstruct_n(0, index.ntotal)))
+        self.dimension = index.d
+
+    def _embed(self, text: str) -> List[float]:
+        if text in self.vectors:
+            return self.vectors[text].tolist()
+        seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+        vector = np.random.default_rng(seed).normal(size=self.dimension)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+def run_client(port, path, bodies):
+    """Send requests over one kept-alive connection. Returns the latency of each and the error count."""
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    latencies = []
+    errors = 0
+    for body in bodies:
+        started = time.perf_counter()
+        connection.request('POST', path, body=json.dumps(body), headers={'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - started)
+        if response.status != 200:
+            errors += 1
+    connection.close()
+    return latencies, errors
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test the duplicate search server locally, with a stub embedder instead of Azure OpenAI."
+    )
+    parser.add_argument('--base-dir', default="./bug_database", help="Directory holding the databases")
+    parser.add_argument('--clients', type=int, default=8, help="Concurrent clients (default: 8)")
+    parser.add_argument('--requests', type=int, default=2000, help="Total requests (default: 2000)")
+    parser.add_argument('--batch-size', type=int, default=0,
+                        help="Queries per /duplicates/batch request, 0 for single /duplicates requests")
+    parser.add_argument('--embed-latency-ms', type=float, default=0.0,
+                        help="Simulated embedding request latency (default: 0)")
+    parser.add_argument('--threshold', type=float, default=0.85, help="Similarity threshold (default: 0.85)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    database = latest_database(args.base_dir)
+    if database is None:
+        print(f"Error: No database found in {args.base_dir}")
+        return
+
+    embeddings = StubEmbeddings(args.embed_latency_ms / 1000)
+    finder = JiraDuplicateFinder(
+        jira_server=None,
+        jira_email=None,
+        jira_api_token=None,
+        use_embedding_cache=False,
+        **JiraDuplicateFinder.embedding_settings(database)
+    )
+    finder.embeddings = embeddings
+
+    try:
+        service = DuplicateSearchService(finder, args.base_dir)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    embeddings.add_database(service.finder)
+    print(f"Serving database {service.database} with {service.finder.num_bugs} bugs")
+
+    server = create_server(service, port=0)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Queries are stored bug texts, half of them with a word dropped so they miss the stub's lookup
+    rng = np.random.default_rng(args.seed)
+    texts = [text for text in service.finder.metadata_store.column('text').to_list() if text]
+    def query():
+        words = texts[rng.integers(len(texts))].split()
+        if len(words) > 1 and rng.random() < 0.5:
+            del words[rng.integers(len(words))]
+        return ' '.join(words)
+
+    if args.batch_size:
+        path = '/duplicates/batch'
+        bodies = [{'queries': [query() for _ in range(args.batch_size)], 'similarity_threshold': args.threshold}
+                  for _ in range(args.requests)]
+    else:
+        path = '/duplicates'
+        bodies = [{'text': query(), 'similarity_threshold': args.threshold} for _ in range(args.requests)]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        outcomes = list(executor.map(
+            lambda client: run_client(port, path, bodies[client::args.clients]), range(args.clients)
+        ))
+    elapsed = time.perf_counter() - started
+
+    server.shutdown()
+    server.server_close()
+
+    latencies = np.concatenate([latencies for latencies, _ in outcomes]) * 1000
+    errors = sum(errors for _, errors in outcomes)
+    queries = args.requests * (args.batch_size or 1)
+
+    print(f"\n{args.requests} requests ({queries} queries) from {args.clients} clients in {elapsed:.2f}s")
+    print(f"Throughput: {args.requests / elapsed:.0f} requests/s, {queries / elapsed:.0f} queries/s")
+    print(f"Latency ms: p50 {np.percentile(latencies, 50):.1f}, p95 {np.percentile(latencies, 95):.1f}, "
+          f"p99 {np.percentile(latencies, 99):.1f}, max {latencies.max():.1f}")
+    print(f"Errors: {errors}")
+
+if __name__ == "__main__":
+    main()
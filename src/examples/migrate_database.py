@@ -0,0 +1,39 @@
+import os
+import sys
+from pathlib import Path
+
+# Add src to Python path
+src_path = str(Path(__file__).parent.parent)
+if src_path not in sys.path:
+    sys.path.append(src_path)
+
+from jira_duplicate_finder.duplicate_finder import JiraDuplicateFinder
+
+def main(directory='./bug_database'):
+    """
+    Convert databases to the current format: a cosine similarity index and
+    columnar metadata instead of the pickled index.pkl and metadata.pkl.
+    Usage: python migrate_database.py [database_folder]
+    Without a database folder, every database under bug_database/ is migrated.
+    """
+    if len(sys.argv) > 1:
+        db_names = [sys.argv[1]]
+    elif os.path.exists(directory):
+        db_names = sorted(d for d in os.listdir(directory) if d.startswith('db_'))
+    else:
+        print("Error: No database directory found")
+        return
+
+    for db_name in db_names:
+        db_path = os.path.join(directory, db_name)
+        if not os.path.exists(os.path.join(db_path, 'index.faiss')):
+            print(f"Skipping {db_path}: no index.faiss found")
+            continue
+
+        if JiraDuplicateFinder.migrate_database(db_path):
+            print(f"Migrated {db_path} to the current format")
+        else:
+            print(f"{db_path} already uses the current format")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 import os
+import re
 import sys
 from pathlib import Path
 from dotenv import load_dotenv
-from jira import JIRA
 
 
 # Add src to Python path
@@ -11,22 +11,85 @@ if src_path not in sys.path:
     sys.path.append(src_path)
 
 from jira_duplicate_finder.duplicate_finder import JiraDuplicateFinder
-from preprocessing.text_processor import TextProcessor
+from jira_duplicate_finder.shards import ShardedFinder, shard_directories
+from jira_duplicate_finder.snapshots import snapshot_directories
+from examples.command_line import get_latest_database, pop_option
 
-def get_latest_database(base_dir: str = "./bug_database") -> str:
-    """Get the most recent database directory."""
-    if not os.path.exists(base_dir):
-        raise ValueError("No database directory found")
-        
-    databases = [d for d in os.listdir(base_dir) if d.startswith('db_')]
-    if not databases:
-        raise ValueError("No databases found")
-        
-    return os.path.join(base_dir, sorted(databases, reverse=True)[0])
+TICKET_ID_PATTERN = re.compile(r'^[A-Z][A-Z0-9_]*-\d+$')
+
+def print_duplicates(duplicates):
+    if not duplicates:
+        print("\nNo similar bugs found.")
+        return
+    
+    print(f"\nFound {len(duplicates)} potential duplicates:")
+    for dup in duplicates:
+        shard = f", shard {dup['shard']}" if 'shard' in dup else ""
+        print(f"\nBug {dup['key']} (Similarity: {dup['similarity']:.2%}{shard})")
+        print(f"Title: {dup['summary']}")
+        print(f"Processed Summary: {dup['processed_text']}")  # 
+        print(f"Status: {dup['status']}")
+        print(f"Created: {dup['created']}")
+        print(f"Text length: {dup['text_length']} characters")
+
+def run_batch(finder, searcher, source):
+    """
+    Search duplicates for every ticket ID or text line of a file, or stdin if
+    source is '-'. Tickets are fetched by finder and searched by searcher.
+    """
+    if source == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(source, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    
+    queries = [line.strip() for line in lines if line.strip()]
+    ticket_ids = [query for query in queries if TICKET_ID_PATTERN.match(query)]
+
+    # Fetch and preprocess all tickets together
+    processed_tickets = {}
+    if ticket_ids:
+        tickets_df = finder.fetch_bugs_by_key(ticket_ids)
+        processed_tickets = dict(zip(tickets_df['key'], tickets_df['text']))
+
+    search_queries = []
+    search_ticket_ids = []
+    for query in queries:
+        if query in ticket_ids:
+            if not processed_tickets.get(query):
+                print(f"\nError processing ticket {query}: not found or could not be processed")
+                continue
+            search_queries.append(processed_tickets[query])
+            search_ticket_ids.append(query)
+        else:
+            search_queries.append(query)
+            search_ticket_ids.append(None)
+
+    print(f"\nSearching for similar bugs for {len(search_queries)} queries...")
+    results = searcher.find_duplicates_many(
+        search_queries,
+        query_ticket_ids=search_ticket_ids,
+        num_similar=5,
+        similarity_threshold=0.85
+    )
+
+    for processed_query, ticket_id, duplicates in zip(search_queries, search_ticket_ids, results):
+        print("\n" + "=" * 80)
+        print(f"Input ticket ID: {ticket_id}" if ticket_id else "Input text:")
+        print(f"Processed summary: {processed_query}")
+        print_duplicates(duplicates)
 
 def main():
     load_dotenv()
 
+    # Shards are searched together, as one database
+    try:
+        shards = pop_option('--shards')
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    shard_names = None if shards in (None, 'all') else shards.split(',')
+
     # Check command line arguments
     if len(sys.argv) < 2:
         print("\nUsage:")
@@ -34,6 +97,10 @@ def main():
         print("   python query_database.py --ticket NAV-12345 [database_folder]")
         print("2. Search by text description:")
         print("   python query_database.py --text \"Displays incorrect route guidance\" [database_folder]")
+        print("3. Search many ticket IDs or text descriptions, one per line, from a file or stdin (-):")
+        print("   python query_database.py --batch queries.txt [database_folder]")
+        print("4. Search by keywords (titles, error codes, places) without any API call:")
+        print("   python query_database.py --lexical \"E1234 Tokyo\" [database_folder]")
         print("\nFormat for text description:")
         print("[Action verb] + [Core behavior] + [Regional pattern if systematic]")
         print("\nExamples:")
@@ -41,23 +108,32 @@ def main():
         print("- \"Announces incorrect exit numbers at roundabouts\"")
         print("- \"Displays wrong lane guidance during navigation\"")
         print("\nNote: If database_folder is not provided, latest will be used")
+        print("Add --shards navigation,audi_hcp3 (or --shards all) to search the latest database of these shards")
         return
     
     # Parse search type
     search_type = sys.argv[1]
-    if search_type not in ['--ticket', '--text']:
-        print("Error: First argument must be either --ticket or --text")
+    if search_type not in ['--ticket', '--text', '--batch', '--lexical']:
+        print("Error: First argument must be either --ticket, --text, --batch or --lexical")
         return
 
     # Get query
     if len(sys.argv) < 3:
-        print("Error: Please provide ticket ID or text description")
+        print("Error: Please provide ticket ID, text description or batch file")
         return
     
     query = sys.argv[2]
 
-    # Get database path from command line argument or use latest
-    if len(sys.argv) > 3:
+    # Get database path from command line argument or use latest. All
+    # shards use the same embeddings, the first one tells which.
+    if shards:
+        available = shard_directories("./bug_database")
+        first = (shard_names or list(available) or [None])[0]
+        if first not in available:
+            print(f"Error: Shard '{first}' not found in ./bug_database")
+            return
+        db_path = snapshot_directories(available[first])[-1]
+    elif len(sys.argv) > 3:
         db_name = sys.argv[3]
         db_path = os.path.join("./bug_database", db_name)
         if not os.path.exists(db_path):
@@ -72,28 +148,31 @@ def main():
             return
 
     try:
+        # Jira and GPT clients are only connected for ticket lookups
         finder = JiraDuplicateFinder(
             jira_server=os.getenv('JIRA_SERVER'),
             jira_email=os.getenv('JIRA_EMAIL'),
-            jira_api_token=os.getenv('JIRA_PAT_TOKEN')
+            jira_api_token=os.getenv('JIRA_PAT_TOKEN'),
+            **JiraDuplicateFinder.embedding_settings(db_path)
         )
 
         print("Loading database...")
-        finder.load_database(db_path)
-        print(f"Loaded {len(finder.bugs_data)} bugs")
-
-        if search_type == '--ticket':
-            # Initialize Jira client
-            jira = JIRA(
-                server=os.getenv('JIRA_SERVER'),
-                basic_auth=(os.getenv('JIRA_EMAIL'), os.getenv('JIRA_PAT_TOKEN'))
-            )
+        if shards:
+            searcher = ShardedFinder(finder, "./bug_database", shard_names)
+            print(f"Loaded {searcher.num_bugs} bugs from shards {', '.join(searcher.databases)}")
+        else:
+            finder.load_database(db_path, search_only=True)
+            searcher = finder
+            print(f"Loaded {finder.num_bugs} bugs")
 
-            issue = jira.issue(query)
+        if search_type == '--batch':
+            run_batch(finder, searcher, query)
+            return
 
-            text_processor = TextProcessor()
+        if search_type == '--ticket':
+            issue = finder.jira.issue(query)
 
-            processed_query = text_processor.preprocess_ticket(
+            processed_query = finder.text_processor.preprocess_ticket(
                 title=issue.fields.summary or '',
                 description=issue.fields.description or '',
                 analysis_findings=getattr(issue.fields, 'customfield_10357', None) or '',
@@ -110,25 +189,16 @@ def main():
         print(f"Processed summary: {processed_query}")
         print("\nSearching for similar bugs...")
 
-        duplicates = finder.find_duplicates(
+        # BM25 similarities run lower than cosine similarities
+        duplicates = searcher.find_duplicates(
             processed_query,
             query_ticket_id=query if search_type == '--ticket' else None, 
             num_similar=5,
-            similarity_threshold=0.7
+            similarity_threshold=0.3 if search_type == '--lexical' else 0.85,
+            retrieval='lexical' if search_type == '--lexical' else 'vector'
         )
 
-        if not duplicates:
-            print("\nNo similar bugs found.")
-            return
-        
-        print(f"\nFound {len(duplicates)} potential duplicates:")
-        for dup in duplicates:
-            print(f"\nBug {dup['key']} (Similarity: {dup['similarity_score']})")
-            print(f"Title: {dup['summary']}")
-            print(f"Processed Summary: {dup['processed_text']}")  # 
-            print(f"Status: {dup['status']}")
-            print(f"Created: {dup['created']}")
-            print(f"Text length: {dup['text_length']} characters")
+        print_duplicates(duplicates)
 
     except Exception as e:
         error_msg = f"Error processing {'ticket' if search_type == '--ticket' else 'text'} {query}: {str(e)}"
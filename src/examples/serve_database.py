@@ -0,0 +1,61 @@
+import argparse
+import os
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Add src to Python path
+src_path = str(Path(__file__).parent.parent)
+if src_path not in sys.path:
+    sys.path.append(src_path)
+
+from jira_duplicate_finder.duplicate_finder import JiraDuplicateFinder
+from jira_duplicate_finder.server import DuplicateSearchService, create_server, latest_database
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve duplicate searches over HTTP from the latest database, kept loaded in memory."
+    )
+    parser.add_argument('--host', default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8080, help="Port to listen on (default: 8080)")
+    parser.add_argument('--base-dir', default="./bug_database", help="Directory holding the databases")
+    parser.add_argument('--poll-interval', type=float, default=10.0,
+                        help="Seconds between checks for a newer database (default: 10)")
+    parser.add_argument('--mmap-index', action='store_true',
+                        help="Memory-map the index vectors, shared by all servers on this machine")
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    # Jira credentials are only used for searches by ticket ID. Queries are
+    # embedded like the latest database, newer ones must use the same embeddings.
+    database = latest_database(args.base_dir)
+    finder = JiraDuplicateFinder(
+        jira_server=os.getenv('JIRA_SERVER'),
+        jira_email=os.getenv('JIRA_EMAIL'),
+        jira_api_token=os.getenv('JIRA_PAT_TOKEN'),
+        mmap_index=args.mmap_index,
+        **(JiraDuplicateFinder.embedding_settings(database) if database else {})
+    )
+
+    try:
+        service = DuplicateSearchService(finder, args.base_dir, args.poll_interval)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+
+    print(f"Serving database {service.database} with {service.finder.num_bugs} bugs")
+    service.start_watching()
+
+    server = create_server(service, args.host, args.port)
+    print(f"Listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop_watching()
+
+if __name__ == "__main__":
+    main()
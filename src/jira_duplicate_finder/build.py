@@ -0,0 +1,268 @@
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+from jira_duplicate_finder.snapshots import publish_snapshot
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]) -> None:
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def _append_durably(path: str, data: bytes) -> None:
+    with open(path, 'ab') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class BuildCheckpoint:
+    """
+    On-disk progress of a streaming database build.
+
+    A build writes into <base_dir>/build_<timestamp>/ and is renamed to
+    db_<timestamp> once complete, so unfinished builds are never picked up
+    as databases. Every processed chunk of tickets is kept in progress/ as
+    its records (chunk_<n>.jsonl) and the normalized vectors of the records
+    with processed text (chunk_<n>.npy). progress/state.json records the
+    chunks written and how far into the Jira results the build got, and is
+    only updated after a chunk's files are complete.
+
+    Within the chunk in progress, every preprocessed ticket and every
+    embedded batch is appended to pending_<n>.jsonl (and the vectors to
+    pending_<n>.f32) as soon as it is done, so a rerun only redoes the
+    tickets that were in flight. Tickets that failed are kept in the state
+    until they succeed.
+    """
+
+    def __init__(self, path: str, state: Dict[str, Any]):
+        self.path = path
+        self.state = state
+
+    @property
+    def progress_path(self) -> str:
+        return os.path.join(self.path, 'progress')
+
+    @classmethod
+    def open(
+        cls,
+        base_dir: str,
+        jql_filter: str,
+        max_results: Optional[int],
+        resume: bool = True
+    ) -> 'BuildCheckpoint':
+        """
+        Resume the latest unfinished build of the same query, or start a new one.
+
+        Args:
+            base_dir: Directory holding the databases
+            jql_filter: JQL query of the build
+            max_results: Maximum number of tickets of the build
+            resume: Set to False to always start a new build
+        """
+        if resume and os.path.isdir(base_dir):
+            for name in sorted((d for d in os.listdir(base_dir) if d.startswith('build_')), reverse=True):
+                state_path = os.path.join(base_dir, name, 'progress', 'state.json')
+                if not os.path.exists(state_path):
+                    continue
+                with open(state_path, encoding='utf-8') as f:
+                    state = json.load(f)
+                if state['jql_filter'] == jql_filter and state['max_results'] == max_results:
+                    return cls(os.path.join(base_dir, name), state)
+
+        started = datetime.now()
+        checkpoint = cls(os.path.join(base_dir, f"build_{started:%Y%m%d_%H%M%S}"), {
+            'jql_filter': jql_filter,
+            'max_results': max_results,
+            # Taken before querying, like fetch_bugs
+            'fetch_started': started.isoformat(),
+            'fetched': 0,
+            'fetch_complete': False,
+            'chunks': 0,
+            'failed': {}
+        })
+        os.makedirs(checkpoint.progress_path, exist_ok=True)
+        checkpoint._save_state()
+        return checkpoint
+
+    @property
+    def fetch_started(self) -> datetime:
+        return datetime.fromisoformat(self.state['fetch_started'])
+
+    @property
+    def fetched(self) -> int:
+        """Number of Jira results, in query order, covered by the saved chunks."""
+        return self.state['fetched']
+
+    @property
+    def fetch_complete(self) -> bool:
+        return self.state['fetch_complete']
+
+    @property
+    def chunks(self) -> int:
+        return self.state['chunks']
+
+    def _save_state(self) -> None:
+        _write_json_atomic(os.path.join(self.progress_path, 'state.json'), self.state)
+
+    def _chunk_path(self, chunk: int, extension: str) -> str:
+        return os.path.join(self.progress_path, f"chunk_{chunk:05d}.{extension}")
+
+    def _pending_path(self, extension: str) -> str:
+        return os.path.join(self.progress_path, f"pending_{self.chunks:05d}.{extension}")
+
+    def record_ticket(self, key: str, bug: Optional[Dict[str, Any]], error: Optional[str]) -> None:
+        """
+        Durably record the preprocessing outcome of a ticket of the chunk in progress.
+
+        Args:
+            key: Ticket key
+            bug: Bug record, None if preprocessing failed
+            error: Failure reason, None on success
+        """
+        entry = {'key': key, 'stage': 'preprocess', 'bug': bug, 'error': error}
+        _append_durably(self._pending_path('jsonl'), (json.dumps(entry, default=str) + '\n').encode('utf-8'))
+
+    def record_embedding_failure(self, key: str, error: str) -> None:
+        """Durably record a ticket of the chunk in progress that could not be embedded."""
+        entry = {'key': key, 'stage': 'embed', 'error': error}
+        _append_durably(self._pending_path('jsonl'), (json.dumps(entry) + '\n').encode('utf-8'))
+
+    def record_vectors(self, keys: List[str], vectors: np.ndarray) -> None:
+        """Durably record a batch of normalized vectors of the chunk in progress."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        # Vectors first, so a recorded batch always has its vectors
+        _append_durably(self._pending_path('f32'), vectors.tobytes())
+        entry = {'stage': 'embed', 'keys': keys, 'dimension': vectors.shape[1]}
+        _append_durably(self._pending_path('jsonl'), (json.dumps(entry) + '\n').encode('utf-8'))
+
+    def pending(self) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, np.ndarray], Dict[str, Dict[str, str]]]:
+        """
+        Progress recorded for the chunk in progress.
+
+        Returns:
+            Bug records by key of the preprocessed tickets, vectors by key of
+            the embedded tickets, and the failures of the saved chunks and of
+            the chunk in progress by key
+        """
+        # Left over when a run stopped between saving a chunk and clearing its progress
+        for name in os.listdir(self.progress_path):
+            if name.startswith('pending_') and int(name[len('pending_'):].split('.')[0]) < self.chunks:
+                os.remove(os.path.join(self.progress_path, name))
+
+        records, vectors, failed = {}, {}, dict(self.state.get('failed', {}))
+        log_path = self._pending_path('jsonl')
+        if not os.path.exists(log_path):
+            return records, vectors, failed
+
+        # Drop a write cut short by the interruption before appending again
+        with open(log_path, 'rb+') as f:
+            log = f.read()
+            f.truncate(log.rfind(b'\n') + 1)
+        entries = [json.loads(line) for line in log.decode('utf-8').splitlines(keepends=True) if line.endswith('\n')]
+
+        vectors_path = self._pending_path('f32')
+        all_vectors = np.fromfile(vectors_path, dtype=np.float32) if os.path.exists(vectors_path) else np.empty(0)
+        offset = 0
+        for entry in entries:
+            if 'keys' in entry:
+                batch = all_vectors[offset:offset + len(entry['keys']) * entry['dimension']]
+                offset += batch.size
+                vectors.update(zip(entry['keys'], batch.reshape(-1, entry['dimension'])))
+                for key in entry['keys']:
+                    failed.pop(key, None)
+            elif entry['error'] is None:
+                records[entry['key']] = entry['bug']
+                failed.pop(entry['key'], None)
+            else:
+                if entry.get('bug') is not None:
+                    records[entry['key']] = entry['bug']
+                failed[entry['key']] = {'key': entry['key'], 'stage': entry['stage'], 'error': entry['error']}
+
+        if os.path.exists(vectors_path):
+            os.truncate(vectors_path, offset * all_vectors.itemsize)
+
+        return records, vectors, failed
+
+    def save_chunk(
+        self,
+        bugs_df: 'pd.DataFrame',
+        vectors: np.ndarray,
+        fetched: int,
+        failed: Optional[Dict[str, Dict[str, str]]] = None
+    ) -> None:
+        """
+        Save a processed chunk and clear the progress of the chunk in progress.
+
+        Args:
+            bugs_df: Bug records of the chunk
+            vectors: Normalized vectors of the records with processed text, in order
+            fetched: Number of Jira results covered once this chunk is saved
+            failed: Failed tickets by key, of this chunk and the previous ones
+        """
+        chunk = self.chunks
+
+        np.save(self._chunk_path(chunk, 'tmp.npy'), vectors)
+        bugs_df.to_json(self._chunk_path(chunk, 'jsonl.tmp'), orient='records', lines=True, force_ascii=False)
+        os.replace(self._chunk_path(chunk, 'tmp.npy'), self._chunk_path(chunk, 'npy'))
+        os.replace(self._chunk_path(chunk, 'jsonl.tmp'), self._chunk_path(chunk, 'jsonl'))
+
+        self.state['chunks'] = chunk + 1
+        self.state['fetched'] = fetched
+        if failed is not None:
+            self.state['failed'] = failed
+        self._save_state()
+
+        for extension in ('jsonl', 'f32'):
+            path = os.path.join(self.progress_path, f"pending_{chunk:05d}.{extension}")
+            if os.path.exists(path):
+                os.remove(path)
+
+    def complete_fetch(self) -> None:
+        """Record that every Jira result has been processed."""
+        self.state['fetch_complete'] = True
+        self._save_state()
+
+    def iter_chunks(self) -> Iterator[Tuple['pd.DataFrame', np.ndarray]]:
+        """Yield the records and memory-mapped vectors of every saved chunk, in order."""
+        import pandas as pd
+
+        for chunk in range(self.chunks):
+            records_path = self._chunk_path(chunk, 'jsonl')
+            if os.path.getsize(records_path):
+                bugs_df = pd.read_json(records_path, orient='records', lines=True, dtype=False, convert_dates=False)
+            else:
+                bugs_df = pd.DataFrame()
+            yield bugs_df, np.load(self._chunk_path(chunk, 'npy'), mmap_mode='r')
+
+    @property
+    def failed(self) -> Dict[str, Dict[str, str]]:
+        """Failed tickets of the saved chunks by key, with the failed stage and error."""
+        return self.state.get('failed', {})
+
+    def keys(self) -> Set[str]:
+        """Keys of all tickets in the saved chunks."""
+        return {key for bugs_df, _ in self.iter_chunks() for key in bugs_df.get('key', [])}
+
+    def finish(self, base_dir: str) -> str:
+        """
+        Move the completed build to a new database directory of base_dir and
+        drop the progress files.
+
+        Returns:
+            The database directory
+        """
+        self.path = publish_snapshot(self.path, base_dir)
+        shutil.rmtree(self.progress_path)
+        return self.path
@@ -0,0 +1,86 @@
+from typing import Tuple
+
+import faiss
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from tqdm import tqdm
+
+from jira_duplicate_finder.vector_index import scores_to_similarity
+
+
+def duplicate_pairs(
+    index: faiss.Index,
+    similarity_threshold: float = 0.92,
+    k: int = 10,
+    block_size: int = 2048
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Find all pairs of near-duplicate vectors already stored in an index.
+
+    Runs a blocked k-nearest-neighbour self-join: vectors are reconstructed
+    block_size at a time and searched against the whole index, so memory
+    stays bounded by the block and no embedding calls are made. Each vector
+    is linked to at most k neighbours.
+
+    Args:
+        index: FAISS index holding the vectors
+        similarity_threshold: Minimum cosine similarity of a pair
+        k: Neighbours to consider per vector
+        block_size: Vectors searched per block
+
+    Returns:
+        Row ids of the first and second vector and the similarity of each
+        pair, with every unordered pair reported once
+    """
+    firsts, seconds, similarities = [], [], []
+
+    for start in tqdm(range(0, index.ntotal, block_size), desc="Searching neighbours"):
+        count = min(block_size, index.ntotal - start)
+        vectors = index.reconstruct_n(start, count)
+
+        # One extra neighbour, as every vector finds itself
+        scores, neighbours = index.search(vectors, min(k + 1, index.ntotal))
+        block_similarities = scores_to_similarity(index, scores)
+
+        rows = np.broadcast_to(np.arange(start, start + count)[:, None], neighbours.shape)
+        mask = (neighbours != -1) & (neighbours != rows) & (block_similarities >= similarity_threshold)
+
+        firsts.append(np.minimum(rows[mask], neighbours[mask]))
+        seconds.append(np.maximum(rows[mask], neighbours[mask]))
+        similarities.append(block_similarities[mask])
+
+    if not firsts:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=np.float32)
+
+    firsts = np.concatenate(firsts)
+    seconds = np.concatenate(seconds)
+    similarities = np.concatenate(similarities)
+
+    # Pairs found from both sides are kept once
+    _, unique = np.unique(np.stack([firsts, seconds], axis=1), axis=0, return_index=True)
+    return firsts[unique], seconds[unique], similarities[unique]
+
+
+def duplicate_clusters(num_vectors: int, firsts: np.ndarray, seconds: np.ndarray) -> np.ndarray:
+    """
+    Group vectors into connected components of the duplicate pair graph.
+
+    Returns a cluster label per vector; vectors without any duplicate get -1.
+    Cluster labels are numbered from 0 by decreasing cluster size.
+    """
+    graph = coo_matrix(
+        (np.ones(len(firsts), dtype=np.int8), (firsts, seconds)),
+        shape=(num_vectors, num_vectors)
+    )
+    _, components = connected_components(graph, directed=False)
+
+    sizes = np.bincount(components)
+
+    clustered = np.flatnonzero(sizes > 1)
+    ordered = clustered[np.argsort(-sizes[clustered], kind='stable')]
+    relabel = np.full(len(sizes), -1, dtype=np.int64)
+    relabel[ordered] = np.arange(len(ordered))
+
+    return relabel[components]
@@ -0,0 +1,61 @@
+import os
+from typing import Any, Callable
+
+import pytest
+
+from benchmarks.fake_services import FakeJira, FakeOpenAI, synthetic_tickets
+from jira_duplicate_finder.duplicate_finder import JiraDuplicateFinder
+
+
+@pytest.fixture
+def fake_openai(tmp_path, monkeypatch):
+    """Azure OpenAI stand-in answering the summaries, with a fresh summary cache."""
+    openai = FakeOpenAI(dimension=64)
+    monkeypatch.setenv('AZURE_OPENAI_ENDPOINT', openai.start())
+    monkeypatch.setenv('AZURE_OPENAI_API_KEY', 'test')
+    monkeypatch.setenv('SUMMARY_CACHE_PATH', str(tmp_path / 'summaries.sqlite'))
+    yield openai
+    openai.stop()
+
+
+@pytest.fixture
+def fake_jira():
+    """Jira stand-in, call it with the number of synthetic tickets it holds."""
+    servers = []
+
+    def start(num_tickets: int) -> FakeJira:
+        jira = FakeJira(synthetic_tickets(num_tickets))
+        jira.start()
+        servers.append(jira)
+        return jira
+
+    yield start
+    for jira in servers:
+        jira.stop()
+
+
+@pytest.fixture
+def make_finder(fake_openai, tmp_path, monkeypatch) -> Callable[..., JiraDuplicateFinder]:
+    """
+    Finders on a fake Jira, summarized by the fake Azure OpenAI and embedded
+    locally with hashing embeddings. Databases go to tmp_path/bug_database.
+    """
+    monkeypatch.chdir(tmp_path)
+
+    def make(jira: FakeJira, **options: Any) -> JiraDuplicateFinder:
+        return JiraDuplicateFinder(
+            jira_server=jira.url,
+            jira_email='test@example.com',
+            jira_api_token='test',
+            embedding_backend='hashing',
+            embedding_options={'dimension': 64},
+            max_in_flight=16,
+            **options
+        )
+
+    return make
+
+
+@pytest.fixture
+def base_dir(tmp_path) -> str:
+    return os.path.join(str(tmp_path), 'bug_database')
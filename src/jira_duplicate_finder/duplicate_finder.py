@@ -1,15 +1,18 @@
-from langchain_openai import AzureOpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from jira import JIRA
-import pandas as pd
+import copy
+import functools
+import itertools
+import faiss
+import numpy as np
 import os
 from dotenv import load_dotenv
 import pickle
-from typing import List, Dict, Optional, Union, Any
+import shutil
+from typing import TYPE_CHECKING, List, Dict, Optional, Union, Any, Callable, Iterable, Iterator, Tuple
 from tqdm import tqdm
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import json
 from datetime import datetime
-from time import sleep
 import sys
 from pathlib import Path
 
@@ -18,84 +21,456 @@ src_path = str(Path(__file__).parent.parent)
 if src_path not in sys.path:
     sys.path.append(src_path)
 
-from preprocessing.text_processor import TextProcessor
+from preprocessing.rate_limit import RateLimitHeaders, TokenBucket, is_rate_limit_error
+from preprocessing.cache import DiskCache
+from jira_duplicate_finder.embeddings import (
+    CachedEmbeddings, local_embeddings, register_langchain_embeddings, EMBEDDING_BACKENDS
+)
+from jira_duplicate_finder.vector_index import (
+    scores_to_similarity, to_inner_product_index, create_index, index_type_of, search_parameters,
+    read_index, without_rows, INDEX_TYPES, SearchIndex
+)
+from jira_duplicate_finder.metadata_store import ColumnStore, ColumnStoreWriter, ColumnarDocstore, write_column_store
+from jira_duplicate_finder.build import BuildCheckpoint
+from jira_duplicate_finder.lexical import BM25Index
+from jira_duplicate_finder.snapshots import publish_snapshot, staging_directory
+from jira_duplicate_finder.query_cache import LRUCache
+from jira_duplicate_finder.summaries import SUMMARY_FORMATS, summaries_filename, write_summaries
+from jira_duplicate_finder.metrics import Metrics
+
+# The Jira, OpenAI and LangChain modules take a second or more to import, so
+# they are only imported once a client or a mutable store is needed. pandas
+# waits for bug records (builds, updates, date filters), scipy for lexical
+# searches, so loading a database and searching it by vector needs neither.
+if TYPE_CHECKING:
+    import pandas as pd
+
+# LangChain DistanceStrategy value of each FAISS metric, as saved in snapshot.json
+DISTANCE_STRATEGIES = {
+    faiss.METRIC_INNER_PRODUCT: "MAX_INNER_PRODUCT",
+    faiss.METRIC_L2: "EUCLIDEAN_DISTANCE"
+}
+
+DEFAULT_EMBEDDING_CACHE_PATH = os.path.join(".", "cache", "embeddings.sqlite")
+
+# Vectors used to train approximate indexes in streaming builds
+TRAINING_SAMPLE_SIZE = 100_000
+
+# How find_duplicates matches: by embedding, by BM25 without any API call, or both
+RETRIEVAL_MODES = ('vector', 'hybrid', 'lexical')
+
+# Version of the on-disk snapshot layout written by save_database
+SNAPSHOT_FORMAT = 2
+
+# Texts embedded between two progress records of a build
+EMBEDDING_CHECKPOINT_SIZE = 100
+
+
+def _timed(stage: str):
+    """Record the duration of every call of a finder method in its metrics."""
+    def decorate(method):
+        @functools.wraps(method)
+        def timed(self, *args, **kwargs):
+            with self.metrics.timer(stage):
+                return method(self, *args, **kwargs)
+        return timed
+    return decorate
+
+
+def _utc_datetime64(value: Union[str, datetime]) -> np.datetime64:
+    """Convert a date to naive UTC; dates without a timezone are taken as UTC."""
+    import pandas as pd
+
+    timestamp = pd.Timestamp(value)
+    timestamp = timestamp.tz_localize('UTC') if timestamp.tzinfo is None else timestamp.tz_convert('UTC')
+    return timestamp.tz_localize(None).to_datetime64()
 
 class JiraDuplicateFinder:
     """A class to find duplicate Jira bugs using semantic similarity with Azure OpenAI."""
+
+    BUG_COLUMNS = ['key', 'summary', 'description', 'created', 'updated',
+                   'status', 'priority', 'labels', 'text']
+
+    # Only the fields used for preprocessing and metadata, including
+    # Analysis Findings (customfield_10357) and Additional Information (customfield_10356)
+    ISSUE_FIELDS = ('summary,description,created,updated,status,labels,priority,'
+                    'customfield_10357,customfield_10356')
+
+    # Share of deleted rows an approximate index may hold before it is rebuilt
+    MAX_DELETED_RATIO = 0.2
     
     def __init__(
         self,
-        jira_server: str,
-        jira_email: str,
-        jira_api_token: str,
+        jira_server: Optional[str],
+        jira_email: Optional[str],
+        jira_api_token: Optional[str],
         azure_deployment: str = "dep-embed-ada",
         azure_api_version: str = "2024-10-21",
         chunk_size: int = 1000,
-        model: str = "text-embedding-ada-002"
+        model: str = "text-embedding-ada-002",
+        max_in_flight: int = 8,
+        requests_per_minute: Optional[float] = None,
+        max_page_fetches: int = 4,
+        use_embedding_cache: bool = True,
+        index_type: str = 'flat',
+        index_params: Optional[Dict[str, Any]] = None,
+        nprobe: int = 16,
+        ef_search: int = 64,
+        embedding_backend: str = 'azure',
+        embedding_options: Optional[Dict[str, Any]] = None,
+        summaries_format: str = 'jsonl',
+        query_cache_size: int = 1024,
+        metrics: Optional[Metrics] = None,
+        mmap_index: bool = False
     ):
         """
         Initialize the JiraDuplicateFinder with Azure OpenAI.
         
         Args:
-            jira_server: URL of the Jira server
+            jira_server: URL of the Jira server, or None to only search a loaded database
             jira_email: Jira account email
             jira_api_token: Jira API token
             azure_deployment: Azure OpenAI deployment name
             azure_api_version: Azure OpenAI API version
             chunk_size: Size of text chunks for processing
             model: Azure OpenAI model name
+            max_in_flight: Maximum number of tickets preprocessed concurrently
+            requests_per_minute: Optional GPT request quota for preprocessing
+            max_page_fetches: Maximum number of Jira search pages fetched concurrently
+            use_embedding_cache: Cache embeddings in EMBEDDING_CACHE_PATH or ./cache/embeddings.sqlite
+            index_type: Vector index built by build_vector_store: 'flat' (exact),
+                'ivfpq' or 'hnsw' (approximate)
+            index_params: Build options for the index type, see vector_index.create_index
+            nprobe: Default IVF cells visited per query for 'ivfpq' indexes
+            ef_search: Default candidate list size per query for 'hnsw' indexes
+            embedding_backend: 'azure' for Azure OpenAI, or a local backend:
+                'hashing' (deterministic, no model) or 'sentence-transformers'
+            embedding_options: Options of a local backend, see
+                embeddings.HashingEmbeddings and embeddings.SentenceTransformerEmbeddings,
+                or extra AzureOpenAIEmbeddings settings for 'azure'
+            summaries_format: Summaries file of saved databases: 'jsonl' (one
+                summary per line), 'jsonl.gz' (the same, compressed) or 'json'
+                (a single list, as before)
+            query_cache_size: Query vectors and search results kept in memory
+                for repeated searches, 0 to disable
+            metrics: Collects the timings and counts of every stage, from
+                Jira pages to FAISS searches, see jira_duplicate_finder.metrics
+            mmap_index: Memory-map the vectors of databases loaded for search
+                only, so worker processes serving the same database share
+                one copy in the page cache
         """
-        # Initialize Azure OpenAI embeddings
-        self.embeddings = AzureOpenAIEmbeddings(
-            model=model,
-            azure_deployment=azure_deployment,
-            openai_api_version=azure_api_version,
-            chunk_size=chunk_size
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type {index_type}, expected one of {', '.join(INDEX_TYPES)}")
+
+        if summaries_format not in SUMMARY_FORMATS:
+            raise ValueError(f"Unknown summaries format {summaries_format}, "
+                             f"expected one of {', '.join(SUMMARY_FORMATS)}")
+
+        if embedding_backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend {embedding_backend}, "
+                             f"expected one of {', '.join(EMBEDDING_BACKENDS)}")
+
+        rate_limits = RateLimitHeaders()
+
+        def azure_embeddings():
+            import httpx
+            from langchain_openai import AzureOpenAIEmbeddings
+
+            options = dict(embedding_options or {})
+            # The remaining quota of every response sizes the next batch
+            options.setdefault('http_client', httpx.Client(event_hooks={'response': [rate_limits]}))
+            return AzureOpenAIEmbeddings(
+                model=model,
+                azure_deployment=azure_deployment,
+                openai_api_version=azure_api_version,
+                chunk_size=chunk_size,
+                max_retries=0,
+                **options
+            )
+
+        self.metrics = metrics or Metrics()
+        self.embedding_backend = embedding_backend
+        self.embedding_options = embedding_options or {}
+        if embedding_backend == 'azure':
+            backend_embeddings, self.embedding_model, deployment = azure_embeddings, model, azure_deployment
+        else:
+            backend_embeddings, self.embedding_model = local_embeddings(embedding_backend, self.embedding_options)
+            deployment = embedding_backend
+
+        # Initialize the embeddings. Rate limits are handled by
+        # CachedEmbeddings, which adapts its batch size to them. The backend
+        # is only created on the first cache miss. Hashing is cheaper than
+        # a cache lookup, so it is never cached.
+        self.embeddings = CachedEmbeddings(
+            backend_embeddings,
+            model=self.embedding_model,
+            deployment=deployment,
+            cache=DiskCache(os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_EMBEDDING_CACHE_PATH))
+            if use_embedding_cache and embedding_backend != 'hashing' else None,
+            max_batch_size=chunk_size,
+            metrics=self.metrics,
+            rate_limits=rate_limits if embedding_backend == 'azure' else None
         )
+        self.azure_deployment = azure_deployment
         
-        # Initialize Jira client
-        self.jira = JIRA(
-            server=jira_server,
-            basic_auth=(jira_email, jira_api_token)
-        )
+        # Jira and GPT clients are created on first use
+        self.jira_server = jira_server
+        self.jira_email = jira_email
+        self.jira_api_token = jira_api_token
+        self._jira = None
+        self.max_page_fetches = max_page_fetches
 
-        self.text_processor = TextProcessor()
+        self.requests_per_minute = requests_per_minute
+        self._text_processor = None
+        self.max_in_flight = max_in_flight
         
         self.vector_store = None
-        self.bugs_data = None
+        self.lexical_index = None
+        self.metadata_store = None
+        self._bugs_data = None
         self.last_update = None
+        self.filter_index = None
+        # FAISS rows of removed or replaced bugs, kept in approximate indexes
+        # until the next rebuild and left out of searches, see _apply_changes
+        self.deleted_rows = np.empty(0, dtype=np.int64)
+        # deleted_rows a search selector was built for, and the selector
+        self._not_deleted = (None, None)
+        # Tickets that failed to preprocess or embed, by key, see retry_failed
+        self.failed_tickets = {}
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.summaries_format = summaries_format
+        self.mmap_index = mmap_index
 
-    def get_all_issues(self, jql_filter, max_results=5000):
-        start_at = 0
-        all_issues = []
-        
-        while True:
-            # Get issues in chunks
-            chunk = self.jira.search_issues(
+        # Repeated searches skip embedding and FAISS. Results are only valid
+        # for the database they came from, see load_database and build_filter_index
+        self.query_vectors = LRUCache(query_cache_size)
+        self.query_results = LRUCache(query_cache_size)
+        self.snapshot_id = None
+
+    @classmethod
+    def for_search(cls, directory: str, **kwargs: Any) -> 'JiraDuplicateFinder':
+        """
+        Load a database for searching only.
+
+        No Jira credentials are needed and the LangChain vector store is not
+        imported, so startup is limited to opening the index and metadata.
+        Searching only creates an embeddings client when a query embedding
+        is not cached yet.
+
+        The embedding backend, model and options the database was built with
+        are used unless given in kwargs.
+
+        Args:
+            directory: Database directory
+            kwargs: Other JiraDuplicateFinder options, e.g. nprobe
+        """
+        kwargs = {**cls.embedding_settings(directory), **kwargs}
+        finder = cls(jira_server=None, jira_email=None, jira_api_token=None, **kwargs)
+        finder.load_database(directory, search_only=True)
+        return finder
+
+    @staticmethod
+    def embedding_settings(directory: str) -> Dict[str, Any]:
+        """
+        JiraDuplicateFinder options selecting the embeddings a database was
+        built with, as recorded in its snapshot.json.
+        """
+        snapshot_path = os.path.join(directory, 'snapshot.json')
+        if not os.path.exists(snapshot_path):
+            return {}
+
+        with open(snapshot_path, encoding='utf-8') as f:
+            embeddings_info = json.load(f).get('embeddings')
+        if not embeddings_info:
+            return {}
+
+        settings = {
+            'embedding_backend': embeddings_info['backend'],
+            'embedding_options': embeddings_info.get('options')
+        }
+        if embeddings_info['backend'] == 'azure' and 'model' in embeddings_info:
+            settings['model'] = embeddings_info['model']
+            settings['azure_deployment'] = embeddings_info['deployment']
+        return settings
+
+    def with_database(self, directory: str) -> 'JiraDuplicateFinder':
+        """
+        Return a new finder with a database loaded for search only, sharing
+        this finder's settings and clients.
+
+        This finder is left unchanged, so searches still running on it are
+        not disturbed, e.g. while a server swaps in a newer database.
+        """
+        finder = copy.copy(self)
+        finder.load_database(directory, search_only=True)
+        return finder
+
+    @property
+    def jira(self) -> Any:
+        """Jira client, connected on first use."""
+        if self._jira is None:
+            if not self.jira_server:
+                raise ValueError("No Jira server configured")
+
+            from jira import JIRA
+            from requests.adapters import HTTPAdapter
+
+            jira = JIRA(
+                server=self.jira_server,
+                basic_auth=(self.jira_email, self.jira_api_token)
+            )
+
+            # Let concurrent page fetches reuse pooled connections
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(self.max_page_fetches, 10))
+            jira._session.mount('https://', adapter)
+            jira._session.mount('http://', adapter)
+            self._jira = jira
+        return self._jira
+
+    @jira.setter
+    def jira(self, jira: Any) -> None:
+        self._jira = jira
+
+    @property
+    def text_processor(self) -> Any:
+        """GPT ticket preprocessor, created on first use."""
+        if self._text_processor is None:
+            from preprocessing.text_processor import TextProcessor
+
+            self._text_processor = TextProcessor(
+                rate_limiter=TokenBucket.per_minute(self.requests_per_minute) if self.requests_per_minute else None,
+                metrics=self.metrics
+            )
+        return self._text_processor
+
+    @text_processor.setter
+    def text_processor(self, text_processor: Any) -> None:
+        self._text_processor = text_processor
+
+    @property
+    def bugs_data(self) -> Optional['pd.DataFrame']:
+        """
+        All bug records. For a loaded database the DataFrame is only built
+        from the metadata store when first used.
+        """
+        if self._bugs_data is None and self.metadata_store is not None:
+            self._bugs_data = self.metadata_store.to_dataframe()
+        return self._bugs_data
+
+    @bugs_data.setter
+    def bugs_data(self, bugs_df: Optional['pd.DataFrame']) -> None:
+        self._bugs_data = bugs_df
+
+    @property
+    def lexical_index(self) -> Optional[BM25Index]:
+        """
+        BM25 index of lexical and hybrid searches. For a loaded database it is
+        only read when first used, so vector searches never load it.
+        """
+        if self._lexical_index is None and self._lexical_path is not None:
+            self._lexical_index = BM25Index.load(self._lexical_path)
+        return self._lexical_index
+
+    @lexical_index.setter
+    def lexical_index(self, lexical_index: Optional[BM25Index]) -> None:
+        self._lexical_index = lexical_index
+        self._lexical_path = None
+
+    @property
+    def num_bugs(self) -> int:
+        """Number of bugs, without loading the bug data of a loaded database."""
+        if self._bugs_data is None and self.metadata_store is not None:
+            return len(self.metadata_store)
+        return len(self.bugs_data) if self.bugs_data is not None else 0
+
+    def get_all_issues(
+        self,
+        jql_filter: str,
+        max_results: int = 5000,
+        fields: str = ISSUE_FIELDS
+    ) -> List[Any]:
+        return list(self.iter_issues(jql_filter, max_results, fields))
+
+    def iter_issues(
+        self,
+        jql_filter: str,
+        max_results: Optional[int] = 5000,
+        fields: str = ISSUE_FIELDS,
+        page_size: int = 100,
+        validate_query: bool = True,
+        start_at: int = 0
+    ) -> Iterator[Any]:
+        """
+        Yield issues matching a JQL filter as their pages arrive.
+
+        The first page tells us the total number of results; the remaining
+        pages are then fetched concurrently (at most max_page_fetches ahead
+        of the consumer) and yielded in their original order, so callers can
+        start working on the first page while the next ones are in flight.
+        Set validate_query to False to let Jira ignore unknown issue keys.
+        Set max_results to None to fetch every result, and start_at to skip
+        the first results.
+        """
+        with self.metrics.timer('jira_page'):
+            first_page = self.jira.search_issues(
                 jql_filter,
-                maxResults=100,  # Process in smaller chunks
+                maxResults=page_size,
                 startAt=start_at,
-                fields='summary,description,created,updated,status,labels,priority'
+                fields=fields,
+                validate_query=validate_query
             )
-            
-            if not chunk:
-                break
-                
-            all_issues.extend(chunk)
-            
-            # If we've received fewer issues than requested, we're done
-            if len(chunk) < 100 or len(all_issues) >= max_results:
-                break
-                
-            start_at += len(chunk)
-        
-        return all_issues[:max_results]  # Ensure we don't exceed max_results
-            
+
+        total = getattr(first_page, 'total', start_at + len(first_page))
+        if max_results is not None:
+            total = min(total, max_results)
+
+        # Ensure we don't exceed max_results
+        yield from first_page[:max(0, total - start_at)]
+
+        if len(first_page) < page_size or total <= start_at + page_size:
+            return
+
+        def fetch_page(page_start: int) -> List[Any]:
+            with self.metrics.timer('jira_page'):
+                return self.jira.search_issues(
+                    jql_filter,
+                    maxResults=page_size,
+                    startAt=page_start,
+                    fields=fields,
+                    validate_query=False
+                )
+
+        # At most max_page_fetches pages are in flight or waiting to be
+        # consumed; the next page is requested as one is handed out, so a
+        # slow consumer keeps memory bounded to a few pages
+        page_starts = iter(range(start_at + page_size, total, page_size))
+        with ThreadPoolExecutor(max_workers=self.max_page_fetches) as executor:
+            pages = deque(
+                (page_start, executor.submit(fetch_page, page_start))
+                for page_start in itertools.islice(page_starts, self.max_page_fetches)
+            )
+            try:
+                while pages:
+                    page_start, page = pages.popleft()
+                    issues = page.result()[:total - page_start]
+                    next_start = next(page_starts, None)
+                    if next_start is not None:
+                        pages.append((next_start, executor.submit(fetch_page, next_start)))
+                    yield from issues
+            finally:
+                # Consumer stopped early: don't fetch pages nobody will read
+                for _, page in pages:
+                    page.cancel()
+
+
     def fetch_bugs(
         self,
         jql_filter: str,
         max_results: int = 5000
-    ) -> pd.DataFrame:
+    ) -> 'pd.DataFrame':
         """
         Fetch bugs from Jira using a JQL filter.
         
@@ -106,46 +481,598 @@ class JiraDuplicateFinder:
         Returns:
             DataFrame containing bug information
         """
-        issues = self.get_all_issues(jql_filter, max_results)
+        # Taken before querying so that tickets updated while we fetch are
+        # picked up again by the next update_database run
+        fetch_started = datetime.now()
 
-        total_issues = len(issues)
-        print(f"\nProcessing {total_issues} tickets...")
-        
-        bugs_data = []
-        for issue in tqdm(issues, desc="Processing tickets", total=total_issues):
-            try:
-                # Process with GPT
-                processed_text = self.text_processor.preprocess_ticket(
-                    title=issue.fields.summary or '',
-                    description=issue.fields.description or '',
-                    analysis_findings=getattr(issue.fields, 'customfield_10357', None) or '',
-                    additional_info=getattr(issue.fields, 'customfield_10356', None) or ''
+        self.bugs_data = self._process_issues(self.iter_issues(jql_filter, max_results))
+        self.last_update = fetch_started
+        return self.bugs_data
+
+    def fetch_bugs_by_key(self, keys: List[str], jql_filter: Optional[str] = None) -> 'pd.DataFrame':
+        """
+        Fetch and preprocess specific tickets without touching the loaded bug data.
+        Keys are looked up 100 at a time with a `key in (...)` JQL search.
+        Unknown keys, and keys not matching jql_filter if given, are missing
+        from the returned DataFrame.
+        """
+        def issues():
+            for i in range(0, len(keys), 100):
+                key_batch = keys[i:i + 100]
+                key_filter = f"key in ({', '.join(key_batch)})"
+                yield from self.iter_issues(
+                    f"({jql_filter}) AND {key_filter}" if jql_filter else key_filter,
+                    len(key_batch),
+                    validate_query=False
                 )
 
-                if processed_text is None:
-                    print(f"Warning: Preprocessing returned None for ticket {issue.key}")
-                    
-                bugs_data.append({
-                    'key': issue.key,
-                    'summary': issue.fields.summary,
-                    'description': issue.fields.description or '',
-                    'created': issue.fields.created,
-                    'updated': issue.fields.updated,
-                    'status': str(issue.fields.status),
-                    'priority': str(issue.fields.priority),
-                    'labels': [str(label) for label in issue.fields.labels],
-                    'text': processed_text
-                })
-            except Exception as e:
-                print(f"\nError processing {issue.key}: {str(e)}")
+        return self._process_issues(issues())
+
+    def _process_issues(
+        self,
+        issues: Iterable[Any],
+        on_processed: Optional[Callable[[str, Optional[Dict[str, Any]], Optional[str]], None]] = None
+    ) -> 'pd.DataFrame':
+        """
+        Preprocess Jira issues with GPT and collect them into a DataFrame.
+
+        Up to max_in_flight tickets are preprocessed concurrently while the
+        issues iterable is still being consumed. Rows keep the order of the
+        issues. Tickets that fail to process are reported, recorded in
+        failed_tickets and skipped; tickets whose preprocessing returned no
+        text are kept without text and recorded as well.
+
+        Args:
+            issues: Jira issues
+            on_processed: Called with the key, bug record (None on error) and
+                error (None on success) of every ticket as soon as it is done
+        """
+        import pandas as pd
+
+        total_issues = len(issues) if hasattr(issues, '__len__') else None
+        print(f"\nProcessing {total_issues} tickets..." if total_issues is not None else "\nProcessing tickets...")
+        
+        bugs_data = {}
+        pending = {}
+
+        def collect(done):
+            for future in done:
+                position, key = pending.pop(future)
+                bug, error = future.result()
+                if bug is not None:
+                    bugs_data[position] = bug
+                if error is None:
+                    self.failed_tickets.pop(key, None)
+                else:
+                    self.failed_tickets[key] = {'key': key, 'stage': 'preprocess', 'error': error}
+                    self.metrics.increment('failed_tickets', stage='preprocess')
+                if on_processed is not None:
+                    on_processed(key, bug, error)
+                progress.update(1)
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor, \
+                tqdm(desc="Processing tickets", total=total_issues) as progress:
+            for position, issue in enumerate(issues):
+                # Keep a bounded number of tickets in flight
+                if len(pending) >= self.max_in_flight * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending[executor.submit(self._process_issue, issue)] = position, issue.key
+
+            collect(list(pending))
             
-        self.bugs_data = pd.DataFrame(bugs_data)
-        self.last_update = datetime.now()
-        return self.bugs_data
+        return pd.DataFrame([bugs_data[position] for position in sorted(bugs_data)], columns=self.BUG_COLUMNS)
+
+    @_timed('preprocess_ticket')
+    def _process_issue(self, issue: Any) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """Preprocess a single Jira issue into a bug record (None on error) and the error, if any."""
+        try:
+            # Process with GPT
+            processed_text = self.text_processor.preprocess_ticket(
+                title=issue.fields.summary or '',
+                description=issue.fields.description or '',
+                analysis_findings=getattr(issue.fields, 'customfield_10357', None) or '',
+                additional_info=getattr(issue.fields, 'customfield_10356', None) or ''
+            )
+
+            error = None
+            if processed_text is None:
+                print(f"Warning: Preprocessing returned None for ticket {issue.key}")
+                error = "Preprocessing returned no text"
+
+            return {
+                'key': issue.key,
+                'summary': issue.fields.summary,
+                'description': issue.fields.description or '',
+                'created': issue.fields.created,
+                'updated': issue.fields.updated,
+                'status': str(issue.fields.status),
+                'priority': str(issue.fields.priority),
+                'labels': [str(label) for label in issue.fields.labels],
+                'text': processed_text
+            }, error
+        except Exception as e:
+            print(f"\nError processing {issue.key}: {str(e)}")
+            return None, str(e) or type(e).__name__
+
+    @_timed('build')
+    def build_database(
+        self,
+        jql_filter: str,
+        directory: str = "./bug_database",
+        max_results: Optional[int] = None,
+        chunk_size: int = 1000,
+        resume: bool = True
+    ) -> str:
+        """
+        Build and save a database from a JQL filter with bounded memory.
+
+        Issues are streamed from Jira, preprocessed and embedded chunk_size
+        tickets at a time, and every chunk is checkpointed to disk before
+        the next one is fetched. Only the chunk in progress is kept in memory
+        until the final index and metadata are assembled from the
+        checkpoints. An interrupted build resumes from its last saved chunk
+        when run again with the same filter.
+
+        Args:
+            jql_filter: JQL query to filter issues
+            directory: Base directory to save the database into
+            max_results: Maximum number of bugs, None for all
+            chunk_size: Tickets processed and checkpointed at a time
+            resume: Set to False to start over instead of resuming
+
+        Returns:
+            The created database directory
+        """
+        checkpoint = BuildCheckpoint.open(directory, jql_filter, max_results, resume)
+        if checkpoint.chunks:
+            print(f"Resuming build {checkpoint.path} after {checkpoint.fetched} tickets")
+
+        self.failed_tickets = dict(checkpoint.failed)
+        if not checkpoint.fetch_complete:
+            self._build_chunks(checkpoint, jql_filter, max_results, chunk_size)
+
+        return self._assemble_database(checkpoint, directory)
+
+    def _build_chunks(
+        self,
+        checkpoint: BuildCheckpoint,
+        jql_filter: str,
+        max_results: Optional[int],
+        chunk_size: int,
+        page_size: int = 100
+    ) -> None:
+        """
+        Fetch, preprocess and embed the remaining tickets of a build, one
+        checkpointed chunk at a time. Inside a chunk, every preprocessed
+        ticket and every embedded batch is recorded as soon as it is done.
+        """
+        import pandas as pd
+
+        # A stable order lets an interrupted build continue by position
+        if 'order by' not in jql_filter.lower():
+            jql_filter = f"{jql_filter} ORDER BY key ASC"
+
+        # Restart a page early, in case tickets before the stop point were
+        # removed since; tickets already saved are skipped by key
+        done_keys = checkpoint.keys()
+        records, vectors, self.failed_tickets = checkpoint.pending()
+        if records:
+            print(f"Resuming with {len(records)} preprocessed and {len(vectors)} embedded tickets of the last chunk")
+        start_at = max(0, checkpoint.fetched - page_size) if checkpoint.fetched else 0
+        issues = enumerate(self.iter_issues(jql_filter, max_results, page_size=page_size, start_at=start_at), start_at)
+
+        def record_ticket(key, bug, error):
+            if bug is not None:
+                records[key] = bug
+            checkpoint.record_ticket(key, bug, error)
+
+        while True:
+            chunk = list(itertools.islice(issues, chunk_size))
+            if not chunk:
+                break
+
+            chunk_keys = [issue.key for _, issue in chunk if issue.key not in done_keys]
+            self._process_issues(
+                [issue for _, issue in chunk if issue.key not in done_keys and issue.key not in records],
+                on_processed=record_ticket
+            )
+            bugs_df = pd.DataFrame([records[key] for key in chunk_keys if key in records], columns=self.BUG_COLUMNS)
+
+            valid_texts, valid_metadata = self._valid_records(bugs_df)
+            to_embed = [(meta['key'], text) for meta, text in zip(valid_metadata, valid_texts) if meta['key'] not in vectors]
+            for start in range(0, len(to_embed), EMBEDDING_CHECKPOINT_SIZE):
+                batch = to_embed[start:start + EMBEDDING_CHECKPOINT_SIZE]
+                embedded = self._embed_each_on_error(batch, checkpoint.record_embedding_failure)
+                if embedded:
+                    checkpoint.record_vectors(list(embedded), np.stack(list(embedded.values())))
+                    vectors.update(embedded)
+
+            # Tickets that couldn't be embedded are left out, to be retried on their own
+            embedded_keys = {meta['key'] for meta in valid_metadata if meta['key'] in vectors}
+            bugs_df = bugs_df[~bugs_df['key'].isin({meta['key'] for meta in valid_metadata} - embedded_keys)]
+            valid_keys = [meta['key'] for meta in valid_metadata if meta['key'] in embedded_keys]
+            chunk_vectors = np.stack([vectors[key] for key in valid_keys]) if valid_keys \
+                else np.empty((0, 0), dtype=np.float32)
+
+            checkpoint.save_chunk(bugs_df, chunk_vectors, fetched=chunk[-1][0] + 1, failed=self.failed_tickets)
+            done_keys.update(bugs_df['key'])
+            records.clear()
+            vectors.clear()
+            print(f"Saved {checkpoint.fetched} tickets to {checkpoint.path}")
+
+        checkpoint.complete_fetch()
+
+    @_timed('assemble')
+    def _assemble_database(self, checkpoint: BuildCheckpoint, directory: str) -> str:
+        """Write the index, metadata and snapshot of a build from its chunks, then load it."""
+        def valid_chunks():
+            for bugs_df, vectors in checkpoint.iter_chunks():
+                if len(vectors):
+                    yield bugs_df[bugs_df['text'].map(lambda text: isinstance(text, str))], vectors
+
+        # Approximate indexes are trained on a sample of the first vectors
+        sample = []
+        for _, vectors in valid_chunks():
+            sample.append(np.asarray(vectors))
+            if sum(len(vectors) for vectors in sample) >= TRAINING_SAMPLE_SIZE:
+                break
+        if not sample:
+            raise ValueError("No bug with processed text to embed")
+        with self.metrics.timer('faiss_train'):
+            index = create_index(self.index_type, np.concatenate(sample)[:TRAINING_SAMPLE_SIZE], **self.index_params)
+        del sample
+
+        # Rows follow the FAISS rows, bugs without a vector go last
+        writer = ColumnStoreWriter(os.path.join(checkpoint.path, 'metadata'), self.BUG_COLUMNS)
+        for bugs_df, vectors in valid_chunks():
+            with self.metrics.timer('faiss_add'):
+                index.add(np.ascontiguousarray(vectors))
+            writer.append(bugs_df)
+        for bugs_df, _ in checkpoint.iter_chunks():
+            if len(bugs_df):
+                writer.append(bugs_df[~bugs_df['text'].map(lambda text: isinstance(text, str))])
+        column_kinds = writer.close()
+
+        faiss.write_index(index, os.path.join(checkpoint.path, 'index.faiss'))
+        BM25Index.build(
+            f"{summary or ''}\n{text}"
+            for bugs_df, _ in valid_chunks()
+            for summary, text in zip(bugs_df['summary'], bugs_df['text'])
+        ).save(os.path.join(checkpoint.path, 'lexical'))
+        write_summaries(
+            os.path.join(checkpoint.path, summaries_filename(self.summaries_format)),
+            (bugs_df for bugs_df, _ in checkpoint.iter_chunks())
+        )
+        self._write_failed_tickets(checkpoint.path)
+        # snapshot.json marks the database as complete, so it is written last
+        self._write_snapshot(checkpoint.path, index, column_kinds, checkpoint.fetch_started)
+
+        database = checkpoint.finish(directory)
+        print(f"Saved database to: {os.path.abspath(database)}")
+
+        self.load_database(database)
+        return database
+
+    @_timed('update')
+    def update_database(
+        self,
+        jql_filter: str,
+        directory: str = "./bug_database",
+        max_results: Optional[int] = None
+    ) -> str:
+        """
+        Incrementally refresh a loaded database and save it as a new snapshot.
+
+        Only issues matching the filter that were updated since the last
+        update are fetched, preprocessed and re-embedded. Tickets that no
+        longer match the filter are removed from the vector store, found by
+        listing the keys of all matching tickets.
+
+        Args:
+            jql_filter: JQL query the database was built from
+            directory: Base directory to save the new snapshot into
+            max_results: Maximum number of bugs matching the filter, None for
+                all. When more bugs match, no ticket is removed, as the key
+                listing is incomplete
+
+        Returns:
+            The created snapshot directory name
+        """
+        self._check_updatable()
+
+        if self.last_update is None:
+            raise ValueError("Database has no last update time. Rebuild it with fetch_bugs")
+
+        sync_started = datetime.now()
+
+        # Keys only, to detect tickets that dropped out of the filter. Tickets
+        # beyond a truncated listing still match, so it removes nothing
+        current_keys = {
+            issue.key for issue in self.iter_issues(jql_filter, max_results, fields='key')
+        }
+        listing_complete = max_results is None or len(current_keys) < max_results
+        if not listing_complete:
+            print(f"Warning: At least {max_results} bugs match the filter, "
+                  f"tickets that no longer match are not removed")
+
+        delta_filter = f'({jql_filter}) AND updated >= "{self.last_update:%Y/%m/%d %H:%M}"'
+        print(f"Fetching bugs updated since {self.last_update:%Y-%m-%d %H:%M}")
+        changed_df, vectors = self._embed_changes(self._process_issues(self.iter_issues(delta_filter, max_results)))
+
+        existing_keys = set(self.bugs_data['key'])
+        changed_keys = set(changed_df['key'])
+        removed_keys = existing_keys - current_keys if listing_complete else set()
+        stale_keys = (removed_keys | changed_keys) & existing_keys
+
+        print(f"{len(changed_keys - existing_keys)} new, {len(changed_keys & existing_keys)} updated, "
+              f"{len(removed_keys)} removed bugs")
+
+        if listing_complete:
+            for key in set(self.failed_tickets) - current_keys:
+                del self.failed_tickets[key]
+        self.last_update = sync_started
+
+        return self._apply_changes(changed_df, vectors, stale_keys, directory)
+
+    def retry_failed(self, directory: str = "./bug_database") -> str:
+        """
+        Fetch, preprocess and embed again the tickets that failed when the
+        loaded database was built or updated (failed_keys.json), and save the
+        result as a new snapshot. Tickets failing again stay in its report.
+
+        Args:
+            directory: Base directory to save the new snapshot into
+
+        Returns:
+            The created snapshot directory name
+        """
+        self._check_updatable()
+
+        keys = sorted(self.failed_tickets)
+        if not keys:
+            raise ValueError("No failed tickets to retry")
+
+        # Tickets failing again are recorded anew while fetching
+        print(f"Retrying {len(keys)} failed tickets")
+        self.failed_tickets = {}
+        changed_df, vectors = self._embed_changes(self.fetch_bugs_by_key(keys))
+
+        for key in sorted(set(keys) - set(changed_df['key']) - set(self.failed_tickets)):
+            print(f"Warning: {key} was not found in Jira and is dropped from the failed tickets")
+
+        stale_keys = set(changed_df['key']) & set(self.bugs_data['key'])
+        return self._apply_changes(changed_df, vectors, stale_keys, directory)
+
+    @_timed('ingest')
+    def apply_ticket_changes(
+        self,
+        changed_keys: Iterable[str],
+        deleted_keys: Iterable[str] = (),
+        jql_filter: Optional[str] = None
+    ) -> Dict[str, int]:
+        """
+        Bring tickets of the loaded database up to date in memory, e.g. for
+        Jira webhook events, without saving a snapshot.
+
+        Changed tickets are fetched and preprocessed together and embedded in
+        one batch. New tickets are appended to the index. Changed tickets
+        already in the database replace their old version. Deleted tickets,
+        and changed tickets that are gone or no longer match jql_filter, are
+        removed. Tickets that fail keep their previous version and are
+        recorded in failed_tickets. last_update is left unchanged, so the next
+        update_database still catches changes that no event reported.
+
+        Args:
+            changed_keys: Keys of created or updated tickets
+            deleted_keys: Keys of deleted tickets
+            jql_filter: JQL query the database was built from
+
+        Returns:
+            Counts of added, updated and removed bugs
+        """
+        import pandas as pd
+
+        self._check_updatable()
+
+        deleted_keys = set(deleted_keys)
+        changed_keys = sorted(set(changed_keys) - deleted_keys)
+
+        # Failures of earlier batches are recorded again if the tickets still
+        # fail, so the failures left afterwards are those of this batch
+        earlier_failures = {key: self.failed_tickets.pop(key) for key in changed_keys if key in self.failed_tickets}
+        try:
+            changed_df = self.fetch_bugs_by_key(changed_keys, jql_filter) if changed_keys \
+                else pd.DataFrame(columns=self.BUG_COLUMNS)
+            changed_df, vectors = self._embed_changes(changed_df)
+        except BaseException:
+            self.failed_tickets.update(earlier_failures)
+            raise
+
+        existing_keys = set(self.bugs_data['key'])
+        found_keys = set(changed_df['key'])
+        # Tickets that failed were found, but gone and filtered out ones are removed
+        failed_keys = set(changed_keys) & set(self.failed_tickets)
+        missing_keys = set(changed_keys) - found_keys - failed_keys
+        removed_keys = (deleted_keys | missing_keys) & existing_keys
+        for key in deleted_keys | missing_keys:
+            self.failed_tickets.pop(key, None)
+
+        counts = {
+            'added': len(found_keys - existing_keys),
+            'updated': len(found_keys & existing_keys),
+            'removed': len(removed_keys)
+        }
+        if found_keys or removed_keys:
+            self._apply_changes(changed_df, vectors, removed_keys | (found_keys & existing_keys))
+        return counts
+
+    def _check_updatable(self) -> None:
+        if self.vector_store is None or self.bugs_data is None:
+            raise ValueError("No database to update. Call load_database first")
+
+        if isinstance(self.vector_store, SearchIndex):
+            raise ValueError("Database was loaded for search only. Load it with load_database to update it")
+
+    def _embed_changes(self, changed_df: 'pd.DataFrame') -> Tuple['pd.DataFrame', Dict[str, np.ndarray]]:
+        """
+        Embed changed bugs before any of them replaces its previous version.
+
+        Bugs already in the database whose preprocessing returned no text, or
+        whose embedding failed, are left out, so they keep their previous
+        version; both are recorded in failed_tickets. New bugs without text
+        are kept without a vector, new bugs failing to embed are left out.
+
+        Returns:
+            The bugs to apply, and the vector of every bug with text by key
+        """
+        valid_texts, valid_metadata = self._valid_records(changed_df)
+        batch = [(meta['key'], text) for text, meta in zip(valid_texts, valid_metadata)]
+        if not batch:
+            vectors = {}
+        elif self.vector_store.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            vectors = self._embed_each_on_error(batch)
+        else:
+            vectors = dict(zip(
+                (key for key, _ in batch),
+                np.asarray(self.embeddings.embed_documents(valid_texts), dtype=np.float32)
+            ))
+
+        embedded = changed_df['key'].isin(list(vectors))
+        without_text = ~changed_df['text'].map(lambda text: isinstance(text, str))
+        existing = changed_df['key'].isin(set(self.bugs_data['key']))
+        kept = existing & ~embedded
+        if kept.any():
+            print(f"Keeping the previous version of {int(kept.sum())} bugs that failed to process: "
+                  f"{', '.join(changed_df.loc[kept, 'key'])}")
+
+        return changed_df[embedded | (without_text & ~existing)], vectors
+
+    def _apply_changes(
+        self,
+        changed_df: 'pd.DataFrame',
+        vectors: Dict[str, np.ndarray],
+        stale_keys: set,
+        directory: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Replace the stale bugs of the loaded database with the changed ones,
+        embedded by _embed_changes.
+        With a directory, a new snapshot is saved into it and its path returned.
+        """
+        import pandas as pd
+
+        unchanged_df = self.bugs_data[~self.bugs_data['key'].isin(stale_keys)]
+        self.bugs_data = pd.concat([unchanged_df, changed_df], ignore_index=True)
+
+        # The BM25 rows follow the FAISS rows. It is updated along with them,
+        # unless a snapshot is saved right away, which builds it anew
+        lexical_index = self.lexical_index if directory is None else None
+
+        stale_rows = self._rows_for_keys(stale_keys)
+        if self.index_type == 'flat':
+            if stale_rows:
+                self.vector_store.delete([self.vector_store.index_to_docstore_id[row] for row in stale_rows])
+                if lexical_index is not None:
+                    lexical_index = lexical_index.without_rows(np.asarray(stale_rows, dtype=np.int64))
+        else:
+            # Approximate indexes can't remove vectors in place, so stale rows
+            # are left out of searches until the index is rebuilt
+            self._mark_deleted(stale_rows)
+
+        # New versions are appended, to approximate indexes as well
+        embedded_df = changed_df[changed_df['key'].isin(list(vectors))]
+        if len(embedded_df):
+            metadata = embedded_df.to_dict('records')
+            with self.metrics.timer('faiss_add'):
+                self.vector_store.add_embeddings(
+                    [(meta['text'], vectors[meta['key']]) for meta in metadata],
+                    metadatas=metadata,
+                    ids=[meta['key'] for meta in metadata]
+                )
+            if lexical_index is not None:
+                lexical_index = lexical_index.append(f"{meta['summary'] or ''}\n{meta['text']}" for meta in metadata)
+        self.lexical_index = lexical_index
+
+        if len(self.deleted_rows) > self.MAX_DELETED_RATIO * self.vector_store.index.ntotal:
+            print(f"Rebuilding the index without {len(self.deleted_rows)} deleted rows")
+            self._compact_index()
+        else:
+            # FAISS row ids shift when vectors are removed
+            self.build_filter_index()
+
+        return self.save_database(directory) if directory else None
+
+    def _rows_for_keys(self, keys: set) -> List[int]:
+        """Return the FAISS rows of the given ticket keys, without deleted rows."""
+        deleted = set(self.deleted_rows.tolist())
+        rows = [row for row in sorted(self.vector_store.index_to_docstore_id) if row not in deleted]
+        docstore_ids = [self.vector_store.index_to_docstore_id[row] for row in rows]
+        return [row for row, key in zip(rows, self._metadata_column(docstore_ids, 'key')) if key in keys]
+
+    def _mark_deleted(self, rows: List[int]) -> None:
+        """
+        Leave FAISS rows out of searches without removing them from the index.
+        Their documents move to docstore ids of their own, so the ticket keys
+        can be added again for new versions.
+        """
+        docstore = self.vector_store.docstore
+        for row in rows:
+            docstore_id = self.vector_store.index_to_docstore_id[row]
+            document = docstore.search(docstore_id)
+            docstore.delete([docstore_id])
+            docstore.add({f"deleted:{row}": document})
+            self.vector_store.index_to_docstore_id[row] = f"deleted:{row}"
+        self.deleted_rows = np.union1d(self.deleted_rows, np.asarray(rows, dtype=np.int64))
+
+    def _compact_index(self) -> None:
+        """
+        Remove the deleted rows from an approximate index. It is rebuilt from
+        the vectors and codes it holds, so no bug is embedded again.
+        """
+        index_to_docstore_id = self.vector_store.index_to_docstore_id
+        deleted = set(self.deleted_rows.tolist())
+        with self.metrics.timer('faiss_compact'):
+            self.vector_store.index = without_rows(self.vector_store.index, self.deleted_rows)
+        self.vector_store.docstore.delete([index_to_docstore_id[row] for row in sorted(deleted)])
+        self.vector_store.index_to_docstore_id = dict(enumerate(
+            docstore_id for row, docstore_id in sorted(index_to_docstore_id.items()) if row not in deleted
+        ))
+        if self._lexical_index is not None:
+            self.lexical_index = self._lexical_index.without_rows(self.deleted_rows)
+        else:
+            self.lexical_index = None
+        self.deleted_rows = np.empty(0, dtype=np.int64)
+        self.build_filter_index()
+
+    def _metadata_column(self, docstore_ids: List[str], column: str) -> List[Any]:
+        """One metadata value per document, reading only that column when possible."""
+        docstore = self.vector_store.docstore
+        if isinstance(docstore, ColumnarDocstore):
+            return docstore.column(docstore_ids, column)
+        return [docstore.search(docstore_id).metadata[column] for docstore_id in docstore_ids]
+
+    @staticmethod
+    def _valid_records(bugs_df: 'pd.DataFrame'):
+        """Split a bug DataFrame into embeddable texts and their metadata."""
+        texts = bugs_df['text'].tolist()
+        metadata = bugs_df.to_dict('records')
+
+        # Filter out None values and keep track of valid indices
+        valid_texts = []
+        valid_metadata = []
+        for idx, (text, meta) in enumerate(zip(texts, metadata)):
+            if text is not None and isinstance(text, str):
+                valid_texts.append(text)
+                valid_metadata.append(meta)
+            else:
+                print(f"Warning: Skipping invalid text for bug {meta.get('key', f'at index {idx}')}") 
+
+        return valid_texts, valid_metadata
     
     def build_vector_store(
         self,
-        bugs_df: Optional[pd.DataFrame] = None,
+        bugs_df: Optional['pd.DataFrame'] = None,
         force_rebuild: bool = False
     ) -> None:
         """
@@ -160,45 +1087,203 @@ class JiraDuplicateFinder:
         
         if self.vector_store is not None and not force_rebuild:
             return
-            
-        
-        # Process in batches
-        batch_size = 500
-        sleep_time = 2
-        for i in tqdm(range(0, len(self.bugs_data), batch_size)):
-            batch_df = self.bugs_data.iloc[i:i + batch_size]
-            
-            texts = batch_df['text'].tolist()
-            metadata = batch_df.to_dict('records')
-
-            # Filter out None values and keep track of valid indices
-            valid_texts = []
-            valid_metadata = []
-            for idx, (text, meta) in enumerate(zip(texts, metadata)):
-                if text is not None and isinstance(text, str):
-                    valid_texts.append(text)
-                    valid_metadata.append(meta)
-                else:
-                    print(f"Warning: Skipping invalid text for bug {meta.get('key', f'at index {idx}')}") 
-    
-            # For the first batch, create the vector store
-            if i == 0:
-                self.vector_store = FAISS.from_texts(
-                    valid_texts,
-                    self.embeddings,
-                    metadatas=valid_metadata
-                )
-            # For subsequent batches, add to existing store
-            else:
-                self.vector_store.add_texts(
-                    valid_texts,
-                    metadatas=valid_metadata
-                )
-            
-            # Wait between batches to avoid rate limits
-            if i + batch_size < len(self.bugs_data):  # Don't sleep after last batch
-                sleep(sleep_time)
 
+        valid_texts, valid_metadata = self._valid_records(self.bugs_data)
+        if not valid_texts:
+            raise ValueError("No bug with processed text to embed")
+
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+
+        # Normalized vectors in an inner product index, so scores are cosine similarity
+        vectors = self._embed_normalized(valid_texts)
+        with self.metrics.timer('faiss_train'):
+            index = create_index(self.index_type, vectors, **self.index_params)
+        self.vector_store = self._langchain_store(
+            index, InMemoryDocstore(), {}, DISTANCE_STRATEGIES[faiss.METRIC_INNER_PRODUCT]
+        )
+        self.deleted_rows = np.empty(0, dtype=np.int64)
+        with self.metrics.timer('faiss_add'):
+            self.vector_store.add_embeddings(
+                list(zip(valid_texts, vectors)),
+                metadatas=valid_metadata,
+                ids=[meta['key'] for meta in valid_metadata]
+            )
+        self.build_filter_index()
+        self.build_lexical_index()
+
+    def _langchain_store(
+        self,
+        index: faiss.Index,
+        docstore: Any,
+        index_to_docstore_id: Dict[int, str],
+        distance_strategy: str
+    ) -> Any:
+        """
+        Wrap an index in a LangChain FAISS vector store, which can be updated.
+        The embeddings and the columnar docstore implement LangChain's
+        interfaces without importing it, so they are registered here.
+        """
+        from langchain_community.docstore.base import AddableMixin, Docstore
+        from langchain_community.vectorstores import FAISS
+        from langchain_community.vectorstores.utils import DistanceStrategy
+
+        register_langchain_embeddings()
+        Docstore.register(ColumnarDocstore)
+        AddableMixin.register(ColumnarDocstore)
+        return FAISS(
+            self.embeddings,
+            index,
+            docstore,
+            index_to_docstore_id,
+            distance_strategy=DistanceStrategy(distance_strategy)
+        )
+
+    def _embed_each_on_error(
+        self,
+        batch: List[Tuple[str, str]],
+        on_failed: Optional[Callable[[str, str], None]] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Embed a batch of (key, text) pairs into normalized vectors by key.
+
+        If the batch fails for another reason than a rate limit, its texts are
+        embedded one by one, and those that still fail are recorded in
+        failed_tickets and left out. Rate limit errors are raised, as every
+        other text would hit them as well.
+        """
+        try:
+            return dict(zip((key for key, _ in batch), self._embed_normalized([text for _, text in batch])))
+        except Exception as e:
+            if is_rate_limit_error(e):
+                raise
+
+        embedded = {}
+        for key, text in batch:
+            try:
+                embedded[key] = self._embed_normalized([text])[0]
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    raise
+                print(f"\nError embedding {key}: {str(e)}")
+                self.metrics.increment('failed_tickets', stage='embed')
+                self.failed_tickets[key] = {'key': key, 'stage': 'embed', 'error': str(e) or type(e).__name__}
+                if on_failed is not None:
+                    on_failed(key, self.failed_tickets[key]['error'])
+        return embedded
+
+    def _embed_normalized(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into L2-normalized vectors for the inner product index."""
+        # Cached, rate-limit aware batching happens inside the embeddings
+        vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        return vectors
+
+    def build_filter_index(self) -> None:
+        """
+        Index the FAISS row ids of every status, priority and label, so
+        searches can be restricted to matching rows inside FAISS instead of
+        filtering their results afterwards. The creation time of every row is
+        parsed on the first date filter, see _created_times.
+        Cached search results are dropped, as the rows changed.
+        """
+        self.query_results.clear()
+        status_rows, priority_rows, label_rows = {}, {}, {}
+
+        docstore_ids = [docstore_id for _, docstore_id in sorted(self.vector_store.index_to_docstore_id.items())]
+        for row, status in enumerate(self._metadata_column(docstore_ids, 'status')):
+            status_rows.setdefault(status, []).append(row)
+        for row, priority in enumerate(self._metadata_column(docstore_ids, 'priority')):
+            priority_rows.setdefault(priority, []).append(row)
+        for row, labels in enumerate(self._metadata_column(docstore_ids, 'labels')):
+            for label in labels or []:
+                label_rows.setdefault(label, []).append(row)
+
+        def as_arrays(rows_by_value):
+            return {value: np.asarray(rows, dtype=np.int64) for value, rows in rows_by_value.items()}
+
+        self.filter_index = {
+            'status': as_arrays(status_rows),
+            'priority': as_arrays(priority_rows),
+            'labels': as_arrays(label_rows),
+            'created': None
+        }
+
+    def _created_times(self) -> np.ndarray:
+        """Creation time of every FAISS row, as naive UTC datetime64, parsed on first use."""
+        if self.filter_index['created'] is None:
+            import pandas as pd
+
+            docstore_ids = [docstore_id for _, docstore_id in sorted(self.vector_store.index_to_docstore_id.items())]
+            created = self._metadata_column(docstore_ids, 'created')
+            # Naive UTC, so rows without a valid date (NaT) never match a range
+            created = pd.to_datetime(pd.Series(created, dtype=object), utc=True, errors='coerce')
+            self.filter_index['created'] = created.dt.tz_localize(None).to_numpy()
+        return self.filter_index['created']
+
+    def build_lexical_index(self) -> None:
+        """
+        Build the BM25 index over the summary and processed text of every
+        FAISS row, used by lexical and hybrid searches.
+        """
+        docstore_ids = [docstore_id for _, docstore_id in sorted(self.vector_store.index_to_docstore_id.items())]
+        summaries = self._metadata_column(docstore_ids, 'summary')
+        texts = self._metadata_column(docstore_ids, 'text')
+        self.lexical_index = BM25Index.build([
+            f"{summary or ''}\n{text or ''}" for summary, text in zip(summaries, texts)
+        ])
+
+    def _filter_rows(
+        self,
+        status_filter: Optional[List[str]] = None,
+        priority_filter: Optional[List[str]] = None,
+        label_filter: Optional[List[str]] = None,
+        created_after: Optional[Union[str, datetime]] = None,
+        created_before: Optional[Union[str, datetime]] = None
+    ) -> Optional[np.ndarray]:
+        """
+        Return the FAISS row ids matching all given filters, or None if no
+        filter is set. Each list filter matches any of its values. Deleted
+        rows are left out by the search, see _not_deleted_selector.
+        """
+        if self.filter_index is None:
+            self.build_filter_index()
+
+        rows = None
+
+        def restrict(rows, matching):
+            return matching if rows is None else np.intersect1d(rows, matching, assume_unique=True)
+
+        for field, values in (('status', status_filter), ('priority', priority_filter), ('labels', label_filter)):
+            if values:
+                matching = [self.filter_index[field][value] for value in values if value in self.filter_index[field]]
+                rows = restrict(rows, np.unique(np.concatenate(matching)) if matching else np.empty(0, dtype=np.int64))
+
+        if created_after is not None or created_before is not None:
+            created = self._created_times()
+            in_range = np.ones(len(created), dtype=bool)
+            if created_after is not None:
+                in_range &= created >= _utc_datetime64(created_after)
+            if created_before is not None:
+                in_range &= created < _utc_datetime64(created_before)
+            rows = restrict(rows, np.flatnonzero(in_range))
+
+        return rows
+
+    def _not_deleted_selector(self) -> Optional[faiss.IDSelector]:
+        """
+        FAISS selector of the rows not deleted, or None without deleted rows.
+        Built once per change of deleted_rows, which is replaced, never
+        changed in place, so searches don't pay for it.
+        """
+        if not len(self.deleted_rows):
+            return None
+        deleted_rows, selector = self._not_deleted
+        if deleted_rows is not self.deleted_rows:
+            selector = faiss.IDSelectorNot(faiss.IDSelectorBatch(self.deleted_rows))
+            self._not_deleted = self.deleted_rows, selector
+        return selector
+
+    @_timed('snapshot_save')
     def save_database(
         self,
         directory: str = "./bug_database"
@@ -206,122 +1291,501 @@ class JiraDuplicateFinder:
         """
         Save the database with timestamp.
         Returns the created directory name.
+
+        A database holds the FAISS index (index.faiss), the bug metadata as
+        memory-mappable columns whose rows follow the FAISS row ids
+        (metadata/), the BM25 index (lexical/), its settings (snapshot.json),
+        the bug summaries (summaries.jsonl by default, see summaries_format)
+        and failed_keys.json.
         """
         if self.vector_store is None or self.bugs_data is None:
             raise ValueError("No database to save. Build vector store first")
         
         if len(self.bugs_data) == 0:
             raise ValueError("No bug data to save")
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        directory_with_timestamp = os.path.join(directory, f"db_{timestamp}")
-            
-        os.makedirs(directory_with_timestamp, exist_ok=True)
-        
-        # Save vector store
-        self.vector_store.save_local(directory_with_timestamp)
 
-        print(f"Current working directory: {os.getcwd()}")
-        print(f"Saving database to: {os.path.abspath(directory_with_timestamp)}")
+        if len(self.deleted_rows):
+            # Snapshots hold no deleted rows
+            self._compact_index()
         
-        # Save bugs data and metadata
-        metadata = {
-            'bugs_data': self.bugs_data,
-            'last_update': self.last_update
-        }
-        with open(os.path.join(directory_with_timestamp, 'metadata.pkl'), 'wb') as f:
-            pickle.dump(metadata, f)
-
-        # Save summaries as JSON
-        summaries = []
-        for _, row in self.bugs_data.iterrows():
-            summary = {
-                'key': row['key'],
-                'title': row['summary'],
-                'processed_text': row['text'],
-                'status': row['status'],
-                'created': row['created'],
-                'updated': row['updated']
-            }
-            summaries.append(summary)
-
-        with open(os.path.join(directory_with_timestamp, 'summaries.json'), 'w', encoding='utf-8') as f:
-            json.dump(summaries, f, indent=2, default=str)
+        # Written next to the other snapshots and renamed once complete, so
+        # no loader sees a partial snapshot and no existing file, possibly
+        # hard linked into other snapshots, is ever written to
+        staging = staging_directory(directory)
+        try:
+            faiss.write_index(self.vector_store.index, os.path.join(staging, 'index.faiss'))
+
+            # Save the BM25 index, its rows follow the FAISS rows. An index
+            # updated since it was built gets current term statistics
+            if self.lexical_index is None or self.lexical_index.changed_rows:
+                self.build_lexical_index()
+            self.lexical_index.save(os.path.join(staging, 'lexical'))
+
+            # Save bugs data keyed by FAISS row id
+            docstore_ids = [docstore_id for _, docstore_id in sorted(self.vector_store.index_to_docstore_id.items())]
+            column_kinds = write_column_store(
+                os.path.join(staging, 'metadata'),
+                self._in_row_order(self.bugs_data, self._metadata_column(docstore_ids, 'key'))
+            )
+
+            write_summaries(os.path.join(staging, summaries_filename(self.summaries_format)), [self.bugs_data])
+            self._write_failed_tickets(staging)
+            # snapshot.json marks the database as complete, so it is written last
+            self._write_snapshot(staging, self.vector_store.index, column_kinds, self.last_update)
+            directory_with_timestamp = publish_snapshot(staging, directory)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        print(f"Saved database to: {os.path.abspath(directory_with_timestamp)}")
 
         return directory_with_timestamp
 
+    def _write_snapshot(
+        self,
+        directory: str,
+        index: faiss.Index,
+        column_kinds: Dict[str, str],
+        last_update: Optional[datetime]
+    ) -> None:
+        """Write snapshot.json, the settings of a saved database."""
+        snapshot = {
+            'format': SNAPSHOT_FORMAT,
+            'num_vectors': index.ntotal,
+            'columns': column_kinds,
+            'last_update': last_update.isoformat() if last_update else None,
+            'distance_strategy': DISTANCE_STRATEGIES[index.metric_type],
+            'index_type': self.index_type,
+            'index_params': self.index_params,
+            'embeddings': self._embeddings_info(index)
+        }
+        # Never seen half written, it marks the database as complete
+        snapshot_path = os.path.join(directory, 'snapshot.json')
+        with open(snapshot_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(snapshot_path + '.tmp', snapshot_path)
+
+    def _write_failed_tickets(self, directory: str) -> None:
+        """Write failed_keys.json, the tickets left out of a saved database because they failed."""
+        failed = sorted(self.failed_tickets.values(), key=lambda failure: failure['key'])
+        with open(os.path.join(directory, 'failed_keys.json'), 'w', encoding='utf-8') as f:
+            json.dump(failed, f, indent=2)
+        if failed:
+            print(f"{len(failed)} tickets failed and were left out of the database, see its failed_keys.json. "
+                  f"Retry them with retry_failed")
+
+    @_timed('snapshot_load')
     def load_database(
         self,
-        directory: str = "./bug_database"
+        directory: str = "./bug_database",
+        search_only: bool = False
     ) -> None:
         """
         Load the vector store and bug data from disk.
+        Bug metadata is memory-mapped and read lazily, column by column.
+
+        Args:
+            directory: Database directory
+            search_only: Serve searches from a plain SearchIndex instead of a
+                LangChain vector store, which is slow to import. The database
+                can't be updated afterwards. With mmap_index, the index
+                vectors are memory-mapped instead of read.
         """
         if not os.path.exists(directory):
             raise ValueError(f"Database directory {directory} does not exist")
-            
-        # Load vector store
-        self.vector_store = FAISS.load_local(directory, self.embeddings, allow_dangerous_deserialization=True)
-        
-        # Load bugs data and metadata
+
+        snapshot_path = os.path.join(directory, 'snapshot.json')
+        if not os.path.exists(snapshot_path):
+            raise ValueError(f"Database {directory} uses the old pickle format. "
+                             f"Convert it with src/examples/migrate_database.py")
+
+        with open(snapshot_path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+
+        # Queries must be embedded by the model that built the database
+        embeddings_info = snapshot.get('embeddings', {'backend': 'azure'})
+        if embeddings_info['backend'] != self.embedding_backend or \
+                embeddings_info.get('model', self.embedding_model) != self.embedding_model:
+            raise ValueError(f"Database {directory} was built with {embeddings_info['backend']} embeddings "
+                             f"({embeddings_info.get('model')}), but this finder uses {self.embedding_backend} "
+                             f"embeddings ({self.embedding_model})")
+
+        self.last_update = datetime.fromisoformat(snapshot['last_update']) if snapshot['last_update'] else None
+        self.index_params = snapshot.get('index_params', {})
+        self.metadata_store = ColumnStore(os.path.join(directory, 'metadata'), snapshot['columns'])
+        self._bugs_data = None
+
+        # Copies made by with_database share the query vectors, which don't
+        # depend on the database, but get their own results
+        self.snapshot_id = os.path.abspath(directory)
+        self.query_results = LRUCache(self.query_results.max_entries)
+
+        # Load vector store, its documents are served from the metadata store
+        index = read_index(os.path.join(directory, 'index.faiss'), snapshot.get('index_type'),
+                           mmap=self.mmap_index and search_only)
+        docstore_ids = self.metadata_store.column('key').take(range(index.ntotal))
+        docstore = ColumnarDocstore(self.metadata_store, docstore_ids)
+        if search_only:
+            self.vector_store = SearchIndex(index, docstore, dict(enumerate(docstore_ids)))
+        else:
+            self.vector_store = self._langchain_store(
+                index, docstore, dict(enumerate(docstore_ids)), snapshot['distance_strategy']
+            )
+        self.index_type = index_type_of(index)
+        self.deleted_rows = np.empty(0, dtype=np.int64)
+        self.build_filter_index()
+
+        # The BM25 index is read on the first lexical search, databases saved
+        # before lexical search build it then
+        self.lexical_index = None
+        lexical_path = os.path.join(directory, 'lexical')
+        self._lexical_path = lexical_path if os.path.exists(lexical_path) else None
+
+        failed_path = os.path.join(directory, 'failed_keys.json')
+        self.failed_tickets = {}
+        if os.path.exists(failed_path):
+            with open(failed_path, encoding='utf-8') as f:
+                self.failed_tickets = {failure['key']: failure for failure in json.load(f)}
+
+    def _embeddings_info(self, index: faiss.Index) -> Dict[str, Any]:
+        """Embedding backend and model of the vectors, as saved in snapshot.json."""
+        info = {
+            'backend': self.embedding_backend,
+            'model': self.embedding_model,
+            'options': self.embedding_options,
+            'dimension': index.d
+        }
+        if self.embedding_backend == 'azure':
+            info['deployment'] = self.azure_deployment
+        return info
+
+    @staticmethod
+    def _in_row_order(bugs_df: 'pd.DataFrame', keys_in_row_order: List[str]) -> 'pd.DataFrame':
+        """Reorder bug records to follow the FAISS rows, with bugs that have no vector last."""
+        import pandas as pd
+
+        row_of_key = pd.Series(np.arange(len(keys_in_row_order)), index=keys_in_row_order)
+        row_order = bugs_df['key'].map(row_of_key).fillna(len(keys_in_row_order))
+        return bugs_df.iloc[np.argsort(row_order.to_numpy(), kind='stable')].reset_index(drop=True)
+
+    @staticmethod
+    def migrate_database(directory: str) -> bool:
+        """
+        Convert a database in place to the current format: a normalized inner
+        product index, so scores are cosine similarity, and columnar metadata
+        instead of the pickled index.pkl docstore and metadata.pkl.
+
+        Only migrate databases you trust, as the old format is read with pickle.
+
+        Returns:
+            True if the database was migrated, False if it already is current
+        """
+        if os.path.exists(os.path.join(directory, 'snapshot.json')):
+            return False
+
+        index_path = os.path.join(directory, 'index.faiss')
+        index = faiss.read_index(index_path)
+        if index.metric_type != faiss.METRIC_INNER_PRODUCT:
+            index = to_inner_product_index(index)
+
         with open(os.path.join(directory, 'metadata.pkl'), 'rb') as f:
             metadata = pickle.load(f)
-            self.bugs_data = metadata['bugs_data']
-            self.last_update = metadata.get('last_update')
+        with open(os.path.join(directory, 'index.pkl'), 'rb') as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+
+        keys_in_row_order = [docstore.search(index_to_docstore_id[row]).metadata['key'] for row in range(index.ntotal)]
+        column_kinds = write_column_store(
+            os.path.join(directory, 'metadata'),
+            JiraDuplicateFinder._in_row_order(metadata['bugs_data'], keys_in_row_order)
+        )
+        faiss.write_index(index, index_path + '.tmp')
+        os.replace(index_path + '.tmp', index_path)
+
+        last_update = metadata.get('last_update')
+        snapshot = {
+            'format': SNAPSHOT_FORMAT,
+            'num_vectors': index.ntotal,
+            'columns': column_kinds,
+            'last_update': last_update.isoformat() if last_update else None,
+            'distance_strategy': DISTANCE_STRATEGIES[faiss.METRIC_INNER_PRODUCT],
+            'index_type': index_type_of(index),
+            'index_params': metadata.get('index_params', {}),
+            # Older databases were always built with Azure OpenAI embeddings
+            'embeddings': {'backend': 'azure'}
+        }
+
+        # snapshot.json is written last and marks the migration as complete
+        snapshot_path = os.path.join(directory, 'snapshot.json')
+        with open(snapshot_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=2)
+        os.replace(snapshot_path + '.tmp', snapshot_path)
+        os.remove(os.path.join(directory, 'metadata.pkl'))
+        os.remove(os.path.join(directory, 'index.pkl'))
+        return True
 
     def find_duplicates(
         self,
         query_text: str,
         query_ticket_id: str = None,
         num_similar: int = 5,
-        similarity_threshold: float = 0.85,
-        status_filter: Optional[List[str]] = None
+        similarity_threshold: float = 0.92,
+        status_filter: Optional[List[str]] = None,
+        priority_filter: Optional[List[str]] = None,
+        label_filter: Optional[List[str]] = None,
+        created_after: Optional[Union[str, datetime]] = None,
+        created_before: Optional[Union[str, datetime]] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        retrieval: str = 'vector',
+        lexical_weight: float = 0.3
     ) -> List[Dict[str, Any]]:
         """
         Find potentially duplicate bugs based on semantic similarity.
         Excludes the query ticket from results if ticket_id is provided.
+        Filters are applied inside the search, and retrieval can be lexical
+        or hybrid, see find_duplicates_many.
+        """
+        return self.find_duplicates_many(
+            [query_text],
+            query_ticket_ids=[query_ticket_id],
+            num_similar=num_similar,
+            similarity_threshold=similarity_threshold,
+            status_filter=status_filter,
+            priority_filter=priority_filter,
+            label_filter=label_filter,
+            created_after=created_after,
+            created_before=created_before,
+            nprobe=nprobe,
+            ef_search=ef_search,
+            retrieval=retrieval,
+            lexical_weight=lexical_weight
+        )[0]
+
+    @_timed('search')
+    def find_duplicates_many(
+        self,
+        queries: List[str],
+        query_ticket_ids: Optional[List[Optional[str]]] = None,
+        num_similar: int = 5,
+        similarity_threshold: float = 0.92,
+        status_filter: Optional[List[str]] = None,
+        priority_filter: Optional[List[str]] = None,
+        label_filter: Optional[List[str]] = None,
+        created_after: Optional[Union[str, datetime]] = None,
+        created_before: Optional[Union[str, datetime]] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        retrieval: str = 'vector',
+        lexical_weight: float = 0.3
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Find potentially duplicate bugs for many queries at once.
+
+        All queries are embedded in one batched request and searched with a
+        single matrix FAISS search. Filters restrict the search to matching
+        rows inside FAISS, so filtered queries still return up to num_similar
+        bugs.
+
+        Retrieval modes:
+        - 'vector': cosine similarity of embeddings
+        - 'lexical': BM25 similarity over summary and processed text, see
+          lexical.BM25Index. No embedding call, so it answers in milliseconds
+          and works without API access. Scores are lower than cosine
+          similarity for the same match, so use a lower threshold.
+        - 'hybrid': the vector and BM25 candidates, scored by
+          (1 - lexical_weight) * cosine + lexical_weight * BM25 similarity
+
+        Args:
+            queries: Processed query texts
+            query_ticket_ids: Ticket ID of each query (or None) to exclude from its results
+            num_similar: Maximum number of duplicates per query
+            similarity_threshold: Minimum cosine similarity of a duplicate
+            status_filter: Only return bugs in one of these statuses
+            priority_filter: Only return bugs with one of these priorities
+            label_filter: Only return bugs with at least one of these labels
+            created_after: Only return bugs created at or after this time
+            created_before: Only return bugs created before this time
+            nprobe: IVF cells visited for 'ivfpq' indexes, more is slower but finds more
+            ef_search: Candidate list size for 'hnsw' indexes, more is slower but finds more
+            retrieval: 'vector', 'lexical' or 'hybrid'
+            lexical_weight: Weight of the BM25 similarity in hybrid scores
+
+        Returns:
+            One list of duplicates per query, in the same shape as find_duplicates
         """
         if self.vector_store is None:
             raise ValueError("Vector store not initialized. Call build_vector_store first")
-            
-        # Configure for exact search
-        search_kwargs = {
-            'search_type': 'similarity_score_threshold',
-            'score_threshold': 1 - similarity_threshold,  # Convert similarity to distance
-        }
-        
-        if status_filter:
-            search_kwargs['filter'] = {'status': {'$in': status_filter}}
+
+        if query_ticket_ids is None:
+            query_ticket_ids = [None] * len(queries)
+
+        if len(query_ticket_ids) != len(queries):
+            raise ValueError("query_ticket_ids must have one entry per query")
+
+        if retrieval not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval {retrieval}, expected one of {', '.join(RETRIEVAL_MODES)}")
+
+        if not queries:
+            return []
+
+        # Results of the same search on the same database are served from
+        # memory, as copies so callers can't alter the cached ones
+        options = (
+            self.snapshot_id, num_similar, similarity_threshold,
+            tuple(status_filter or ()), tuple(priority_filter or ()), tuple(label_filter or ()),
+            str(created_after), str(created_before), nprobe or self.nprobe, ef_search or self.ef_search,
+            retrieval, lexical_weight if retrieval == 'hybrid' else None
+        )
+        cache_keys = [(query, query_ticket_id, options) for query, query_ticket_id in zip(queries, query_ticket_ids)]
+        results = [self.query_results.get(cache_key) for cache_key in cache_keys]
+
+        missing = [i for i, cached in enumerate(results) if cached is None]
+        if missing:
+            found = self._search_many(
+                [queries[i] for i in missing],
+                [query_ticket_ids[i] for i in missing],
+                num_similar, similarity_threshold,
+                self._filter_rows(status_filter, priority_filter, label_filter, created_after, created_before),
+                nprobe, ef_search, retrieval, lexical_weight
+            )
+            for i, duplicates in zip(missing, found):
+                self.query_results.put(cache_keys[i], duplicates)
+                results[i] = duplicates
+
+        return [[dict(duplicate) for duplicate in duplicates] for duplicates in results]
+
+    def _search_many(
+        self,
+        queries: List[str],
+        query_ticket_ids: List[Optional[str]],
+        num_similar: int,
+        similarity_threshold: float,
+        rows: Optional[np.ndarray],
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+        retrieval: str,
+        lexical_weight: float
+    ) -> List[List[Dict[str, Any]]]:
+        """Search the queries without the result cache, within the given FAISS rows if set."""
+        if rows is not None and len(rows) == 0:
+            return [[] for _ in queries]
 
         # Get one extra result if we need to filter out the query ticket
-        search_k = num_similar + (1 if query_ticket_id else 0)
-            
-        similar_bugs = self.vector_store.similarity_search_with_score(
-            query_text,
-            k=search_k,
-            **search_kwargs
+        search_k = num_similar + (1 if any(query_ticket_ids) else 0)
+        search_k = min(search_k, self.vector_store.index.ntotal if rows is None else len(rows))
+
+        if retrieval != 'vector' and self.lexical_index is None:
+            self.build_lexical_index()
+
+        if retrieval == 'lexical':
+            with self.metrics.timer('lexical_search'):
+                candidates = [self.lexical_index.search(query, search_k, rows, self.deleted_rows) for query in queries]
+        else:
+            candidates = self._vector_candidates(queries, search_k, rows, nprobe, ef_search, retrieval, lexical_weight)
+
+        results = []
+        for query_ticket_id, (row_indices, row_similarities) in zip(query_ticket_ids, candidates):
+            potential_duplicates = []
+            for similarity, i in zip(row_similarities, row_indices):
+                doc = self.vector_store.docstore.search(self.vector_store.index_to_docstore_id[i])
+
+                # Skip if it's the same ticket
+                if query_ticket_id and doc.metadata['key'] == query_ticket_id:
+                    continue
+
+                if similarity >= similarity_threshold:
+                    potential_duplicates.append(self._duplicate_info(doc, similarity))
+
+            results.append(potential_duplicates[:num_similar])
+
+        return results
+
+    def _vector_candidates(
+        self,
+        queries: List[str],
+        search_k: int,
+        rows: Optional[np.ndarray],
+        nprobe: Optional[int],
+        ef_search: Optional[int],
+        retrieval: str,
+        lexical_weight: float
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Row ids and scores of the best matches of every query, best first,
+        by cosine similarity or by hybrid score.
+        """
+        index = self.vector_store.index
+        vectors = self._query_vectors(queries, normalize=index.metric_type == faiss.METRIC_INNER_PRODUCT)
+
+        selector = faiss.IDSelectorBatch(rows) if rows is not None else None
+        not_deleted = self._not_deleted_selector()
+        if not_deleted is not None:
+            selector = not_deleted if selector is None else faiss.IDSelectorAnd(selector, not_deleted)
+        params = search_parameters(
+            index,
+            selector,
+            nprobe=nprobe or self.nprobe,
+            ef_search=ef_search or self.ef_search
         )
-        
-        potential_duplicates = []
-        for doc, score in similar_bugs:
-            # Skip if it's the same ticket
-            if query_ticket_id and doc.metadata['key'] == query_ticket_id:
-                continue
-
-            similarity = 1 - score
-            if similarity >= similarity_threshold:
-                duplicate_info = {
-                    'key': doc.metadata['key'],
-                    'summary': doc.metadata['summary'],
-                    'status': doc.metadata['status'],
-                    'priority': doc.metadata['priority'],
-                    'created': doc.metadata['created'],
-                    'updated': doc.metadata['updated'],
-                    'labels': doc.metadata['labels'],
-                    'similarity_score': f"{similarity:.2%}",
-                    'text_length': len(doc.metadata['text']),
-                    'processed_text': doc.metadata.get('processed_text', doc.page_content)  
-                }
-                potential_duplicates.append(duplicate_info)
-                
-        return potential_duplicates
\ No newline at end of file
+        with self.metrics.timer('faiss_search'):
+            scores, indices = index.search(vectors, search_k, params=params)
+        similarities = scores_to_similarity(index, scores)
+
+        candidates = []
+        for query, vector, row_similarities, row_indices in zip(queries, vectors, similarities, indices):
+            found = row_indices != -1
+            row_indices, row_similarities = row_indices[found], row_similarities[found]
+
+            if retrieval == 'hybrid':
+                # Stored vectors are normalized, so cosine similarity of the
+                # lexical candidates is a dot product with the query
+                lexical_rows, _ = self.lexical_index.search(query, search_k, rows, self.deleted_rows)
+                extra_rows = np.setdiff1d(lexical_rows, row_indices)
+                extra_similarities = np.array(
+                    [index.reconstruct(int(row)) @ vector for row in extra_rows], dtype=np.float32
+                )
+
+                row_indices = np.concatenate([row_indices, extra_rows])
+                row_similarities = (
+                    (1 - lexical_weight) * np.concatenate([row_similarities, extra_similarities])
+                    + lexical_weight * self.lexical_index.similarities(query)[row_indices]
+                )
+                order = np.argsort(-row_similarities, kind='stable')
+                row_indices, row_similarities = row_indices[order], row_similarities[order]
+
+            candidates.append((row_indices, row_similarities))
+
+        return candidates
+
+    def _query_vectors(self, queries: List[str], normalize: bool) -> np.ndarray:
+        """Vectors of the query texts, only embedding texts not searched recently."""
+        cache_keys = [(query, normalize) for query in queries]
+        cached = [self.query_vectors.get(cache_key) for cache_key in cache_keys]
+
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            vectors = np.asarray(self.embeddings.embed_documents([queries[i] for i in missing]), dtype=np.float32)
+            if normalize:
+                faiss.normalize_L2(vectors)
+            for i, vector in zip(missing, vectors):
+                self.query_vectors.put(cache_keys[i], vector)
+                cached[i] = vector
+
+        return np.stack(cached)
+
+    @staticmethod
+    def _duplicate_info(doc: Any, similarity: float) -> Dict[str, Any]:
+        """Describe a matching bug document for find_duplicates results."""
+        return {
+            'key': doc.metadata['key'],
+            'summary': doc.metadata['summary'],
+            'status': doc.metadata['status'],
+            'priority': doc.metadata['priority'],
+            'created': doc.metadata['created'],
+            'updated': doc.metadata['updated'],
+            'labels': doc.metadata['labels'],
+            'similarity': float(similarity),
+            'similarity_score': f"{similarity:.2%}",
+            'text_length': len(doc.metadata['text']),
+            'processed_text': doc.metadata.get('processed_text', doc.page_content)  
+        }
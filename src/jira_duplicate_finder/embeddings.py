@@ -0,0 +1,298 @@
+import hashlib
+import re
+import time
+import zlib
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from tqdm import tqdm
+
+from preprocessing.cache import DiskCache, content_hash
+from preprocessing.rate_limit import RateLimitHeaders, is_rate_limit_error, retry_after_seconds
+from jira_duplicate_finder.metrics import Metrics
+
+# The embeddings below implement the LangChain Embeddings interface without
+# importing LangChain, which takes a while; see register_langchain_embeddings
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings:
+    """
+    Embeddings wrapper with a persistent cache and adaptive batching.
+
+    Vectors are cached on disk keyed by (model, deployment, text hash), so
+    unchanged texts are never embedded twice. Cache misses are sent in batches
+    whose size adapts to the rate limit: it grows after every successful
+    request and halves on HTTP 429, waiting as long as the Retry-After header
+    asks (or backing off exponentially when there is none). With rate_limits,
+    the quota left after a request also sizes the next batch: it holds no
+    more texts than the remaining tokens cover, and jumps to the largest
+    size when too few requests are left for the remaining texts.
+    """
+
+    # Rough number of characters per token, to estimate the tokens of a batch
+    CHARS_PER_TOKEN = 4
+
+    def __init__(
+        self,
+        embeddings: Union['Embeddings', Callable[[], 'Embeddings']],
+        model: str,
+        deployment: str,
+        cache: Optional[DiskCache] = None,
+        batch_size: int = 500,
+        min_batch_size: int = 16,
+        max_batch_size: int = 1000,
+        max_retries: int = 8,
+        metrics: Optional[Metrics] = None,
+        rate_limits: Optional[RateLimitHeaders] = None
+    ):
+        """
+        Args:
+            embeddings: Underlying embeddings, or a function creating them on
+                the first cache miss; should not retry 429s itself
+            model: Embedding model name, part of the cache key
+            deployment: Embedding deployment name, part of the cache key
+            cache: Optional persistent vector cache
+            batch_size: Initial number of texts per request
+            min_batch_size: Smallest batch size to shrink to on rate limits
+            max_batch_size: Largest batch size to grow to
+            max_retries: Consecutive rate limited requests before giving up
+            metrics: Records batch latency, cache hits, embedded texts and rate limits
+            rate_limits: Remaining quota reported by the responses of the
+                underlying embeddings, see RateLimitHeaders
+        """
+        self._embeddings = embeddings
+        self.model = model
+        self.deployment = deployment
+        self.cache = cache
+        self.batch_size = batch_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self.metrics = metrics or Metrics()
+        self.rate_limits = rate_limits
+
+    @property
+    def embeddings(self) -> 'Embeddings':
+        if not hasattr(self._embeddings, 'embed_documents'):
+            self._embeddings = self._embeddings()
+        return self._embeddings
+
+    def _cache_key(self, text: str) -> str:
+        text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return content_hash(self.model, self.deployment, text_hash)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, only calling the API for texts not in the cache."""
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+
+        # One cache lookup for the whole batch, instead of a query and a commit per text
+        keys = [self._cache_key(text) for text in texts]
+        hits = self.cache.get_many(keys) if self.cache is not None else {}
+
+        missing = {}
+        for i, text in enumerate(texts):
+            cached = hits.get(keys[i])
+            if cached is not None:
+                vectors[i] = np.frombuffer(cached, dtype=np.float32).tolist()
+            else:
+                # Identical texts are embedded once
+                missing.setdefault(text, []).append(i)
+
+        self.metrics.increment('embedding_cache_hits', len(texts) - sum(len(positions) for positions in missing.values()))
+        if missing:
+            missing_texts = list(missing)
+            self.metrics.increment('embedding_texts', len(missing_texts))
+            embedded = self._embed_adaptive(missing_texts)
+            for text, vector in zip(missing_texts, embedded):
+                for i in missing[text]:
+                    vectors[i] = vector
+            if self.cache is not None:
+                self.cache.set_many({
+                    keys[missing[text][0]]: np.asarray(vector, dtype=np.float32).tobytes()
+                    for text, vector in zip(missing_texts, embedded)
+                })
+
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def _embed_adaptive(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts in rate-limit driven batches."""
+        vectors = []
+        retries = 0
+        with tqdm(total=len(texts), desc="Embedding texts", disable=len(texts) <= self.min_batch_size) as progress:
+            while len(vectors) < len(texts):
+                batch = texts[len(vectors):len(vectors) + self.batch_size]
+                try:
+                    with self.metrics.timer('embedding_batch'):
+                        vectors.extend(self.embeddings.embed_documents(batch))
+                except Exception as e:
+                    if not is_rate_limit_error(e) or retries >= self.max_retries:
+                        raise
+
+                    self.metrics.increment('embedding_rate_limited')
+                    delay = retry_after_seconds(e)
+                    if delay is None:
+                        delay = min(60.0, 2 ** retries)
+                    retries += 1
+                    self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+                    time.sleep(delay)
+                    continue
+
+                retries = 0
+                progress.update(len(batch))
+                self.batch_size = self._next_batch_size(batch, len(texts) - len(vectors))
+
+        return vectors
+
+    def _next_batch_size(self, batch: List[str], remaining_texts: int) -> int:
+        """Size of the next batch after a successful one, from the quota the service reported left."""
+        batch_size = self.batch_size + max(1, self.batch_size // 4)
+        limits = self.rate_limits
+        if limits is not None:
+            # Few requests left: spend the tokens in fewer, larger batches
+            if limits.remaining_requests is not None and limits.remaining_requests * batch_size < remaining_texts:
+                batch_size = self.max_batch_size
+            if limits.remaining_tokens is not None:
+                tokens_per_text = max(1.0, sum(len(text) for text in batch) / self.CHARS_PER_TOKEN / len(batch))
+                batch_size = min(batch_size, int(limits.remaining_tokens / tokens_per_text))
+        return max(self.min_batch_size, min(self.max_batch_size, batch_size))
+
+
+EMBEDDING_BACKENDS = ('azure', 'hashing', 'sentence-transformers')
+
+
+class HashingEmbeddings:
+    """
+    Deterministic local embeddings by feature hashing.
+
+    Lowercased words and pairs of adjacent words are hashed (CRC32) into a
+    fixed number of signed buckets, counts are damped with log1p and vectors
+    are L2-normalized. Needs no model or network access, and whole batches
+    are encoded with a few numpy operations, so it suits offline builds, CI
+    and benchmarks. Similarity reflects shared wording rather than meaning.
+    """
+
+    TOKEN_PATTERN = re.compile(r"\w+")
+
+    def __init__(self, dimension: int = 1024, ngrams: int = 2):
+        """
+        Args:
+            dimension: Number of hash buckets, the vector dimension
+            ngrams: Longest run of adjacent words hashed as one feature
+        """
+        self.dimension = dimension
+        self.ngrams = ngrams
+
+    @property
+    def model(self) -> str:
+        """Name identifying the vectors, changes whenever they would."""
+        return f"hashing-{self.dimension}-{self.ngrams}"
+
+    def _features(self, text: str) -> List[str]:
+        words = self.TOKEN_PATTERN.findall(text.lower())
+        return [
+            ' '.join(words[start:start + n])
+            for n in range(1, self.ngrams + 1)
+            for start in range(len(words) - n + 1)
+        ]
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a float32 matrix with one normalized row per text."""
+        features = [self._features(text) for text in texts]
+        rows = np.repeat(np.arange(len(texts)), [len(text_features) for text_features in features])
+        hashes = np.fromiter(
+            (zlib.crc32(feature.encode('utf-8')) for text_features in features for feature in text_features),
+            dtype=np.uint32,
+            count=len(rows)
+        )
+
+        # The top hash bit picks the sign, so colliding features tend to cancel out
+        buckets = rows * self.dimension + hashes % self.dimension
+        signs = np.where(hashes >> 31, -1.0, 1.0)
+        counts = np.bincount(buckets, weights=signs, minlength=len(texts) * self.dimension)
+
+        vectors = (np.sign(counts) * np.log1p(np.abs(counts))).reshape(len(texts), self.dimension)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.where(norms > 0, norms, 1)).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class SentenceTransformerEmbeddings:
+    """
+    Local embeddings from a sentence-transformers model, encoded on CPU (or
+    the given device) in batches. Needs the optional sentence-transformers
+    package, and the model files once to download or from a local path.
+    """
+
+    DEFAULT_MODEL = 'all-MiniLM-L6-v2'
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, batch_size: int = 64, device: Optional[str] = None):
+        """
+        Args:
+            model_name: Model name or local model directory
+            batch_size: Texts encoded per forward pass
+            device: Torch device, e.g. 'cpu' or 'cuda', picked automatically if None
+        """
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("The sentence-transformers embedding backend needs "
+                              "`pip install sentence-transformers`") from e
+
+        self.model = model_name
+        self.batch_size = batch_size
+        self.encoder = SentenceTransformer(model_name, device=device)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.encoder.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return vectors.astype(np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def local_embeddings(backend: str, options: Dict[str, Any]) -> Tuple[Callable[[], 'Embeddings'], str]:
+    """
+    Local embedding backend by name.
+
+    Args:
+        backend: 'hashing' or 'sentence-transformers'
+        options: Keyword arguments of the backend class
+
+    Returns:
+        A function creating the embeddings, so slow model loads wait for the
+        first cache miss, and the model name identifying their vectors
+    """
+    if backend == 'hashing':
+        embeddings = HashingEmbeddings(**options)
+        return lambda: embeddings, embeddings.model
+    if backend == 'sentence-transformers':
+        return (lambda: SentenceTransformerEmbeddings(**options),
+                options.get('model_name', SentenceTransformerEmbeddings.DEFAULT_MODEL))
+    raise ValueError(f"Unknown embedding backend {backend}, expected one of {', '.join(EMBEDDING_BACKENDS)}")
+
+
+def register_langchain_embeddings() -> None:
+    """
+    Register the embeddings of this module as LangChain Embeddings, so
+    LangChain vector stores accept them. Imports LangChain.
+    """
+    from langchain_core.embeddings import Embeddings
+
+    for embeddings_class in (CachedEmbeddings, HashingEmbeddings, SentenceTransformerEmbeddings):
+        Embeddings.register(embeddings_class)
@@ -0,0 +1,329 @@
+import json
+import os
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from jira_duplicate_finder.duplicate_finder import JiraDuplicateFinder
+
+
+# Jira webhook events handled, and how they change the ticket
+WEBHOOK_EVENTS = {
+    'jira:issue_created': 'changed',
+    'jira:issue_updated': 'changed',
+    'jira:issue_deleted': 'deleted'
+}
+
+
+def parse_event(payload: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """
+    The ticket key and change ('changed' or 'deleted') of a Jira webhook
+    payload, or None for events that don't change a ticket.
+    """
+    change = WEBHOOK_EVENTS.get(payload.get('webhookEvent'))
+    key = (payload.get('issue') or {}).get('key')
+    if change is None or not key:
+        return None
+    return key, change
+
+
+def read_events(
+    path: str,
+    follow: bool = False,
+    poll_interval: float = 1.0,
+    stop: Optional[threading.Event] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Replay webhook payloads from a JSON Lines file, such as an EventJournal.
+
+    Args:
+        path: Events file, one payload per line
+        follow: Keep waiting for lines appended to the file, like `tail -f`
+        poll_interval: Seconds between checks for new lines when following
+        stop: Stops following once set
+    """
+    with open(path, encoding='utf-8') as f:
+        partial = ''
+        while True:
+            line = f.readline()
+            if line.endswith('\n'):
+                line, partial = partial + line, ''
+                if line.strip():
+                    yield json.loads(line)
+                continue
+
+            # Keep a line still being written until it is complete
+            partial += line
+            if not follow:
+                if partial.strip():
+                    yield json.loads(partial)
+                return
+            if stop is not None and stop.is_set():
+                return
+            time.sleep(poll_interval)
+
+
+class EventJournal:
+    """
+    Appends webhook payloads to a JSON Lines file as they arrive, so events
+    can be replayed with read_events, e.g. after a restart. Every payload is
+    synced to disk before append returns, so it survives a crash of the
+    process or the machine once the webhook is acknowledged.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def append(self, payload: Dict[str, Any]) -> None:
+        line = json.dumps(payload, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class EventIngestor:
+    """
+    Keeps a loaded database up to date from ticket events.
+
+    Events are queued and applied in micro-batches: a batch closes once it
+    holds max_batch_size tickets or max_wait seconds after its first event.
+    All tickets of a batch are fetched in one Jira search, preprocessed
+    concurrently and embedded in one request, then appended to the index in
+    memory, see JiraDuplicateFinder.apply_ticket_changes. A snapshot is saved
+    every snapshot_interval seconds when tickets changed, which search
+    servers pick up as the latest database.
+
+    Flat indexes replace changed tickets in place. Approximate indexes append
+    new versions and leave the old rows out of searches until they are
+    rebuilt, when a snapshot is saved or once too many rows are deleted.
+    """
+
+    def __init__(
+        self,
+        finder: JiraDuplicateFinder,
+        directory: str = "./bug_database",
+        jql_filter: Optional[str] = None,
+        max_batch_size: int = 100,
+        max_wait: float = 5.0,
+        snapshot_interval: float = 300.0
+    ):
+        """
+        Args:
+            finder: Finder with a database loaded with load_database
+            directory: Base directory to save snapshots into
+            jql_filter: JQL query the database was built from; tickets no
+                longer matching it are removed
+            max_batch_size: Maximum number of tickets per batch
+            max_wait: Seconds a batch waits for more events after its first one
+            snapshot_interval: Minimum seconds between snapshots
+        """
+        self.finder = finder
+        self.directory = directory
+        self.jql_filter = jql_filter
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.snapshot_interval = snapshot_interval
+
+        self.events: 'queue.Queue[Tuple[str, str]]' = queue.Queue()
+        # Held while the index changes, searches through the ingestor wait for it
+        self.lock = threading.Lock()
+        self.unsaved_changes = 0
+        self.last_snapshot = time.monotonic()
+        self.snapshot_path: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, payload: Dict[str, Any]) -> bool:
+        """
+        Queue a webhook payload.
+
+        Returns:
+            True if the event changes a ticket and was queued
+        """
+        event = parse_event(payload)
+        if event is None:
+            return False
+        self.finder.metrics.increment('events_received', change=event[1])
+        self.events.put(event)
+        return True
+
+    def next_batch(self, timeout: float = 1.0) -> Dict[str, str]:
+        """
+        Collect the next batch of events, waiting up to timeout for the
+        first one. The last change of a ticket wins.
+
+        Returns:
+            Change by ticket key, empty if no event arrived
+        """
+        try:
+            key, change = self.events.get(timeout=timeout)
+        except queue.Empty:
+            return {}
+
+        batch = {key: change}
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                key, change = self.events.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch[key] = change
+        return batch
+
+    def ingest(self, batch: Dict[str, str]) -> Dict[str, int]:
+        """Apply a batch of ticket changes to the loaded database."""
+        changed = [key for key, change in batch.items() if change == 'changed']
+        deleted = [key for key, change in batch.items() if change == 'deleted']
+        with self.lock:
+            counts = self.finder.apply_ticket_changes(changed, deleted, self.jql_filter)
+            self.unsaved_changes += sum(counts.values())
+        print(f"Ingested {len(batch)} events: {counts['added']} new, {counts['updated']} updated, "
+              f"{counts['removed']} removed bugs")
+        return counts
+
+    def snapshot(self) -> Optional[str]:
+        """
+        Save the database as a new snapshot if tickets changed since the last one.
+
+        Returns:
+            The snapshot directory, or None if nothing changed
+        """
+        self.last_snapshot = time.monotonic()
+        with self.lock:
+            if not self.unsaved_changes:
+                return None
+            self.snapshot_path = self.finder.save_database(self.directory)
+            self.unsaved_changes = 0
+        return self.snapshot_path
+
+    def run(self) -> None:
+        """Apply batches and save snapshots until stopped and all queued events are applied."""
+        batch: Dict[str, str] = {}
+        while batch or not (self._stop.is_set() and self.events.empty()):
+            # A failed batch is retried before any later event, so the
+            # events of a ticket are always applied in the order they came
+            batch = batch or self.next_batch()
+            if batch:
+                try:
+                    self.ingest(batch)
+                    batch = {}
+                except Exception as e:
+                    # Jira or Azure OpenAI unavailable: keep the events and try again later
+                    print(f"Error ingesting {len(batch)} events, retrying: {str(e)}")
+                    self.finder.metrics.increment('ingest_errors')
+                    if self._stop.wait(self.max_wait):
+                        print(f"Stopped with {len(batch) + self.events.qsize()} events not applied, "
+                              f"replay them from the journal")
+                        break
+
+            if time.monotonic() - self.last_snapshot >= self.snapshot_interval:
+                try:
+                    self.snapshot()
+                except Exception as e:
+                    print(f"Error saving snapshot: {str(e)}")
+
+    def start(self) -> None:
+        """Apply events in a background thread."""
+        self._thread = threading.Thread(target=self.run, name="event-ingestor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Optional[str]:
+        """
+        Apply the queued events, stop and save a last snapshot.
+
+        Returns:
+            The last snapshot directory, or None if nothing changed since the previous one
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.snapshot()
+
+    def find_duplicates_many(self, queries: List[str], **options: Any) -> List[List[Dict[str, Any]]]:
+        """Search the live database, including tickets not saved in a snapshot yet."""
+        with self.lock:
+            return self.finder.find_duplicates_many(queries, **options)
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            'status': 'ok',
+            'queued_events': self.events.qsize(),
+            'unsaved_changes': self.unsaved_changes,
+            'num_bugs': self.finder.num_bugs,
+            'last_snapshot': self.snapshot_path
+        }
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """
+    Receives Jira webhooks for an EventIngestor:
+
+    - POST (any path, e.g. /webhook): a webhook payload, journaled and queued
+    - GET /health: queued events and unsaved changes
+    - GET /metrics: stage timings and counters in the Prometheus text format
+    """
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self) -> None:
+        ingestor = self.server.ingestor
+        if self.path == '/health':
+            self._respond(200, ingestor.health())
+        elif self.path == '/metrics':
+            self._send(200, ingestor.finder.metrics.to_prometheus().encode('utf-8'), 'text/plain; version=0.0.4')
+        else:
+            self._respond(404, {'error': f"Unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(payload, dict):
+                raise ValueError("Webhook body must be a JSON object")
+        except ValueError as e:
+            self._respond(400, {'error': str(e)})
+            return
+
+        # Journaled first, so an event is never lost once acknowledged
+        if self.server.journal is not None:
+            self.server.journal.append(payload)
+        self._respond(202, {'queued': self.server.ingestor.submit(payload)})
+
+    def _respond(self, status: int, body: Dict[str, Any]) -> None:
+        self._send(status, json.dumps(body, default=str).encode('utf-8'), 'application/json')
+
+    def _send(self, status: int, payload: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def create_webhook_server(
+    ingestor: EventIngestor,
+    host: str = "127.0.0.1",
+    port: int = 8081,
+    journal: Optional[EventJournal] = None
+) -> ThreadingHTTPServer:
+    """Create an HTTP server queuing Jira webhooks into the ingestor, recorded in journal if given."""
+    server = ThreadingHTTPServer((host, port), WebhookHandler)
+    server.daemon_threads = True
+    server.ingestor = ingestor
+    server.journal = journal
+    return server
@@ -0,0 +1,240 @@
+import json
+import os
+import re
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# scipy takes a while to import, so it is only imported once an index is
+# built, loaded or saved, not by every search process
+if TYPE_CHECKING:
+    from scipy.sparse import csc_matrix
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercased words, numbers and codes of a text; 'NAV-123' gives 'nav' and '123'."""
+    return TOKEN_PATTERN.findall(text.lower()) if text else []
+
+
+def _term_counts(
+    documents: Iterable[str],
+    vocabulary: Dict[str, int]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Count the terms of every document, adding unknown terms to vocabulary.
+
+    Returns:
+        Document row, term id and count of every (document, term) pair, and
+        the length of every document
+    """
+    rows, terms, counts, lengths = [], [], [], []
+    for row, document in enumerate(documents):
+        tokens = tokenize(document)
+        lengths.append(len(tokens))
+        for token, count in Counter(tokens).items():
+            rows.append(row)
+            terms.append(vocabulary.setdefault(token, len(vocabulary)))
+            counts.append(count)
+
+    return (
+        np.asarray(rows, dtype=np.int64),
+        np.asarray(terms, dtype=np.int64),
+        np.asarray(counts, dtype=np.float64),
+        np.asarray(lengths, dtype=np.float64)
+    )
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over documents addressed by FAISS row id.
+
+    The BM25 weight of every (term, document) pair is precomputed into a
+    sparse matrix with one column per term, so scoring a query is a sum of
+    the columns of its terms and needs no embedding call.
+
+    Scores are reported as lexical similarity: the BM25 score of a document
+    divided by the score the query would get against itself, capped at 1.
+    A document repeating the query scores 1, unrelated documents 0.
+
+    Rows can be appended and removed without indexing every document again.
+    Term statistics then stay those of the last build (extended by new
+    terms) until the index is built again; changed_rows counts the rows
+    appended or removed since.
+    """
+
+    def __init__(
+        self,
+        vocabulary: Dict[str, int],
+        weights: 'csc_matrix',
+        idf: np.ndarray,
+        average_length: float,
+        k1: float = 1.5,
+        b: float = 0.75,
+        changed_rows: int = 0
+    ):
+        self.vocabulary = vocabulary
+        self.weights = weights
+        self.idf = idf
+        self.average_length = average_length
+        self.k1 = k1
+        self.b = b
+        self.changed_rows = changed_rows
+
+    @classmethod
+    def build(cls, documents: Iterable[str], k1: float = 1.5, b: float = 0.75) -> 'BM25Index':
+        """
+        Index documents, the i-th document being FAISS row i.
+
+        Args:
+            documents: Text of every row, can be streamed
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        vocabulary: Dict[str, int] = {}
+        rows, terms, counts, lengths = _term_counts(documents, vocabulary)
+
+        num_documents = len(lengths)
+        average_length = float(lengths.mean()) if num_documents and lengths.mean() > 0 else 1.0
+        document_frequency = np.bincount(terms, minlength=len(vocabulary))
+        idf = np.log1p((num_documents - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        index = cls(vocabulary, None, idf.astype(np.float32), average_length, k1, b)
+        index.weights = index._weights(rows, terms, counts, lengths)
+        return index
+
+    def _weights(self, rows: np.ndarray, terms: np.ndarray, counts: np.ndarray, lengths: np.ndarray) -> 'csc_matrix':
+        """BM25 weights of counted terms, one row per document and one column per vocabulary term."""
+        from scipy.sparse import csc_matrix
+
+        norms = self.k1 * (1 - self.b + self.b * lengths[rows] / self.average_length)
+        values = self.idf[terms] * counts * (self.k1 + 1) / (counts + norms)
+        return csc_matrix(
+            (values.astype(np.float32), (rows, terms)),
+            shape=(len(lengths), len(self.vocabulary))
+        )
+
+    def append(self, documents: Iterable[str]) -> 'BM25Index':
+        """
+        A copy of the index with documents appended as the next rows. Terms
+        not indexed yet get their idf from the appended documents.
+        """
+        from scipy.sparse import csc_matrix, vstack
+
+        vocabulary = dict(self.vocabulary)
+        rows, terms, counts, lengths = _term_counts(documents, vocabulary)
+
+        num_documents = len(self) + len(lengths)
+        new_frequency = np.bincount(terms[terms >= len(self.vocabulary)], minlength=len(vocabulary))
+        new_frequency = new_frequency[len(self.vocabulary):]
+        new_idf = np.log1p((num_documents - new_frequency + 0.5) / (new_frequency + 0.5))
+
+        index = BM25Index(
+            vocabulary, None, np.concatenate([self.idf, new_idf.astype(np.float32)]),
+            self.average_length, self.k1, self.b, self.changed_rows + len(lengths)
+        )
+        # Existing rows get empty columns for the new terms
+        weights = self.weights
+        indptr = np.concatenate([weights.indptr, np.full(len(new_idf), weights.indptr[-1])])
+        weights = csc_matrix((weights.data, weights.indices, indptr), shape=(len(self), len(vocabulary)))
+        index.weights = vstack([weights, index._weights(rows, terms, counts, lengths)], format='csc')
+        return index
+
+    def without_rows(self, rows: np.ndarray) -> 'BM25Index':
+        """A copy of the index without the given rows; the other rows keep their order."""
+        kept_rows = np.setdiff1d(np.arange(len(self)), rows)
+        return BM25Index(
+            self.vocabulary, self.weights[kept_rows], self.idf, self.average_length, self.k1, self.b,
+            self.changed_rows + len(self) - len(kept_rows)
+        )
+
+    def __len__(self) -> int:
+        return self.weights.shape[0]
+
+    def _query_terms(self, query: str) -> Tuple[np.ndarray, float]:
+        """Term ids of the query found in the index, and the query's score against itself."""
+        tokens = tokenize(query)
+        counts = Counter(token for token in tokens if token in self.vocabulary)
+        if not counts:
+            return np.empty(0, dtype=np.int64), 0.0
+
+        terms = np.fromiter((self.vocabulary[token] for token in counts), dtype=np.int64, count=len(counts))
+        tf = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        norm = self.k1 * (1 - self.b + self.b * len(tokens) / self.average_length)
+        self_score = float(np.sum(self.idf[terms] * tf * (self.k1 + 1) / (tf + norm)))
+        return terms, self_score
+
+    def similarities(self, query: str) -> np.ndarray:
+        """Lexical similarity of the query to every document."""
+        terms, self_score = self._query_terms(query)
+        if not len(terms) or self_score <= 0:
+            return np.zeros(len(self), dtype=np.float32)
+
+        scores = np.asarray(self.weights[:, terms].sum(axis=1)).ravel()
+        return np.minimum(scores / self_score, 1.0).astype(np.float32)
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        rows: Optional[np.ndarray] = None,
+        excluded: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top k documents of a query by lexical similarity.
+
+        Args:
+            query: Query text
+            k: Maximum number of documents
+            rows: Only consider these row ids
+            excluded: Never return these row ids
+
+        Returns:
+            Row ids and similarities, best first, without documents sharing no term
+        """
+        similarities = self.similarities(query)
+        if rows is not None:
+            allowed = np.zeros(len(similarities), dtype=bool)
+            allowed[rows] = True
+            similarities = np.where(allowed, similarities, 0)
+        if excluded is not None and len(excluded):
+            similarities[excluded] = 0
+
+        candidates = np.flatnonzero(similarities > 0)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-similarities[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-similarities[candidates], kind='stable')]
+        return candidates, similarities[candidates]
+
+    def save(self, directory: str) -> None:
+        from scipy.sparse import save_npz
+
+        os.makedirs(directory, exist_ok=True)
+        save_npz(os.path.join(directory, 'weights.npz'), self.weights)
+        np.save(os.path.join(directory, 'idf.npy'), self.idf)
+        with open(os.path.join(directory, 'vocabulary.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'terms': list(self.vocabulary),
+                'average_length': self.average_length,
+                'k1': self.k1,
+                'b': self.b
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: str) -> 'BM25Index':
+        from scipy.sparse import load_npz
+
+        with open(os.path.join(directory, 'vocabulary.json'), encoding='utf-8') as f:
+            settings = json.load(f)
+
+        return cls(
+            {term: i for i, term in enumerate(settings['terms'])},
+            load_npz(os.path.join(directory, 'weights.npz')).tocsc(),
+            np.load(os.path.join(directory, 'idf.npy')),
+            settings['average_length'],
+            settings['k1'],
+            settings['b']
+        )
@@ -0,0 +1,217 @@
+import json
+import os
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# Columns holding lists are stored as JSON, everything else as UTF-8 strings
+JSON_COLUMNS = ('labels',)
+
+
+def write_column_store(directory: str, df: 'pd.DataFrame') -> Dict[str, str]:
+    """
+    Write a DataFrame as one set of files per column, readable with ColumnStore.
+
+    Each column is stored as its concatenated UTF-8 values (<column>.data),
+    the int64 offsets of every value (<column>.offsets.npy) and a mask of
+    missing values (<column>.nulls.npy), so single values can be read from a
+    memory map without loading the column.
+
+    Returns:
+        The kind ('str' or 'json') of every column
+    """
+    writer = ColumnStoreWriter(directory, list(df.columns))
+    writer.append(df)
+    return writer.close()
+
+
+class ColumnStoreWriter:
+    """
+    Write a column store one DataFrame chunk at a time, in the layout of
+    write_column_store, so stores larger than memory can be written.
+    """
+
+    def __init__(self, directory: str, columns: List[str]):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.kinds = {column: 'json' if column in JSON_COLUMNS else 'str' for column in columns}
+        self._files = {column: open(os.path.join(directory, f"{column}.data"), 'wb') for column in columns}
+        self._lengths: Dict[str, List[int]] = {column: [] for column in columns}
+        self._nulls: Dict[str, List[bool]] = {column: [] for column in columns}
+
+    def append(self, df: 'pd.DataFrame') -> None:
+        """Append the rows of a DataFrame with the store's columns."""
+        for column, kind in self.kinds.items():
+            values = df[column].tolist()
+            nulls = [value is None or (isinstance(value, float) and np.isnan(value)) for value in values]
+
+            if kind == 'json':
+                encoded = [b'' if null else json.dumps(value, ensure_ascii=False).encode('utf-8')
+                           for value, null in zip(values, nulls)]
+            else:
+                encoded = [b'' if null else str(value).encode('utf-8') for value, null in zip(values, nulls)]
+
+            self._files[column].write(b''.join(encoded))
+            self._lengths[column].extend(len(value) for value in encoded)
+            self._nulls[column].extend(nulls)
+
+    def close(self) -> Dict[str, str]:
+        """
+        Finish writing the offsets and null masks.
+
+        Returns:
+            The kind ('str' or 'json') of every column
+        """
+        for column, data_file in self._files.items():
+            data_file.close()
+
+            offsets = np.zeros(len(self._lengths[column]) + 1, dtype=np.int64)
+            np.cumsum(self._lengths[column], out=offsets[1:])
+            np.save(os.path.join(self.directory, f"{column}.offsets.npy"), offsets)
+            np.save(os.path.join(self.directory, f"{column}.nulls.npy"), np.array(self._nulls[column], dtype=bool))
+
+        return self.kinds
+
+
+class StoredColumn:
+    """A memory-mapped column of a ColumnStore."""
+
+    def __init__(self, directory: str, name: str, kind: str):
+        self.kind = kind
+        self.offsets = np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode='r')
+        self.nulls = np.load(os.path.join(directory, f"{name}.nulls.npy"), mmap_mode='r')
+
+        data_path = os.path.join(directory, f"{name}.data")
+        # np.memmap can't map empty files
+        if os.path.getsize(data_path):
+            self.data = np.memmap(data_path, dtype=np.uint8, mode='r')
+        else:
+            self.data = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.nulls)
+
+    def _decode(self, raw: bytes) -> Any:
+        text = raw.decode('utf-8')
+        return json.loads(text) if self.kind == 'json' else text
+
+    def __getitem__(self, row: int) -> Any:
+        if self.nulls[row]:
+            return None
+        return self._decode(self.data[self.offsets[row]:self.offsets[row + 1]].tobytes())
+
+    def take(self, rows: Iterable[int]) -> List[Any]:
+        return [self[row] for row in rows]
+
+    def to_list(self) -> List[Any]:
+        raw = self.data.tobytes()
+        offsets = self.offsets.tolist()
+        return [
+            None if null else self._decode(raw[offsets[row]:offsets[row + 1]])
+            for row, null in enumerate(self.nulls.tolist())
+        ]
+
+
+class ColumnStore:
+    """
+    Read-only columnar bug metadata written by write_column_store.
+
+    Rows are addressed by FAISS row id. Columns are memory-mapped the first
+    time they are used, so opening a store reads nothing but file headers.
+    """
+
+    def __init__(self, directory: str, kinds: Dict[str, str]):
+        self.directory = directory
+        self.kinds = kinds
+        self._columns: Dict[str, StoredColumn] = {}
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.kinds)
+
+    def column(self, name: str) -> StoredColumn:
+        if name not in self._columns:
+            if name not in self.kinds:
+                raise KeyError(f"No column {name} in metadata store")
+            self._columns[name] = StoredColumn(self.directory, name, self.kinds[name])
+        return self._columns[name]
+
+    def __len__(self) -> int:
+        return len(self.column(self.columns[0])) if self.kinds else 0
+
+    def row(self, row: int) -> Dict[str, Any]:
+        return {name: self.column(name)[row] for name in self.columns}
+
+    def to_dataframe(self, columns: Optional[List[str]] = None) -> 'pd.DataFrame':
+        import pandas as pd
+
+        columns = columns or self.columns
+        return pd.DataFrame({name: self.column(name).to_list() for name in columns}, columns=columns)
+
+
+class StoredDocument:
+    """A bug read from a ColumnStore, shaped like a LangChain Document."""
+
+    __slots__ = ('page_content', 'metadata')
+
+    def __init__(self, page_content: str, metadata: Dict[str, Any]):
+        self.page_content = page_content
+        self.metadata = metadata
+
+
+class ColumnarDocstore:
+    """
+    Docstore serving bug documents from a ColumnStore.
+
+    Documents are built on demand from the stored row with the same docstore
+    id, with the processed text as page content and the row as metadata.
+    Documents added or deleted afterwards (e.g. by an incremental update)
+    are tracked in memory on top of the read-only store.
+
+    It implements the LangChain Docstore and AddableMixin interfaces without
+    importing LangChain, so search-only loads don't pay for it. Vector stores
+    register it as both when they import LangChain.
+    """
+
+    def __init__(self, store: ColumnStore, ids: List[str]):
+        """
+        Args:
+            store: Metadata of the stored documents
+            ids: Docstore id of every stored row
+        """
+        self.store = store
+        self._rows = {docstore_id: row for row, docstore_id in enumerate(ids)}
+        self._added: Dict[str, Any] = {}
+
+    def add(self, texts: Dict[str, Any]) -> None:
+        overlapping = set(texts).intersection(set(self._rows) | set(self._added))
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        self._added.update(texts)
+
+    def delete(self, ids: List) -> None:
+        for docstore_id in ids:
+            if self._added.pop(docstore_id, None) is None and self._rows.pop(docstore_id, None) is None:
+                raise ValueError(f"Tried to delete ids that does not exist: {docstore_id}")
+
+    def search(self, search: str) -> Union[str, StoredDocument]:
+        if search in self._added:
+            return self._added[search]
+        if search not in self._rows:
+            return f"ID {search} not found."
+
+        metadata = self.store.row(self._rows[search])
+        return StoredDocument(metadata.get('text') or '', metadata)
+
+    def column(self, ids: List[str], name: str) -> List[Any]:
+        """Metadata values of one column for the given ids, reading only that column."""
+        stored = self.store.column(name)
+        return [
+            self._added[docstore_id].metadata[name] if docstore_id in self._added
+            else stored[self._rows[docstore_id]]
+            for docstore_id in ids
+        ]
@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+# Called with the kind ('timer' or 'counter'), name, value (seconds or
+# increment) and labels of every recorded measurement
+MetricsHook = Callable[[str, str, float, Dict[str, str]], None]
+
+
+def _series(name: str, labels: Dict[str, Any]) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def _escape_label_value(value: str) -> str:
+    # Backslashes first, so the escapes added for quotes and newlines stay intact
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """
+    Timers and counters of the stages of a build or of a search process.
+
+    Timers keep the count, total, minimum and maximum of their durations;
+    counters keep a running total. Both can carry labels, e.g. the retrieval
+    mode of a search. Hooks receive every measurement as it is recorded, and
+    the totals can be dumped as JSON or in the Prometheus text format.
+    Safe to share between threads.
+    """
+
+    def __init__(self):
+        self._timers: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = {}
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._hooks: List[MetricsHook] = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook: MetricsHook) -> None:
+        """Call hook with every timer and counter measurement from now on."""
+        self._hooks.append(hook)
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        """Record a duration of a timer."""
+        series = _series(name, labels)
+        with self._lock:
+            timer = self._timers.get(series)
+            if timer is None:
+                self._timers[series] = [1, seconds, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                timer[2] = min(timer[2], seconds)
+                timer[3] = max(timer[3], seconds)
+        for hook in self._hooks:
+            hook('timer', name, seconds, dict(series[1]))
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        """Time the enclosed block, including when it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def increment(self, name: str, value: float = 1, **labels: Any) -> None:
+        series = _series(name, labels)
+        with self._lock:
+            self._counters[series] = self._counters.get(series, 0) + value
+        for hook in self._hooks:
+            hook('counter', name, value, dict(series[1]))
+
+    def reset(self) -> None:
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Totals of every timer and counter."""
+        with self._lock:
+            timers = sorted(self._timers.items())
+            counters = sorted(self._counters.items())
+        return {
+            'timers': [
+                {'name': name, 'labels': dict(labels), 'count': int(count),
+                 'total_seconds': total, 'min_seconds': low, 'max_seconds': high}
+                for (name, labels), (count, total, low, high) in timers
+            ],
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in counters
+            ]
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix: str = "jira_duplicate_finder") -> str:
+        """Totals in the Prometheus text format, timers as summaries in seconds."""
+        def labels_text(labels):
+            if not labels:
+                return ''
+            return '{' + ','.join(f'{label}="{_escape_label_value(value)}"' for label, value in labels.items()) + '}'
+
+        snapshot = self.snapshot()
+        lines = []
+        for name in sorted({timer['name'] for timer in snapshot['timers']}):
+            lines.append(f"# TYPE {prefix}_{name}_seconds summary")
+            for timer in (timer for timer in snapshot['timers'] if timer['name'] == name):
+                labels = labels_text(timer['labels'])
+                lines.append(f"{prefix}_{name}_seconds_count{labels} {timer['count']}")
+                lines.append(f"{prefix}_{name}_seconds_sum{labels} {timer['total_seconds']:.6f}")
+        for name in sorted({counter['name'] for counter in snapshot['counters']}):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            for counter in (counter for counter in snapshot['counters'] if counter['name'] == name):
+                lines.append(f"{prefix}_{name}_total{labels_text(counter['labels'])} {counter['value']:g}")
+        return '\n'.join(lines) + '\n'
+
+    def report(self) -> str:
+        """A readable table of the totals, slowest stages first."""
+        snapshot = self.snapshot()
+        lines = [f"{'stage':<32}{'count':>10}{'total s':>12}{'mean ms':>12}{'max ms':>12}"]
+        for timer in sorted(snapshot['timers'], key=lambda timer: -timer['total_seconds']):
+            name = timer['name'] + ''.join(f" {label}={value}" for label, value in timer['labels'].items())
+            lines.append(f"{name:<32}{timer['count']:>10}{timer['total_seconds']:>12.2f}"
+                         f"{timer['total_seconds'] / timer['count'] * 1000:>12.1f}{timer['max_seconds'] * 1000:>12.1f}")
+        for counter in snapshot['counters']:
+            name = counter['name'] + ''.join(f" {label}={value}" for label, value in counter['labels'].items())
+            lines.append(f"{name:<32}{counter['value']:>10g}")
+        return '\n'.join(lines)
+
+    def dump(self, path: str) -> None:
+        """Write the totals to path: JSON for .json files, the Prometheus text format otherwise."""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_json() if path.endswith('.json') else self.to_prometheus())
@@ -0,0 +1,232 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from jira_duplicate_finder.duplicate_finder import JiraDuplicateFinder
+from jira_duplicate_finder.snapshots import snapshot_directories
+
+
+# Request fields passed on to find_duplicates_many
+SEARCH_OPTIONS = ('num_similar', 'similarity_threshold', 'status_filter', 'priority_filter',
+                  'label_filter', 'created_after', 'created_before', 'nprobe', 'ef_search',
+                  'retrieval', 'lexical_weight')
+
+
+def latest_database(base_dir: str) -> Optional[str]:
+    """
+    The most recent complete database directory under base_dir, or None.
+    A database is complete once its snapshot.json has been written.
+    """
+    databases = snapshot_directories(base_dir)
+    return databases[-1] if databases else None
+
+
+class DuplicateSearchService:
+    """
+    Keeps the latest database loaded and answers duplicate searches from it.
+
+    Every request runs against the finder current when it started. A watcher
+    thread loads newer databases next to the current one and then swaps them
+    in with a single reference assignment, so searches never see a partially
+    loaded database and are never blocked by a load.
+    """
+
+    def __init__(self, finder: JiraDuplicateFinder, base_dir: str = "./bug_database", poll_interval: float = 10.0):
+        """
+        Args:
+            finder: Finder providing the settings and clients, e.g. Jira
+                credentials for ticket lookups; it doesn't need a database
+            base_dir: Directory holding the db_* databases
+            poll_interval: Seconds between checks for a newer database
+        """
+        self.template = finder
+        self.base_dir = base_dir
+        self.poll_interval = poll_interval
+
+        path = latest_database(base_dir)
+        if path is None:
+            raise ValueError(f"No database found in {base_dir}")
+
+        self.database = path
+        self.finder = finder.with_database(path)
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def start_watching(self) -> None:
+        """Check for newer databases in a background thread."""
+        self._watcher = threading.Thread(target=self._watch, name="database-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"Error loading newer database: {str(e)}")
+
+    def reload(self) -> bool:
+        """
+        Swap in the latest database if it is newer than the current one.
+
+        Returns:
+            True if a newer database was loaded
+        """
+        path = latest_database(self.base_dir)
+        if path is None or os.path.basename(path) <= os.path.basename(self.database):
+            return False
+
+        finder = self.template.with_database(path)
+        self.finder, self.database = finder, path
+        print(f"Serving database {path} with {finder.num_bugs} bugs")
+        return True
+
+    def health(self) -> Dict[str, Any]:
+        finder, database = self.finder, self.database
+        return {
+            'status': 'ok',
+            'database': database,
+            'num_bugs': finder.num_bugs,
+            'query_cache': {'vectors': finder.query_vectors.stats(), 'results': finder.query_results.stats()}
+        }
+
+    def search(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Answer a single search request with `text` (a processed description)
+        or `ticket` (a ticket ID fetched from Jira and preprocessed), an
+        optional `ticket_id` to leave out of the results and any
+        find_duplicates_many option.
+        """
+        response = self.search_batch({**request, 'queries': [request]})
+        return {'database': response['database'], 'duplicates': response['results'][0]}
+
+    def search_batch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Answer a batch request: `queries` lists query texts or objects shaped
+        like single search requests, and the other fields are search options
+        shared by all queries. All queries are embedded and searched together.
+        """
+        queries = request.get('queries')
+        if not isinstance(queries, list):
+            raise ValueError("queries must be a list")
+
+        options = {name: request[name] for name in SEARCH_OPTIONS if name in request}
+        finder, database = self.finder, self.database
+
+        texts, ticket_ids = self._query_texts(finder, [
+            {'text': query} if isinstance(query, str) else query for query in queries
+        ])
+
+        results = [[] for _ in queries]
+        searchable = [i for i, text in enumerate(texts) if text]
+        found = finder.find_duplicates_many(
+            [texts[i] for i in searchable],
+            query_ticket_ids=[ticket_ids[i] for i in searchable],
+            **options
+        )
+        for i, duplicates in zip(searchable, found):
+            results[i] = duplicates
+
+        return {'database': database, 'results': results}
+
+    @staticmethod
+    def _query_texts(
+        finder: JiraDuplicateFinder,
+        queries: List[Dict[str, Any]]
+    ) -> Tuple[List[Optional[str]], List[Optional[str]]]:
+        """Processed text and excluded ticket ID of every query, fetching tickets given by ID."""
+        for query in queries:
+            if not isinstance(query, dict) or not (query.get('text') or query.get('ticket')):
+                raise ValueError("Every query needs a text or a ticket")
+
+        tickets = [query['ticket'] for query in queries if not query.get('text')]
+        processed_tickets = {}
+        if tickets:
+            tickets_df = finder.fetch_bugs_by_key(tickets)
+            processed_tickets = dict(zip(tickets_df['key'], tickets_df['text']))
+
+        texts = [query.get('text') or processed_tickets.get(query['ticket']) for query in queries]
+        ticket_ids = [query.get('ticket_id') or query.get('ticket') for query in queries]
+        return texts, ticket_ids
+
+
+class DuplicateSearchHandler(BaseHTTPRequestHandler):
+    """
+    JSON API of a DuplicateSearchService:
+
+    - GET /health: the database being served
+    - GET /metrics: stage timings and counters in the Prometheus text format
+    - POST /duplicates: one search, see DuplicateSearchService.search
+    - POST /duplicates/batch: many searches, see DuplicateSearchService.search_batch
+    """
+
+    # Keep connections open between requests
+    protocol_version = 'HTTP/1.1'
+
+    # Headers and body are written separately; with Nagle's algorithm the
+    # body waits for the client's delayed ACK, adding ~40 ms per request
+    disable_nagle_algorithm = True
+
+    @property
+    def service(self) -> DuplicateSearchService:
+        return self.server.service
+
+    def do_GET(self) -> None:
+        if self.path == '/health':
+            self._respond(200, self.service.health())
+        elif self.path == '/metrics':
+            self._send(200, self.service.finder.metrics.to_prometheus().encode('utf-8'), 'text/plain; version=0.0.4')
+        else:
+            self._respond(404, {'error': f"Unknown path {self.path}"})
+
+    def do_POST(self) -> None:
+        routes = {'/duplicates': self.service.search, '/duplicates/batch': self.service.search_batch}
+        if self.path not in routes:
+            self._respond(404, {'error': f"Unknown path {self.path}"})
+            return
+
+        started = time.perf_counter()
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError("Request body must be a JSON object")
+            response = routes[self.path](request)
+        except ValueError as e:
+            self._respond(400, {'error': str(e)})
+            return
+        except Exception as e:
+            self._respond(500, {'error': str(e)})
+            return
+
+        response['took_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        self._respond(200, response)
+
+    def _respond(self, status: int, body: Dict[str, Any]) -> None:
+        self._send(status, json.dumps(body, default=str).encode('utf-8'), 'application/json')
+
+    def _send(self, status: int, payload: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # Per-request logging would dominate the response time
+        pass
+
+
+def create_server(service: DuplicateSearchService, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    """Create an HTTP server answering requests concurrently from the service."""
+    server = ThreadingHTTPServer((host, port), DuplicateSearchHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
@@ -0,0 +1,155 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from jira_duplicate_finder.duplicate_finder import JiraDuplicateFinder
+from jira_duplicate_finder.snapshots import OBJECTS_DIR, snapshot_directories
+
+
+def shard_directories(base_dir: str = "./bug_database") -> Dict[str, str]:
+    """
+    Shards under base_dir by name: subdirectories holding their own db_*
+    snapshots, e.g. bug_database/navigation/db_20250101_120000.
+    """
+    if not os.path.isdir(base_dir):
+        return {}
+    return {
+        name: os.path.join(base_dir, name)
+        for name in sorted(os.listdir(base_dir))
+        if name != OBJECTS_DIR and not name.startswith(('db_', 'build_'))
+        and snapshot_directories(os.path.join(base_dir, name))
+    }
+
+
+def merge_duplicates(shard_results: Dict[str, List[Dict[str, Any]]], num_similar: int) -> List[Dict[str, Any]]:
+    """
+    Merge the duplicates found in every shard for one query into a single
+    top num_similar list, most similar first, noting the shard of each.
+    A ticket found in several shards, e.g. moved between projects, is kept once.
+    """
+    merged = []
+    for shard, duplicates in shard_results.items():
+        merged.extend({**duplicate, 'shard': shard} for duplicate in duplicates)
+    merged.sort(key=lambda duplicate: duplicate['similarity'], reverse=True)
+
+    seen, results = set(), []
+    for duplicate in merged:
+        if duplicate['key'] not in seen:
+            seen.add(duplicate['key'])
+            results.append(duplicate)
+    return results[:num_similar]
+
+
+class ShardedFinder:
+    """
+    Searches the latest database of several shards, e.g. one per Jira
+    project, as one database.
+
+    Shards are built and refreshed independently, each in its own directory
+    under base_dir. Every query is embedded once, then searched in all
+    selected shards in parallel threads (FAISS releases the GIL while
+    searching) and the best num_similar duplicates of all shards are kept.
+    All shards must be built with the same embeddings.
+    """
+
+    def __init__(
+        self,
+        finder: JiraDuplicateFinder,
+        base_dir: str = "./bug_database",
+        shards: Optional[List[str]] = None,
+        max_workers: Optional[int] = None
+    ):
+        """
+        Args:
+            finder: Finder providing the settings and clients, e.g. Jira
+                credentials for ticket lookups; it doesn't need a database
+            base_dir: Directory holding the shards
+            shards: Names of the shards to search, all shards by default
+            max_workers: Shards searched at the same time, one per CPU by default
+        """
+        available = shard_directories(base_dir)
+        shards = shards or list(available)
+        unknown = [shard for shard in shards if shard not in available]
+        if unknown:
+            raise ValueError(f"Unknown shards {', '.join(unknown)} in {base_dir}, "
+                             f"expected some of {', '.join(available) or 'none'}")
+        if not shards:
+            raise ValueError(f"No shards found in {base_dir}")
+
+        self.finder = finder
+        self.base_dir = base_dir
+        self.databases = {shard: snapshot_directories(available[shard])[-1] for shard in shards}
+        # Shard finders share the embeddings and query vectors of finder
+        self.finders = {shard: finder.with_database(path) for shard, path in self.databases.items()}
+        self._executor = ThreadPoolExecutor(
+            max_workers=min(len(shards), max_workers or os.cpu_count() or 1),
+            thread_name_prefix="shard-search"
+        )
+
+    @property
+    def num_bugs(self) -> int:
+        return sum(finder.num_bugs for finder in self.finders.values())
+
+    def reload(self) -> List[str]:
+        """
+        Load the shards that have a newer database than the loaded one.
+
+        Returns:
+            Names of the reloaded shards
+        """
+        reloaded = []
+        for shard, database in list(self.databases.items()):
+            latest = snapshot_directories(os.path.join(self.base_dir, shard))[-1]
+            if os.path.basename(latest) > os.path.basename(database):
+                self.finders[shard] = self.finder.with_database(latest)
+                self.databases[shard] = latest
+                reloaded.append(shard)
+        return reloaded
+
+    def find_duplicates(self, query_text: str, query_ticket_id: str = None, **options: Any) -> List[Dict[str, Any]]:
+        """Find duplicates of one query in all shards, see find_duplicates_many."""
+        return self.find_duplicates_many([query_text], query_ticket_ids=[query_ticket_id], **options)[0]
+
+    def find_duplicates_many(
+        self,
+        queries: List[str],
+        query_ticket_ids: Optional[List[Optional[str]]] = None,
+        num_similar: int = 5,
+        **options: Any
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Find duplicates of many queries in all shards.
+
+        Args:
+            queries: Processed query texts
+            query_ticket_ids: Ticket ID of each query (or None) to exclude from its results
+            num_similar: Maximum number of duplicates per query, over all shards
+            options: Other JiraDuplicateFinder.find_duplicates_many options,
+                applied in every shard
+
+        Returns:
+            One list of duplicates per query, as from find_duplicates, with
+            the shard of every duplicate
+        """
+        if not queries:
+            return []
+
+        # Embed the queries once, the shards find the vectors in the query cache.
+        # BM25 scores depend on the terms of each shard, so lexical and hybrid
+        # similarities of different shards are only roughly comparable.
+        if options.get('retrieval', 'vector') != 'lexical':
+            self.finder._query_vectors(queries, normalize=True)
+
+        futures = {
+            shard: self._executor.submit(finder.find_duplicates_many, queries, query_ticket_ids, num_similar, **options)
+            for shard, finder in self.finders.items()
+        }
+        shard_results = {shard: future.result() for shard, future in futures.items()}
+
+        return [
+            merge_duplicates({shard: results[i] for shard, results in shard_results.items()}, num_similar)
+            for i in range(len(queries))
+        ]
+
+    def close(self) -> None:
+        self._executor.shutdown()
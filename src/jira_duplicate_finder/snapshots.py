@@ -0,0 +1,218 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+
+# Content-addressed files shared by the snapshots of a base directory
+OBJECTS_DIR = 'objects'
+
+
+def snapshot_directories(base_dir: str) -> List[str]:
+    """Complete db_* snapshots under base_dir, oldest first."""
+    if not os.path.isdir(base_dir):
+        return []
+    return [
+        os.path.join(base_dir, name)
+        for name in sorted(os.listdir(base_dir))
+        if name.startswith('db_') and os.path.exists(os.path.join(base_dir, name, 'snapshot.json'))
+    ]
+
+
+def _snapshot_time(directory: str) -> Optional[datetime]:
+    # Snapshots saved in the same second get a _NN suffix, see publish_snapshot
+    try:
+        return datetime.strptime(os.path.basename(directory)[:len("db_YYYYmmdd_HHMMSS")], "db_%Y%m%d_%H%M%S")
+    except ValueError:
+        return None
+
+
+def staging_directory(base_dir: str) -> str:
+    """
+    Create an empty directory under base_dir to write a new snapshot into.
+    It is not a db_* directory, so it is never loaded while being written.
+    """
+    os.makedirs(base_dir, exist_ok=True)
+    return tempfile.mkdtemp(prefix='saving_', dir=base_dir)
+
+
+def publish_snapshot(staging_dir: str, base_dir: str, now: Optional[datetime] = None) -> str:
+    """
+    Rename a completely written snapshot to a new db_<timestamp> directory
+    of base_dir. Existing snapshots are never written to: a snapshot saved
+    in the same second as another one gets a _01, _02, ... suffix.
+
+    Returns:
+        The snapshot directory
+    """
+    timestamp = (now or datetime.now()).strftime("%Y%m%d_%H%M%S")
+    for attempt in range(100):
+        name = f"db_{timestamp}" if attempt == 0 else f"db_{timestamp}_{attempt:02d}"
+        path = os.path.join(base_dir, name)
+        if os.path.exists(path):
+            continue
+        try:
+            os.rename(staging_dir, path)
+            return path
+        except OSError:
+            # Taken by a concurrent save since the check
+            if not os.path.exists(path):
+                raise
+    raise ValueError(f"No free snapshot name for {timestamp} in {base_dir}")
+
+
+def _file_digest(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def store_snapshot(directory: str, objects_dir: Optional[str] = None) -> Tuple[int, int]:
+    """
+    Share the identical files of a snapshot with the other snapshots through
+    a content-addressed store.
+
+    Every file not yet in the store is hashed; a file whose content is
+    already stored is replaced by a hard link to the stored copy, other
+    files are added to the store. Only whole files are shared: every file of
+    a snapshot covers all tickets, so a single changed ticket changes almost
+    all of them, and mostly snapshots saved without changes share files.
+    Snapshots stay plain directories, so loading one is unchanged. Stored
+    files are shared and must never be modified in place.
+
+    Args:
+        directory: Snapshot directory
+        objects_dir: Store directory, <base_dir>/objects by default
+
+    Returns:
+        Number of files and bytes that were already stored
+    """
+    if objects_dir is None:
+        objects_dir = os.path.join(os.path.dirname(os.path.abspath(directory)), OBJECTS_DIR)
+
+    shared_files, shared_bytes = 0, 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            # Linked to the store by an earlier compaction
+            if os.stat(path).st_nlink > 1:
+                continue
+            digest = _file_digest(path)
+            object_path = os.path.join(objects_dir, digest[:2], digest)
+
+            try:
+                if not os.path.exists(object_path):
+                    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                    os.link(path, object_path)
+                elif not os.path.samefile(path, object_path):
+                    os.link(object_path, path + '.link')
+                    os.replace(path + '.link', path)
+                    shared_files += 1
+                    shared_bytes += os.path.getsize(object_path)
+            except OSError as e:
+                # File systems without hard links keep full copies
+                print(f"Warning: Could not share {path}: {str(e)}")
+                return shared_files, shared_bytes
+
+    return shared_files, shared_bytes
+
+
+def expired_snapshots(
+    snapshots: List[str],
+    keep_last: int = 5,
+    keep_daily: int = 14,
+    now: Optional[datetime] = None
+) -> List[str]:
+    """
+    Snapshots outside the retention policy, oldest first.
+
+    Args:
+        snapshots: Snapshot directories, oldest first
+        keep_last: Number of most recent snapshots always kept, at least 1
+        keep_daily: Days for which the last snapshot of the day is kept
+        now: Reference time of the daily retention, the current time by default
+    """
+    if keep_last < 1:
+        raise ValueError("keep_last must keep at least the latest snapshot")
+
+    now = now or datetime.now()
+    kept = set(snapshots[-keep_last:])
+    last_of_day: Dict[str, str] = {}
+    for snapshot in snapshots:
+        created = _snapshot_time(snapshot)
+        if created is None:
+            # Unknown naming, never removed automatically
+            kept.add(snapshot)
+        elif created.date() > (now - timedelta(days=keep_daily)).date():
+            last_of_day[created.date().isoformat()] = snapshot
+    kept.update(last_of_day.values())
+
+    return [snapshot for snapshot in snapshots if snapshot not in kept]
+
+
+def collect_garbage(base_dir: str) -> Tuple[int, int]:
+    """
+    Remove stored files no snapshot links to anymore.
+
+    Returns:
+        Number of files and bytes freed
+    """
+    objects_dir = os.path.join(base_dir, OBJECTS_DIR)
+    removed_files, removed_bytes = 0, 0
+    if not os.path.isdir(objects_dir):
+        return removed_files, removed_bytes
+
+    for root, _, names in os.walk(objects_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            # The store's own link is the last one
+            if stat.st_nlink == 1:
+                os.remove(path)
+                removed_files += 1
+                removed_bytes += stat.st_size
+    return removed_files, removed_bytes
+
+
+def compact(
+    base_dir: str = "./bug_database",
+    keep_last: int = 5,
+    keep_daily: int = 14,
+    dry_run: bool = False
+) -> Dict[str, int]:
+    """
+    Apply the retention policy to the snapshots of base_dir, share the
+    identical files of the remaining ones through the store and free
+    unreferenced files.
+
+    Unfinished build_* directories are left alone, as they can be resumed.
+
+    Args:
+        base_dir: Directory holding the db_* snapshots
+        keep_last: Number of most recent snapshots always kept
+        keep_daily: Days for which the last snapshot of the day is kept
+        dry_run: Only report the snapshots that would be removed
+
+    Returns:
+        Counts of removed snapshots, newly shared files and bytes, and freed files and bytes
+    """
+    snapshots = snapshot_directories(base_dir)
+    expired = expired_snapshots(snapshots, keep_last, keep_daily)
+    for snapshot in expired:
+        print(f"{'Would remove' if dry_run else 'Removing'} {snapshot}")
+    if dry_run:
+        return {'removed_snapshots': len(expired)}
+
+    for snapshot in expired:
+        shutil.rmtree(snapshot)
+
+    stats = {'removed_snapshots': len(expired), 'shared_files': 0, 'shared_bytes': 0}
+    for snapshot in snapshots:
+        if snapshot not in expired:
+            shared_files, shared_bytes = store_snapshot(snapshot)
+            stats['shared_files'] += shared_files
+            stats['shared_bytes'] += shared_bytes
+
+    stats['freed_files'], stats['freed_bytes'] = collect_garbage(base_dir)
+    return stats
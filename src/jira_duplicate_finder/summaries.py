@@ -0,0 +1,97 @@
+import gzip
+import json
+import os
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# summaries.jsonl: one summary per line; .jsonl.gz: the same, compressed;
+# .json: a single JSON list, as written by earlier versions
+SUMMARY_FORMATS = ('jsonl', 'jsonl.gz', 'json')
+
+# Summary fields and the bug columns they are taken from
+SUMMARY_FIELDS = {
+    'key': 'key',
+    'summary': 'title',
+    'text': 'processed_text',
+    'status': 'status',
+    'created': 'created',
+    'updated': 'updated'
+}
+
+# Rows serialized at a time, bounding the memory of the JSON text
+BATCH_ROWS = 10_000
+
+
+def summaries_filename(summaries_format: str) -> str:
+    if summaries_format not in SUMMARY_FORMATS:
+        raise ValueError(f"Unknown summaries format {summaries_format}, "
+                         f"expected one of {', '.join(SUMMARY_FORMATS)}")
+    return f"summaries.{summaries_format}"
+
+
+def summaries_path(directory: str) -> Optional[str]:
+    """The summaries file of a database, whatever its format, or None."""
+    for summaries_format in SUMMARY_FORMATS:
+        path = os.path.join(directory, summaries_filename(summaries_format))
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def write_summaries(path: str, bug_frames: Iterable['pd.DataFrame']) -> int:
+    """
+    Write the summaries of bugs, one DataFrame at a time. Rows are
+    serialized by pandas in batches, never one by one in Python.
+
+    Args:
+        path: Summaries file, its extension gives the format
+        bug_frames: Bug records, can be streamed
+
+    Returns:
+        Number of summaries written
+    """
+    as_list = path.endswith('.json')
+    opener = gzip.open if path.endswith('.gz') else open
+    written = 0
+
+    with opener(path, 'wt', encoding='utf-8') as f:
+        if as_list:
+            f.write('[')
+        for bugs_df in bug_frames:
+            if not len(bugs_df):
+                continue
+            summaries_df = bugs_df[list(SUMMARY_FIELDS)].rename(columns=SUMMARY_FIELDS)
+            for start in range(0, len(summaries_df), BATCH_ROWS):
+                batch = summaries_df.iloc[start:start + BATCH_ROWS]
+                if as_list:
+                    # Records of the batch without the enclosing brackets
+                    f.write((',\n' if written else '\n') +
+                            batch.to_json(orient='records', force_ascii=False, date_format='iso')[1:-1])
+                else:
+                    lines = batch.to_json(orient='records', lines=True, force_ascii=False, date_format='iso')
+                    f.write(lines if lines.endswith('\n') else lines + '\n')
+                written += len(batch)
+        if as_list:
+            f.write('\n]\n')
+
+    return written
+
+
+def iter_summaries(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Read summaries one at a time. JSON Lines files, compressed or not, are
+    streamed; files in the older JSON list format are loaded whole.
+    """
+    if path.endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            yield from json.load(f)
+        return
+
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
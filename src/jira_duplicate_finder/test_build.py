@@ -0,0 +1,146 @@
+import os
+import random
+
+import pandas as pd
+import pytest
+
+from jira_duplicate_finder.build import BuildCheckpoint
+from jira_duplicate_finder.metadata_store import ColumnStore, write_column_store
+from jira_duplicate_finder import snapshots
+from jira_duplicate_finder.snapshots import compact, publish_snapshot, snapshot_directories
+from jira_duplicate_finder.test_update import saved_keys
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt_after(monkeypatch, cls, method, calls):
+    """Make a method raise Interrupted once it was called the given number of times."""
+    original = getattr(cls, method)
+    count = [0]
+
+    def interrupted(*args, **kwargs):
+        if count[0] == calls:
+            raise Interrupted()
+        count[0] += 1
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(cls, method, interrupted)
+
+
+def test_resumed_build_restarts_a_page_early_in_key_order(fake_jira, make_finder, base_dir, monkeypatch):
+    jira = fake_jira(500)
+    all_keys = {ticket['key'] for ticket in jira.tickets}
+
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, BuildCheckpoint, 'save_chunk', 2)
+        with pytest.raises(Interrupted):
+            make_finder(jira).build_database('project = NAV', base_dir, chunk_size=100)
+    assert snapshot_directories(base_dir) == []
+
+    # Tickets before the stop point disappear, and Jira's default order changes
+    saved = jira.tickets[:200]
+    for ticket in saved[150:180]:
+        jira.tickets.remove(ticket)
+    random.Random(0).shuffle(jira.tickets)
+
+    finder = make_finder(jira)
+    database = finder.build_database('project = NAV', base_dir, chunk_size=100)
+
+    assert saved_keys(database) == all_keys
+    assert finder.num_bugs == 500
+    assert [os.path.basename(path) for path in snapshot_directories(base_dir)] == [os.path.basename(database)]
+    assert not any(name.startswith('build_') for name in os.listdir(base_dir))
+
+
+def test_new_build_starts_over_without_resume(fake_jira, make_finder, base_dir, monkeypatch):
+    jira = fake_jira(300)
+
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, BuildCheckpoint, 'save_chunk', 1)
+        with pytest.raises(Interrupted):
+            make_finder(jira).build_database('project = NAV', base_dir, chunk_size=100)
+
+    database = make_finder(jira).build_database('project = NAV', base_dir, chunk_size=100, resume=False)
+    assert len(saved_keys(database)) == 300
+
+
+def test_column_store_round_trip(tmp_path):
+    df = pd.DataFrame({
+        'key': ['NAV-1', 'NAV-2', 'NAV-3', 'NAV-4'],
+        'summary': ['Route fails', '', None, 'Zielführung bricht ab ✓'],
+        'text': ['text', float('nan'), 'multi\nline "quoted"', None],
+        'labels': [['navigation'], [], None, ['hmi', 'online']]
+    })
+
+    kinds = write_column_store(str(tmp_path / 'metadata'), df)
+    store = ColumnStore(str(tmp_path / 'metadata'), kinds)
+
+    assert kinds == {'key': 'str', 'summary': 'str', 'text': 'str', 'labels': 'json'}
+    assert len(store) == 4
+    assert store.row(3) == {'key': 'NAV-4', 'summary': 'Zielführung bricht ab ✓', 'text': None,
+                            'labels': ['hmi', 'online']}
+    assert store.column('text').take([2, 1, 0]) == ['multi\nline "quoted"', None, 'text']
+    assert store.column('summary').to_list() == ['Route fails', '', None, 'Zielführung bricht ab ✓']
+    assert store.to_dataframe(['key', 'labels']).to_dict('records') == [
+        {'key': 'NAV-1', 'labels': ['navigation']},
+        {'key': 'NAV-2', 'labels': []},
+        {'key': 'NAV-3', 'labels': None},
+        {'key': 'NAV-4', 'labels': ['hmi', 'online']}
+    ]
+    with pytest.raises(KeyError):
+        store.column('status')
+
+
+def test_empty_column_store(tmp_path):
+    kinds = write_column_store(str(tmp_path / 'metadata'), pd.DataFrame({'key': pd.Series([], dtype=object)}))
+    store = ColumnStore(str(tmp_path / 'metadata'), kinds)
+
+    assert len(store) == 0
+    assert store.column('key').to_list() == []
+
+
+def test_snapshots_are_published_by_rename_under_free_names(tmp_path):
+    base_dir = str(tmp_path / 'bug_database')
+    now = pd.Timestamp('2025-06-01 12:00:00').to_pydatetime()
+
+    published = []
+    for _ in range(3):
+        staging = tmp_path / 'bug_database' / f"saving_{len(published)}"
+        staging.mkdir(parents=True)
+        (staging / 'snapshot.json').write_text('{}')
+        published.append(publish_snapshot(str(staging), base_dir, now=now))
+
+    assert [os.path.basename(path) for path in published] == \
+        ['db_20250601_120000', 'db_20250601_120000_01', 'db_20250601_120000_02']
+    assert not any(name.startswith('saving_') for name in os.listdir(base_dir))
+
+    # Snapshots without snapshot.json are incomplete
+    os.makedirs(os.path.join(base_dir, 'db_20250601_130000'))
+    assert snapshot_directories(base_dir) == published
+
+
+
+def test_compaction_links_identical_files_once(tmp_path, monkeypatch):
+    base_dir = str(tmp_path / 'bug_database')
+    published = []
+    for number, ticket in enumerate(['NAV-1', 'NAV-1', 'NAV-2']):
+        staging = tmp_path / 'bug_database' / f"saving_{number}"
+        staging.mkdir(parents=True)
+        (staging / 'index.faiss').write_bytes(ticket.encode('utf-8') * 1000)
+        (staging / 'snapshot.json').write_text('{}')
+        published.append(publish_snapshot(str(staging), base_dir))
+
+    stats = compact(base_dir)
+
+    assert stats['removed_snapshots'] == 0
+    # The first copy of every content is stored, the identical ones link to it
+    assert stats['shared_files'] == 3
+    assert os.path.samefile(os.path.join(published[0], 'index.faiss'), os.path.join(published[1], 'index.faiss'))
+    assert not os.path.samefile(os.path.join(published[1], 'index.faiss'), os.path.join(published[2], 'index.faiss'))
+
+    hashed = []
+    monkeypatch.setattr(snapshots, '_file_digest', lambda path: hashed.append(path))
+    assert compact(base_dir)['shared_files'] == 0
+    assert hashed == []
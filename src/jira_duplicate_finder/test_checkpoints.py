@@ -0,0 +1,125 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from jira_duplicate_finder.build import BuildCheckpoint
+from jira_duplicate_finder.duplicate_finder import JiraDuplicateFinder
+from jira_duplicate_finder.test_build import Interrupted, interrupt_after
+from jira_duplicate_finder.test_update import saved_keys
+
+
+def count_calls(monkeypatch, cls, method):
+    """Count the calls of a method."""
+    original = getattr(cls, method)
+    calls = []
+
+    def counted(*args, **kwargs):
+        calls.append(args)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(cls, method, counted)
+    return calls
+
+
+def fail_preprocessing(monkeypatch, finder, jira):
+    """
+    Make the preprocessing of tickets raise. Returns the set of failing
+    ticket keys, which can be changed afterwards.
+    """
+    preprocess_ticket = finder.text_processor.preprocess_ticket
+    failing_keys = set()
+
+    def failing(**fields):
+        # Descriptions are unique, titles are shared by duplicates
+        if any(ticket['description'] == fields['description'] for ticket in jira.tickets
+               if ticket['key'] in failing_keys):
+            raise RuntimeError("Azure OpenAI unavailable")
+        return preprocess_ticket(**fields)
+
+    monkeypatch.setattr(finder.text_processor, 'preprocess_ticket', failing)
+    return failing_keys
+
+
+def test_interrupted_chunk_resumes_without_redoing_recorded_tickets(fake_jira, make_finder, base_dir, monkeypatch):
+    jira = fake_jira(250)
+
+    with monkeypatch.context() as patch:
+        # Stops after the first embedded batch of 100 of the chunk
+        interrupt_after(patch, BuildCheckpoint, 'record_vectors', 1)
+        with pytest.raises(Interrupted):
+            make_finder(jira).build_database('project = NAV', base_dir, chunk_size=250)
+
+    processed = count_calls(monkeypatch, JiraDuplicateFinder, '_process_issue')
+    embedded = count_calls(monkeypatch, JiraDuplicateFinder, '_embed_normalized')
+    database = make_finder(jira).build_database('project = NAV', base_dir, chunk_size=250)
+
+    assert len(saved_keys(database)) == 250
+    assert processed == []
+    assert sum(len(texts) for _, texts in embedded) == 150
+
+
+def test_failed_tickets_are_reported_and_retried(fake_jira, make_finder, base_dir, monkeypatch):
+    jira = fake_jira(200)
+    finder = make_finder(jira)
+    failing_keys = fail_preprocessing(monkeypatch, finder, jira)
+    failing_keys.update({'NAV-3', 'NAV-150'})
+
+    database = finder.build_database('project = NAV', base_dir, chunk_size=100)
+
+    with open(os.path.join(database, 'failed_keys.json'), encoding='utf-8') as f:
+        failed = json.load(f)
+    assert [failure['key'] for failure in failed] == ['NAV-150', 'NAV-3']
+    assert {failure['stage'] for failure in failed} == {'preprocess'}
+    assert not saved_keys(database) & {'NAV-3', 'NAV-150'}
+
+    # Still failing: kept in the report
+    failing_keys.discard('NAV-3')
+    database = finder.retry_failed(base_dir)
+    assert 'NAV-3' in saved_keys(database)
+    assert set(finder.failed_tickets) == {'NAV-150'}
+
+    failing_keys.clear()
+    database = finder.retry_failed(base_dir)
+    with open(os.path.join(database, 'failed_keys.json'), encoding='utf-8') as f:
+        assert json.load(f) == []
+    assert saved_keys(database) == {ticket['key'] for ticket in jira.tickets}
+
+    with pytest.raises(ValueError, match="No failed tickets"):
+        finder.retry_failed(base_dir)
+
+
+def test_failures_survive_an_interrupted_build(fake_jira, make_finder, base_dir, monkeypatch):
+    jira = fake_jira(200)
+    finder = make_finder(jira)
+    fail_preprocessing(monkeypatch, finder, jira).add('NAV-11')
+
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, BuildCheckpoint, 'save_chunk', 1)
+        with pytest.raises(Interrupted):
+            finder.build_database('project = NAV', base_dir, chunk_size=100)
+
+    # Still failing when the build is resumed
+    database = finder.build_database('project = NAV', base_dir, chunk_size=100)
+
+    assert set(finder.failed_tickets) == {'NAV-11'}
+    assert len(saved_keys(database)) == 199
+
+
+def test_build_checkpoint_keeps_pending_vectors_of_complete_records(tmp_path):
+    checkpoint = BuildCheckpoint.open(str(tmp_path), 'project = NAV', None)
+    checkpoint.record_ticket('NAV-1', {'key': 'NAV-1', 'text': 'one'}, None)
+    checkpoint.record_vectors(['NAV-1'], np.ones((1, 4), dtype=np.float32))
+    # A batch whose record was cut short by an interruption is dropped
+    with open(checkpoint._pending_path('f32'), 'ab') as f:
+        f.write(np.zeros(4, dtype=np.float32).tobytes())
+    with open(checkpoint._pending_path('jsonl'), 'ab') as f:
+        f.write(b'{"stage": "embed", "keys": ["NAV-2"')
+
+    records, vectors, failed = BuildCheckpoint.open(str(tmp_path), 'project = NAV', None).pending()
+
+    assert list(records) == ['NAV-1']
+    assert list(vectors) == ['NAV-1'] and vectors['NAV-1'].tolist() == [1.0] * 4
+    assert failed == {}
+    assert os.path.getsize(checkpoint._pending_path('f32')) == 16
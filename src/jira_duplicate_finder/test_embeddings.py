@@ -0,0 +1,63 @@
+import httpx
+
+from benchmarks.fake_services import FakeOpenAI
+from jira_duplicate_finder.embeddings import CachedEmbeddings, HashingEmbeddings
+from preprocessing.rate_limit import RateLimitHeaders
+
+
+class QuotaEmbeddings:
+    """Embeddings reporting a fixed remaining quota after every request, like Azure OpenAI headers."""
+
+    def __init__(self, rate_limits, headers):
+        self.rate_limits = rate_limits
+        self.headers = headers
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(len(texts))
+        self.rate_limits(httpx.Response(200, headers=self.headers))
+        return HashingEmbeddings(dimension=8).embed_documents(texts)
+
+
+def embed_with_quota(headers, texts, batch_size=100):
+    rate_limits = RateLimitHeaders()
+    backend = QuotaEmbeddings(rate_limits, headers)
+    embeddings = CachedEmbeddings(backend, 'model', 'deployment', batch_size=batch_size, rate_limits=rate_limits)
+    assert len(embeddings.embed_documents(texts)) == len(texts)
+    return backend.batches
+
+
+def test_batches_fit_the_remaining_tokens():
+    # 40 characters, about 10 tokens per text
+    texts = [f"Route calculation fails in tunnel {i:06d}" for i in range(1000)]
+    batches = embed_with_quota({'x-ratelimit-remaining-tokens': '500'}, texts)
+
+    assert batches[0] == 100
+    assert set(batches[1:-1]) == {50}
+
+
+def test_batches_grow_when_few_requests_are_left():
+    texts = [f"text {i}" for i in range(3000)]
+    batches = embed_with_quota({'x-ratelimit-remaining-requests': '2', 'x-ratelimit-remaining-tokens': '1000000'},
+                               texts)
+
+    assert batches[:2] == [100, 1000]
+
+
+def test_batches_grow_gradually_without_quota_headers():
+    batches = embed_with_quota({}, [f"text {i}" for i in range(1000)])
+
+    assert batches[:3] == [100, 125, 156]
+
+
+def test_fake_openai_reports_remaining_requests():
+    openai = FakeOpenAI(dimension=8, requests_per_second=1000)
+    rate_limits = RateLimitHeaders()
+    try:
+        with httpx.Client(event_hooks={'response': [rate_limits]}) as client:
+            client.post(f"{openai.start()}/openai/deployments/embed/embeddings", json={'input': ['text']})
+    finally:
+        openai.stop()
+
+    assert rate_limits.remaining_requests == 999
+    assert rate_limits.remaining_tokens is None
@@ -0,0 +1,157 @@
+import json
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from jira_duplicate_finder.duplicate_finder import JiraDuplicateFinder
+from jira_duplicate_finder.ingestion import EventIngestor, EventJournal, read_events
+from jira_duplicate_finder.metrics import Metrics
+from jira_duplicate_finder.test_checkpoints import count_calls
+from jira_duplicate_finder.test_update import saved_keys, touch
+
+
+INDEXES = [('flat', {}), ('hnsw', {}), ('ivfpq', {'pq_m': 8})]
+
+
+def event(key, change='jira:issue_updated'):
+    return {'webhookEvent': change, 'issue': {'key': key}}
+
+
+def keys_found(finder, query, **options):
+    results = finder.find_duplicates(query, num_similar=10, similarity_threshold=0.0,
+                                     nprobe=64, ef_search=256, **options)
+    return [result['key'] for result in results]
+
+
+@pytest.fixture
+def loaded_finder(fake_jira, make_finder, base_dir):
+    """Build a database on a fake Jira and return a finder with it loaded, and the fake Jira."""
+    def build(index_type, index_params, num_tickets=1000):
+        jira = fake_jira(num_tickets)
+        finder = make_finder(jira, index_type=index_type, index_params=index_params)
+        finder.build_database('project = NAV', base_dir)
+        return finder, jira
+    return build
+
+
+@pytest.mark.parametrize('index_type,index_params', INDEXES)
+def test_changes_are_searchable_before_the_snapshot(loaded_finder, index_type, index_params):
+    finder, jira = loaded_finder(index_type, index_params)
+    touch(jira.tickets[4], summary='Zebra crossing warning missing on motorway ramps')
+    jira.tickets.append(dict(jira.tickets[0], key='NAV-1001', summary='Ferry route ignores the timetable'))
+    touch(jira.tickets[-1])
+
+    counts = finder.apply_ticket_changes(['NAV-5', 'NAV-1001'], deleted_keys=['NAV-7'])
+
+    assert counts == {'added': 1, 'updated': 1, 'removed': 1}
+    assert finder.num_bugs == 1000
+    for retrieval in ('vector', 'lexical', 'hybrid'):
+        assert keys_found(finder, 'Zebra crossing warning missing on motorway ramps', retrieval=retrieval)[0] == 'NAV-5'
+        assert keys_found(finder, 'Ferry route ignores the timetable', retrieval=retrieval)[0] == 'NAV-1001'
+        assert 'NAV-7' not in keys_found(finder, jira.tickets[6]['summary'], retrieval=retrieval)
+    # Approximate indexes keep the replaced rows until they are compacted
+    assert len(finder.deleted_rows) == (0 if index_type == 'flat' else 2)
+    # Along with filters
+    assert keys_found(finder, 'Zebra crossing warning missing on motorway ramps',
+                      status_filter=[jira.tickets[4]['status']])[0] == 'NAV-5'
+    assert 'NAV-7' not in keys_found(finder, jira.tickets[6]['summary'], status_filter=[jira.tickets[6]['status']])
+
+
+@pytest.mark.parametrize('index_type,index_params', INDEXES[1:])
+def test_deleted_rows_are_compacted_above_the_threshold(loaded_finder, index_type, index_params):
+    finder, jira = loaded_finder(index_type, index_params)
+
+    finder.apply_ticket_changes([], deleted_keys=[f"NAV-{number}" for number in range(1, 101)])
+    assert len(finder.deleted_rows) == 100
+    assert finder.vector_store.index.ntotal == 1000
+
+    finder.apply_ticket_changes([], deleted_keys=[f"NAV-{number}" for number in range(101, 251)])
+    assert len(finder.deleted_rows) == 0
+    assert finder.vector_store.index.ntotal == 750
+    assert finder.num_bugs == 750
+    assert keys_found(finder, jira.tickets[300]['summary'])[0] in {ticket['key'] for ticket in jira.tickets[250:]}
+
+
+@pytest.mark.parametrize('index_type,index_params', INDEXES)
+def test_snapshot_of_ingested_changes_embeds_nothing_again(loaded_finder, base_dir, monkeypatch,
+                                                           index_type, index_params):
+    finder, jira = loaded_finder(index_type, index_params)
+    touch(jira.tickets[4], summary='Zebra crossing warning missing on motorway ramps')
+    finder.apply_ticket_changes(['NAV-5'], deleted_keys=['NAV-7'])
+
+    embedded = count_calls(monkeypatch, JiraDuplicateFinder, '_embed_normalized')
+    database = finder.save_database(base_dir)
+
+    assert embedded == []
+    assert len(finder.deleted_rows) == 0
+    assert saved_keys(database) == {ticket['key'] for ticket in jira.tickets} - {'NAV-7'}
+
+    loaded = JiraDuplicateFinder.for_search(database)
+    assert keys_found(loaded, 'Zebra crossing warning missing on motorway ramps')[0] == 'NAV-5'
+
+
+def test_ingestor_applies_batches_and_saves_snapshots(loaded_finder, base_dir, tmp_path):
+    finder, jira = loaded_finder('hnsw', {}, num_tickets=300)
+    ingestor = EventIngestor(finder, base_dir, max_batch_size=10, max_wait=0.1, snapshot_interval=3600)
+    journal = EventJournal(str(tmp_path / 'events.jsonl'))
+
+    touch(jira.tickets[0], summary='Zebra crossing warning missing on motorway ramps')
+    payloads = [event('NAV-1'), event('NAV-2', 'jira:issue_deleted'), {'webhookEvent': 'comment_created'}]
+    for payload in payloads:
+        journal.append(payload)
+    journal.close()
+    assert [ingestor.submit(payload) for payload in read_events(journal.path)] == [True, True, False]
+
+    ingestor.start()
+    database = ingestor.stop()
+
+    assert ingestor.events.empty()
+    assert saved_keys(database) == {ticket['key'] for ticket in jira.tickets} - {'NAV-2'}
+    assert ingestor.health()['unsaved_changes'] == 0
+    assert ingestor.find_duplicates_many(['Zebra crossing warning missing on motorway ramps'],
+                                         similarity_threshold=0.0)[0][0]['key'] == 'NAV-1'
+    with open(journal.path, encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == payloads
+
+
+def test_failed_batch_is_retried_before_later_events(monkeypatch):
+    ingestor = EventIngestor(SimpleNamespace(metrics=Metrics()), max_batch_size=1, max_wait=0.01)
+    applied = []
+
+    def ingest(batch):
+        if not applied:
+            # Jira unavailable while another event of the ticket arrives
+            applied.append(None)
+            ingestor.submit(event('NAV-1', 'jira:issue_deleted'))
+            raise ConnectionError("Jira unavailable")
+        applied.append(batch)
+        return {'added': 0, 'updated': 0, 'removed': 0}
+
+    monkeypatch.setattr(ingestor, 'ingest', ingest)
+    monkeypatch.setattr(ingestor, 'snapshot', lambda: None)
+    ingestor.submit(event('NAV-1'))
+    ingestor.start()
+    deadline = time.monotonic() + 10
+    while len(applied) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    ingestor.stop()
+
+    assert applied == [None, {'NAV-1': 'changed'}, {'NAV-1': 'deleted'}]
+    assert {counter['name'] for counter in ingestor.finder.metrics.snapshot()['counters']} == \
+        {'events_received', 'ingest_errors'}
+
+
+def test_journal_syncs_every_event(tmp_path, monkeypatch):
+    synced = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, 'fsync', lambda fd: (synced.append(fd), fsync(fd)))
+
+    journal = EventJournal(str(tmp_path / 'events.jsonl'))
+    journal.append(event('NAV-1'))
+    journal.append(event('NAV-2'))
+    journal.close()
+
+    assert len(synced) == 2
+    assert [payload['issue']['key'] for payload in read_events(journal.path)] == ['NAV-1', 'NAV-2']
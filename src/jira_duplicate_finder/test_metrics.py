@@ -0,0 +1,17 @@
+from jira_duplicate_finder.metrics import Metrics
+
+
+def test_prometheus_label_values_are_escaped():
+    metrics = Metrics()
+    metrics.increment('failed_tickets', stage='embed')
+    metrics.increment('failed_tickets', stage='say "hi"\\\nbye')
+    metrics.observe('search', 0.25, retrieval='vector')
+
+    assert metrics.to_prometheus().splitlines() == [
+        '# TYPE jira_duplicate_finder_search_seconds summary',
+        'jira_duplicate_finder_search_seconds_count{retrieval="vector"} 1',
+        'jira_duplicate_finder_search_seconds_sum{retrieval="vector"} 0.250000',
+        '# TYPE jira_duplicate_finder_failed_tickets_total counter',
+        'jira_duplicate_finder_failed_tickets_total{stage="embed"} 1',
+        'jira_duplicate_finder_failed_tickets_total{stage="say \\"hi\\"\\\\\\nbye"} 1'
+    ]
@@ -0,0 +1,44 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+from jira_duplicate_finder.metadata_store import ColumnStore
+
+
+def touch(ticket, **changes):
+    """Change a fake Jira ticket, as updated after the last database update."""
+    ticket.update(changes)
+    ticket['updated'] = (datetime.now() + timedelta(minutes=1)).strftime('%Y-%m-%dT%H:%M:%S.000+0000')
+
+
+def saved_keys(database):
+    with open(os.path.join(database, 'snapshot.json'), encoding='utf-8') as f:
+        columns = json.load(f)['columns']
+    return set(ColumnStore(os.path.join(database, 'metadata'), columns).column('key').to_list())
+
+
+def test_update_keeps_tickets_beyond_5000(fake_jira, make_finder, base_dir):
+    jira = fake_jira(5300)
+    finder = make_finder(jira)
+    finder.build_database('project = NAV', base_dir)
+    assert finder.num_bugs == 5300
+
+    removed = jira.tickets.pop(10)
+    touch(jira.tickets[20], summary='Route calculation fails after a software update')
+    database = finder.update_database('project = NAV', base_dir)
+
+    keys = saved_keys(database)
+    assert len(keys) == 5299
+    assert removed['key'] not in keys
+    assert {ticket['key'] for ticket in jira.tickets} == keys
+
+
+def test_update_with_truncated_listing_removes_nothing(fake_jira, make_finder, base_dir):
+    jira = fake_jira(300)
+    finder = make_finder(jira)
+    finder.build_database('project = NAV', base_dir)
+
+    jira.tickets.pop(0)
+    database = finder.update_database('project = NAV', base_dir, max_results=200)
+
+    assert len(saved_keys(database)) == 300
@@ -0,0 +1,198 @@
+import math
+from typing import Dict, Optional
+
+import faiss
+import numpy as np
+
+
+def scores_to_similarity(index: faiss.Index, scores: np.ndarray) -> np.ndarray:
+    """
+    Convert FAISS search scores to cosine similarity.
+
+    Inner product indexes over normalized vectors already return cosine
+    similarity. L2 indexes return squared distances, which for unit vectors
+    (as produced by OpenAI embeddings) relate to cosine as d² = 2 - 2·cos.
+    """
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        return scores
+    return 1 - scores / 2
+
+
+def to_inner_product_index(index: faiss.Index) -> faiss.Index:
+    """
+    Rebuild a flat L2 index as a flat inner product index over the same,
+    L2-normalized vectors, keeping the row order.
+    """
+    vectors = index.reconstruct_n(0, index.ntotal)
+    faiss.normalize_L2(vectors)
+
+    ip_index = faiss.IndexFlatIP(index.d)
+    ip_index.add(vectors)
+    return ip_index
+
+
+INDEX_TYPES = ('flat', 'ivfpq', 'hnsw')
+
+
+def create_index(
+    index_type: str,
+    vectors: np.ndarray,
+    nlist: Optional[int] = None,
+    pq_m: Optional[int] = None,
+    pq_bits: int = 8,
+    hnsw_m: int = 32,
+    ef_construction: int = 200
+) -> faiss.Index:
+    """
+    Create an empty inner product index of the given type, trained on vectors
+    where the type needs training.
+
+    Args:
+        index_type: 'flat' for exact search, 'ivfpq' for an inverted file with
+            product quantization or 'hnsw' for a graph index
+        vectors: Normalized vectors the index will hold, used for training
+        nlist: IVF cells, defaults to about 4·sqrt(n)
+        pq_m: PQ sub-quantizers, defaults to one per 16 dimensions
+        pq_bits: Bits per PQ code, lowered for small collections
+        hnsw_m: Neighbours per HNSW node
+        ef_construction: HNSW candidate list size while adding vectors
+
+    Returns:
+        The empty index, ready for vectors to be added
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type}, expected one of {', '.join(INDEX_TYPES)}")
+
+    num_vectors, dimension = vectors.shape
+
+    if index_type == 'flat':
+        return faiss.IndexFlatIP(dimension)
+
+    if index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = ef_construction
+        return index
+
+    # k-means needs at least as many training vectors as centroids
+    nlist = min(nlist or max(1, int(4 * math.sqrt(num_vectors))), num_vectors)
+    pq_bits = min(pq_bits, max(1, int(math.log2(num_vectors))))
+    pq_m = pq_m or max(1, dimension // 16)
+    if dimension % pq_m:
+        raise ValueError(f"pq_m must divide the vector dimension {dimension}")
+
+    quantizer = faiss.IndexFlatIP(dimension)
+    index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_bits, faiss.METRIC_INNER_PRODUCT)
+    index.train(vectors)
+
+    # Allows reconstructing stored vectors, e.g. for clustering
+    index.set_direct_map_type(faiss.DirectMap.Array)
+    return index
+
+
+def index_type_of(index: faiss.Index) -> str:
+    """The INDEX_TYPES name of an existing index."""
+    if isinstance(index, faiss.IndexHNSW):
+        return 'hnsw'
+    if isinstance(index, faiss.IndexIVF):
+        return 'ivfpq'
+    return 'flat'
+
+
+def without_rows(index: faiss.Index, rows: np.ndarray) -> faiss.Index:
+    """
+    Copy of an index without the given rows; the other rows keep their order
+    and are renumbered from 0. Nothing is trained or embedded again: IVF
+    codes are copied list by list, flat and HNSW vectors are reconstructed
+    exactly and added to a new index of the same settings.
+    """
+    kept_rows = np.setdiff1d(np.arange(index.ntotal), rows)
+
+    if not isinstance(index, faiss.IndexIVF):
+        compacted = faiss.clone_index(index)
+        compacted.reset()
+        compacted.add(index.reconstruct_n(0, index.ntotal)[kept_rows])
+        return compacted
+
+    new_row = np.full(index.ntotal, -1, dtype=np.int64)
+    new_row[kept_rows] = np.arange(len(kept_rows))
+
+    compacted = faiss.clone_index(index)
+    compacted.set_direct_map_type(faiss.DirectMap.NoMap)
+    compacted.reset()
+    invlists = index.invlists
+    for list_no in range(index.nlist):
+        size = invlists.list_size(list_no)
+        if not size:
+            continue
+        ids = new_row[faiss.rev_swig_ptr(invlists.get_ids(list_no), size)]
+        codes = faiss.rev_swig_ptr(invlists.get_codes(list_no), size * invlists.code_size).reshape(size, -1)
+        # Kept referenced while FAISS reads them through the raw pointers
+        kept_ids, kept_codes = ids[ids >= 0], np.ascontiguousarray(codes[ids >= 0])
+        if len(kept_ids):
+            compacted.invlists.add_entries(list_no, len(kept_ids), faiss.swig_ptr(kept_ids), faiss.swig_ptr(kept_codes))
+    compacted.ntotal = len(kept_rows)
+    compacted.set_direct_map_type(index.direct_map.type)
+    return compacted
+
+
+# faiss.read_index flags that map the stored vectors of each index type
+# read-only from the file instead of copying them: the codes of flat and HNSW
+# indexes, the inverted lists of IVF indexes. The HNSW graph and the IVF
+# centroids are still read into memory.
+MMAP_FLAGS = {
+    'flat': faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY,
+    'hnsw': faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY,
+    'ivfpq': faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+}
+
+
+def read_index(path: str, index_type: Optional[str] = None, mmap: bool = False) -> faiss.Index:
+    """
+    Read an index saved with faiss.write_index.
+
+    Memory-mapped indexes keep their vectors in the page cache, where every
+    process mapping the same file shares them, and only pages touched by
+    searches are read. They can be searched but not changed.
+
+    Args:
+        path: Index file
+        index_type: INDEX_TYPES name of the saved index, selects how it is
+            mapped; defaults to 'flat'
+        mmap: Map the vectors from the file instead of reading them
+    """
+    if not mmap:
+        return faiss.read_index(path)
+    return faiss.read_index(path, MMAP_FLAGS.get(index_type or 'flat', MMAP_FLAGS['flat']))
+
+
+def search_parameters(
+    index: faiss.Index,
+    selector: Optional[faiss.IDSelector] = None,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None
+) -> Optional[faiss.SearchParameters]:
+    """
+    Build per query search parameters for an index: the row selector, and
+    nprobe (IVF cells visited) or efSearch (HNSW candidate list size).
+    Returns None when there is nothing to set.
+    """
+    if isinstance(index, faiss.IndexIVF) and nprobe is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+    if isinstance(index, faiss.IndexHNSW) and ef_search is not None:
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+    if selector is not None:
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+
+class SearchIndex:
+    """
+    Read-only stand-in for a LangChain FAISS vector store, holding just what
+    duplicate searches use: the index, its docstore and the mapping from
+    FAISS row to docstore id.
+    """
+
+    def __init__(self, index: faiss.Index, docstore, index_to_docstore_id: Dict[int, str]):
+        self.index = index
+        self.docstore = docstore
+        self.index_to_docstore_id = index_to_docstore_id
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Union
+
+
+# Keys per statement of batched lookups, below SQLite's bound parameter limit
+BATCH_SIZE = 500
+
+
+def content_hash(*parts: Any) -> str:
+    """Stable SHA-256 hex digest of JSON-serializable parts."""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class DiskCache:
+    """
+    A small persistent key/value cache backed by a single SQLite file.
+
+    Entries older than max_age_days are dropped, and once the cache holds more
+    than max_entries the least recently used entries are evicted. Safe to share
+    between threads.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: Optional[int] = 100_000,
+        max_age_days: Optional[float] = 90
+    ):
+        """
+        Open (or create) a cache file.
+
+        Args:
+            path: Path of the SQLite cache file
+            max_entries: Maximum number of entries to keep, None for unbounded
+            max_age_days: Maximum entry age in days, None to never expire
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 86400 if max_age_days is not None else None
+
+        self._lock = threading.Lock()
+        self._writes_since_evict = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+            'created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache(accessed_at)')
+        self._conn.commit()
+        self.evict()
+
+    def get(self, key: str) -> Optional[Union[str, bytes]]:
+        """Return the cached value for key, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, created_at FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, created_at = row
+            if self.max_age_seconds is not None and now - created_at > self.max_age_seconds:
+                self._conn.execute('DELETE FROM cache WHERE key = ?', (key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute('UPDATE cache SET accessed_at = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            return value
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Union[str, bytes]]:
+        """
+        Look up many keys at once, refreshing the access time of all hits in
+        a single transaction.
+
+        Returns:
+            Cached value by key, for the keys found and not expired
+        """
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        found, expired = {}, []
+        with self._lock:
+            for start in range(0, len(keys), BATCH_SIZE):
+                chunk = keys[start:start + BATCH_SIZE]
+                rows = self._conn.execute(
+                    f'SELECT key, value, created_at FROM cache WHERE key IN ({", ".join("?" * len(chunk))})', chunk
+                ).fetchall()
+                for key, value, created_at in rows:
+                    if self.max_age_seconds is not None and now - created_at > self.max_age_seconds:
+                        expired.append(key)
+                    else:
+                        found[key] = value
+
+            if found or expired:
+                with self._conn:
+                    self._conn.executemany('DELETE FROM cache WHERE key = ?', ((key,) for key in expired))
+                    self._conn.executemany('UPDATE cache SET accessed_at = ? WHERE key = ?',
+                                           ((now, key) for key in found))
+        return found
+
+    def set_many(self, items: Dict[str, Union[str, bytes]]) -> None:
+        """Store many values in a single transaction, see set."""
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)',
+                    ((key, value, now, now) for key, value in items.items())
+                )
+            self._writes_since_evict += len(items)
+            evict_due = self._writes_since_evict >= 1000
+
+        if evict_due:
+            self.evict()
+
+    def set(self, key: str, value: Union[str, bytes]) -> None:
+        """Store value under key, evicting old entries from time to time."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, value, now, now)
+            )
+            self._conn.commit()
+            self._writes_since_evict += 1
+            evict_due = self._writes_since_evict >= 1000
+
+        if evict_due:
+            self.evict()
+
+    def evict(self) -> None:
+        """Drop expired entries and trim the cache down to max_entries."""
+        with self._lock:
+            if self.max_age_seconds is not None:
+                self._conn.execute(
+                    'DELETE FROM cache WHERE created_at < ?', (time.time() - self.max_age_seconds,)
+                )
+
+            if self.max_entries is not None:
+                self._conn.execute(
+                    'DELETE FROM cache WHERE key IN ('
+                    'SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,)
+                )
+
+            self._conn.commit()
+            self._writes_since_evict = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
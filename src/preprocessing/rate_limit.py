@@ -0,0 +1,146 @@
+import random
+import threading
+import time
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting how often an API may be called.
+
+    Tokens refill continuously at `rate` per second up to `capacity`;
+    acquire() blocks until enough tokens are available.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum burst size, defaults to one second worth of tokens
+        """
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float) -> 'TokenBucket':
+        """Create a bucket from a requests-per-minute quota."""
+        return cls(requests_per_minute / 60.0)
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Block until `tokens` tokens can be taken from the bucket."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+
+                wait = (tokens - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Whether an exception is an HTTP 429 from the OpenAI (or any requests based) client."""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        response = getattr(error, 'response', None)
+        status = getattr(response, 'status_code', None)
+    return status == 429
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read the server suggested wait time from a rate limit error, if any."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000.0
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except ValueError:
+        return None
+    return None
+
+
+class RateLimitHeaders:
+    """
+    Remaining quota reported by the x-ratelimit-remaining-requests and
+    x-ratelimit-remaining-tokens headers of Azure OpenAI responses.
+
+    Register it as an httpx response event hook, e.g.
+    httpx.Client(event_hooks={'response': [rate_limits]}); it keeps the values
+    of the latest response that had them.
+    """
+
+    def __init__(self):
+        self.remaining_requests: Optional[int] = None
+        self.remaining_tokens: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def __call__(self, response: Any) -> None:
+        requests = _int_header(response.headers, 'x-ratelimit-remaining-requests')
+        tokens = _int_header(response.headers, 'x-ratelimit-remaining-tokens')
+        with self._lock:
+            if requests is not None:
+                self.remaining_requests = requests
+            if tokens is not None:
+                self.remaining_tokens = tokens
+
+
+def _int_header(headers: Any, name: str) -> Optional[int]:
+    try:
+        return int(float(headers[name])) if headers.get(name) else None
+    except ValueError:
+        return None
+
+
+def call_with_retry(
+    func: Callable[..., T],
+    *args: Any,
+    max_retries: int = 6,
+    base_delay: float = 1.0,
+    max_delay: float = 60.0,
+    rate_limiter: Optional[TokenBucket] = None,
+    on_retry: Optional[Callable[[Exception, float], None]] = None,
+    **kwargs: Any
+) -> T:
+    """
+    Call func, retrying with exponential backoff and jitter on HTTP 429.
+
+    The wait honours a Retry-After header when the server sends one. Any other
+    error, or a 429 after max_retries retries, is raised to the caller.
+    on_retry is called with the error and the wait before every retry.
+    """
+    attempt = 0
+    while True:
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt >= max_retries:
+                raise
+
+            delay = retry_after_seconds(e)
+            if delay is None:
+                delay = min(max_delay, base_delay * 2 ** attempt) * (0.5 + random.random() / 2)
+            attempt += 1
+            if on_retry is not None:
+                on_retry(e, delay)
+            time.sleep(delay)
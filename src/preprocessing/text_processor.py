@@ -3,20 +3,54 @@ from typing import Optional
 import os
 from dotenv import load_dotenv
 
+from .cache import DiskCache, content_hash
+from .rate_limit import TokenBucket, call_with_retry
+from jira_duplicate_finder.metrics import Metrics
+
+# Bump whenever the prompts change in a way that should invalidate cached summaries
+PROMPT_VERSION = 1
+
+DEFAULT_CACHE_PATH = os.path.join(".", "cache", "summaries.sqlite")
+
 class TextProcessor:
     def __init__(
         self,
         client: Optional[AzureOpenAI] = None,
-        model: Optional[str] = None
+        model: Optional[str] = None,
+        cache: Optional[DiskCache] = None,
+        use_cache: bool = True,
+        rate_limiter: Optional[TokenBucket] = None,
+        max_retries: int = 6,
+        metrics: Optional[Metrics] = None
     ):
+        """
+        Args:
+            client: Azure OpenAI client, created from the environment if not given
+            model: Chat completion deployment name
+            cache: Summary cache, defaults to SUMMARY_CACHE_PATH or ./cache/summaries.sqlite
+            use_cache: Set to False to always call the model
+            rate_limiter: Optional token bucket shared by all completion calls
+            max_retries: Retries with backoff when the API answers 429
+            metrics: Records GPT request latency, token usage, cache hits and rate limits
+        """
         load_dotenv()
 
+        # Retries are handled by call_with_retry so that they share the rate limiter
         self.client = client or AzureOpenAI(
             api_key=os.getenv("AZURE_OPENAI_API_KEY"),
             api_version="2024-10-21",
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
+            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            max_retries=0
         )
         self.model = model or 'dep-gpt-4o'
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.metrics = metrics or Metrics()
+
+        if use_cache:
+            self.cache = cache if cache is not None else DiskCache(os.getenv("SUMMARY_CACHE_PATH", DEFAULT_CACHE_PATH))
+        else:
+            self.cache = None
     
     def preprocess_ticket(
             self,
@@ -87,13 +121,35 @@ class TextProcessor:
                 
             user_prompt += f"\nDescription: {description}"
 
-            completion = self.client.chat.completions.create(
-                model=self.model,
-                temperature=0,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ]
-            )
-            
-            return completion.choices[0].message.content
\ No newline at end of file
+            # Completions run at temperature 0, so identical prompts give identical summaries
+            cache_key = content_hash(PROMPT_VERSION, self.model, system_prompt, user_prompt)
+            if self.cache is not None:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    self.metrics.increment('summary_cache_hits')
+                    return cached
+
+            with self.metrics.timer('gpt_request'):
+                completion = call_with_retry(
+                    self.client.chat.completions.create,
+                    max_retries=self.max_retries,
+                    rate_limiter=self.rate_limiter,
+                    on_retry=lambda error, delay: self.metrics.increment('gpt_rate_limited'),
+                    model=self.model,
+                    temperature=0,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ]
+                )
+
+            usage = getattr(completion, 'usage', None)
+            if usage is not None:
+                self.metrics.increment('gpt_prompt_tokens', usage.prompt_tokens or 0)
+                self.metrics.increment('gpt_completion_tokens', usage.completion_tokens or 0)
+
+            summary = completion.choices[0].message.content
+            if self.cache is not None and summary is not None:
+                self.cache.set(cache_key, summary)
+
+            return summary
\ No newline at end of file